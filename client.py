@@ -0,0 +1,169 @@
+import json
+import time
+import socket
+import argparse
+import threading
+import numpy as np
+import cv2
+import http.client
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.dataset import list_images
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    UnixHTTPConnection class speaking HTTP over a Unix domain socket.
+    """
+
+    def __init__(self, path, timeout=60):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+class DetectorClient:
+    """
+    DetectorClient class responsible for requesting detections from server.py. A client keeps its
+    connection alive between requests, use one client per thread.
+    """
+
+    def __init__(self, url='http://127.0.0.1:8765', timeout=60):
+        """
+        Initializes a DetectorClient object.
+
+        Args:
+            url: The server URL, i.e. http://127.0.0.1:8765 or unix:///tmp/poop-detector.sock.
+            timeout: The request timeout (in seconds).
+        """
+        self.url = urlparse(url)
+        self.timeout = timeout
+        self._conn = None
+
+    def detect(self, image):
+        """
+        Detects objects in an image.
+
+        Args:
+            image: The image file path, encoded image bytes or BGR numpy.ndarray.
+
+        Returns:
+            list: The detections, a dict of cls, name, conf and box (x1, y1, x2, y2 in original image pixels) each.
+        """
+        if isinstance(image, np.ndarray):
+            image = cv2.imencode('.jpg', image)[1].tobytes()
+        elif isinstance(image, str):
+            with open(image, 'rb') as f:
+                image = f.read()
+        return self._request('POST', '/detect', image)['detections']
+
+    def health(self):
+        """
+        Gets the server request and batch counters.
+        """
+        return self._request('GET', '/health')
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _connect(self):
+        if self.url.scheme == 'unix':
+            return UnixHTTPConnection(self.url.path, timeout=self.timeout)
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or 80, timeout=self.timeout)
+
+    def _request(self, method, path, body=None):
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                self._conn.request(method, path, body=body, headers={'Content-Type': 'application/octet-stream'})
+                response = self._conn.getresponse()
+                result = json.loads(response.read())
+                break
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.CannotSendRequest):
+                self.close()  # the server closed the kept alive connection, retry once on a new one
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise RuntimeError(f"{method} {path} failed ({response.status}): {result.get('error')}")
+        return result
+
+def run(url='http://127.0.0.1:8765',
+        images='dataset/images',
+        concurrency=8,
+        requests=200,
+    ):
+    """
+    Benchmarks a running server.py with concurrent requests, compare against a server started
+    with `--max-batch 1` to see the throughput gain of batching.
+
+    Args:
+        url (str): The server URL, i.e. http://127.0.0.1:8765 or unix:///tmp/poop-detector.sock.
+        images (str): The folder of images to send.
+        concurrency (int): The number of concurrent clients.
+        requests (int): The total number of requests.
+
+    Returns:
+        dict: The throughput (requests per second), latency percentiles (ms) and server counters.
+    """
+    paths = list_images(images)
+    if not paths:
+        raise FileNotFoundError(f'No images found in {images}')
+    bodies = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            bodies.append(f.read())
+
+    local = threading.local()
+    def request(i):
+        if not hasattr(local, 'client'):
+            local.client = DetectorClient(url)
+        t = time.perf_counter()
+        local.client.detect(bodies[i % len(bodies)])
+        return time.perf_counter() - t
+
+    before = DetectorClient(url).health()
+    t = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = list(executor.map(request, range(requests)))
+    elapsed = time.perf_counter() - t
+    after = DetectorClient(url).health()
+
+    batches = after['batches'] - before['batches']
+    report = dict(requests=requests,
+                  concurrency=concurrency,
+                  throughput=round(requests / elapsed, 1),
+                  latency_ms=dict(p50=round(float(np.percentile(latencies, 50)) * 1E3, 1),
+                                  p95=round(float(np.percentile(latencies, 95)) * 1E3, 1)),
+                  avg_batch_size=round((after['requests'] - before['requests']) / batches, 2) if batches else 0)
+    print(f"{requests} requests with {concurrency} concurrent clients in {elapsed:.1f}s: {report['throughput']} req/s, "
+          f"latency p50 {report['latency_ms']['p50']}ms p95 {report['latency_ms']['p95']}ms, "
+          f"average batch size {report['avg_batch_size']}")
+    return report
+
+def parse_opt():
+    """
+    Parse command line arguments for inference server benchmark.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Inference server benchmark')
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8765', help='server URL, i.e. unix:///tmp/poop-detector.sock')
+    parser.add_argument('--images', type=str, default='dataset/images', help='folder of images to send')
+    parser.add_argument('--concurrency', type=int, default=8, help='number of concurrent clients')
+    parser.add_argument('--requests', type=int, default=200, help='total number of requests')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
@@ -0,0 +1,108 @@
+import time
+import argparse
+
+from yolov5.utils.augmentations import letterbox
+from utils.streams import open_capture
+
+def benchmark(source, vid_stride=1, hw_decode=False, imgsz=640, frames=None):
+    """
+    Measures the decode cost of a video, grabbing (decoding) every frame but retrieving (converting to BGR)
+    and letterboxing only every `vid_stride`-th frame.
+
+    Args:
+        source (str): The video file or stream.
+        vid_stride (int): Retrieve every `vid_stride`-th frame.
+        hw_decode (bool): Decode on any available hardware decoder.
+        imgsz (int): The inference size frames are letterboxed to.
+        frames (int): The maximum number of frames, None for the whole video.
+
+    Returns:
+        dict: The number of frames, frame size and grab, retrieve, letterbox & total cost (ms) per frame of the video.
+    """
+    cap = open_capture(source, hw_decode=hw_decode)
+    if not cap.isOpened():
+        raise FileNotFoundError(f'Failed to open {source}')
+    n, shape, dt = 0, None, [0.0, 0.0, 0.0]
+    while frames is None or n < frames:
+        t = time.perf_counter()
+        if not cap.grab():
+            break
+        dt[0] += time.perf_counter() - t
+        n += 1
+        if n % vid_stride:
+            continue
+        t = time.perf_counter()
+        success, im = cap.retrieve()
+        dt[1] += time.perf_counter() - t
+        if not success:
+            break
+        t = time.perf_counter()
+        letterbox(im, imgsz, auto=True)
+        dt[2] += time.perf_counter() - t
+        shape = im.shape
+    cap.release()
+
+    ms = [x / max(n, 1) * 1E3 for x in dt]
+    return dict(frames=n,
+                size=f'{shape[1]}x{shape[0]}' if shape else None,
+                grab_ms=round(ms[0], 2),
+                retrieve_ms=round(ms[1], 2),
+                letterbox_ms=round(ms[2], 2),
+                total_ms=round(sum(ms), 2))
+
+def run(source='dataset/tests/test1.mp4',
+        vid_stride=[1, 2, 4],
+        hw_decode=False,
+        imgsz=640,
+        frames=None,
+    ):
+    """
+    Benchmarks the decode cost per video frame for `vid_stride` values, against retrieving every frame.
+    Frames skipped by `vid_stride` (or by live.py while the previous frame waits for inference) are only
+    grabbed, skipping the BGR conversion.
+
+    Args:
+        source (str): The video file or stream.
+        vid_stride (list): The strides to compare.
+        hw_decode (bool): Decode on any available hardware decoder.
+        imgsz (int): The inference size frames are letterboxed to.
+        frames (int): The maximum number of frames, None for the whole video.
+
+    Returns:
+        list: The benchmark results, per stride.
+    """
+    results = []
+    for stride in vid_stride:
+        r = benchmark(source, stride, hw_decode, imgsz, frames)
+        results.append(dict(vid_stride=stride, **r))
+
+    base = results[0]['total_ms']
+    print(f"{source} ({results[0]['size']}, {results[0]['frames']} frames{', hw decode' if hw_decode else ''})")
+    print(f"{'vid_stride':>10} {'grab ms':>8} {'retrieve ms':>12} {'letterbox ms':>13} {'total ms':>9} {'speedup':>8}")
+    for r in results:
+        print(f"{r['vid_stride']:>10} {r['grab_ms']:>8.2f} {r['retrieve_ms']:>12.2f} {r['letterbox_ms']:>13.2f} "
+              f"{r['total_ms']:>9.2f} {base / r['total_ms']:>7.2f}x")
+    return results
+
+def parse_opt():
+    """
+    Parse command line arguments for decode benchmark.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Video decode benchmark')
+    parser.add_argument('--source', type=str, default='dataset/tests/test1.mp4', help='video file or stream')
+    parser.add_argument('--vid-stride', nargs='+', type=int, default=[1, 2, 4], help='video frame-rate strides to compare')
+    parser.add_argument('--hw-decode', action='store_true', help='decode on any available hardware decoder')
+    parser.add_argument('--imgsz', type=int, default=640, help='inference size frames are letterboxed to')
+    parser.add_argument('--frames', type=int, default=None, help='maximum number of frames')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
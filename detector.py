@@ -1,15 +1,11 @@
-import os
 import time
 import math
-import threading
 import numpy as np
-from datetime import datetime
 from collections import Counter
 from utils.value import ValueTracker
 from collections import deque
-from utils.sound import play_audio_file
 from utils.pushbullet import INotification
-from yolov5.utils.general import cv2
+from utils.alert import AlertManager
 
 CLASS_OF_INTEREST = ['poop', 'cotton']
 MIN_QUEUE_LENGTH = 3
@@ -29,6 +25,10 @@ class PoopDetector:
                  confirm_sec = 3, # time to confirm if there is poop
                  confirm_thres = 0.75, # poop confirmation threshold
                  alert_snooze_sec = 300, # alert snooze period (in seconds)
+                 hard_negatives = None, # hard negative collector
+                 clock = time.time, # time source, injectable for replaying recorded detections
+                 alerts = None, # alert manager, shared between detectors of several streams
+                 stream = 0, # stream (camera) id reported to the alert manager
         ):
         """
         Initializes a PoopDetector object.
@@ -43,16 +43,27 @@ class PoopDetector:
             confirm_sec: The time (in seconds) to confirm if there is poop.
             confirm_thres: The poop confirmation threshold.
             alert_snooze_sec: The alert snooze period (in seconds).
+            hard_negatives: An optional HardNegativeCollector, frames with detections rejected
+            by poop confirmation are captured into it.
+            clock: The function returning the current time (in seconds), defaults to `time.time`.
+            alerts: An optional AlertManager deciding which confirmations alert, by default one is created
+            from the alert & notification arguments.
+            stream: The stream (camera) id reported to the alert manager.
         """
         self.log = logger
-        self.notifier = notifier
-        self.sound = sound
+        self.hard_negatives = hard_negatives
+        self.stream = stream
+        self._clock = clock
 
         # for alert & notification
-        self.no_alert = no_alert
-        self.no_notify = no_notify
         self.notify_img = notify_img
-        self._alert_snooze_period_seconds = alert_snooze_sec
+        self.alerts = alerts or AlertManager(notifier=notifier,
+                                             sound=sound,
+                                             no_alert=no_alert,
+                                             no_notify=no_notify,
+                                             snooze_sec=alert_snooze_sec,
+                                             logger=logger,
+                                             clock=clock)
 
         # for measuring fps
         self.fps = 0.0
@@ -73,10 +84,9 @@ class PoopDetector:
 
         # for poop detection rolling average
         self._rolling_avg = ValueTracker(initial_value=0)
-        self._last_poop_check_time = time.time()
-        self._last_poop_confirmed_time = 0
+        self._last_poop_check_time = self._clock()
 
-    def process_detection(self, model, pred, im0):
+    def process_detection(self, model, pred, im0, raw=None):
         """
         Processes the detection results, including measuring processing speed, adjusting queue length, counting detected objects,
         logging changes in detected class counts, updating the poop detection queue, and checking for confirmed poop.
@@ -85,6 +95,27 @@ class PoopDetector:
             model: The object detection model used for prediction.
             pred: The prediction result from the model.
             im0: The original image on which the detection was performed.
+            raw: The unannotated copy of `im0`, only needed for hard negative collection.
+
+        Returns:
+            True if poop was confirmed and an alert was raised, False otherwise.
+        """
+        # counts the number of detected objects for each class in the given prediction
+        return self.process_class_counts(self.detected_class_counts(model, pred), im0, raw, pred[0])
+
+    def process_class_counts(self, class_counts, im0=None, raw=None, det=None):
+        """
+        Processes the detected class counts of a frame, this is what `process_detection` does once
+        the prediction is counted, and is fed directly when replaying recorded detections.
+
+        Args:
+            class_counts: A Counter object that maps each class label to the number of detected objects.
+            im0: The original image on which the detection was performed, None when replaying.
+            raw: The unannotated copy of `im0`, only needed for hard negative collection.
+            det: The detections of the frame, only needed for hard negative collection.
+
+        Returns:
+            True if poop was confirmed and an alert was raised, False otherwise.
         """
         # measure detection processing speed (in fps)
         self.measure_fps()
@@ -93,8 +124,7 @@ class PoopDetector:
         if self._queue_length.current == 0 and self.fps > 0:
             self.reset_queue()
 
-        # counts the number of detected objects for each class in the given prediction
-        self._detected_class_count.update(self.detected_class_counts(model, pred))
+        self._detected_class_count.update(class_counts)
         detected_class_and_counts_text = ', '.join([f"{class_label}: {count}" for class_label, count in self._detected_class_count.current.items()])
 
         # log when detected class count changed
@@ -114,17 +144,28 @@ class PoopDetector:
                                       for item in CLASS_OF_INTEREST)
         self._poop_detect_queue.append(1 if class_of_interest_found else 0)
 
+        # hold frame until poop confirmation decides whether the detections were real
+        if self.hard_negatives is not None and class_of_interest_found and raw is not None:
+            self.hard_negatives.hold(raw, det)
+
         # Check if it's time to check the rolling average for poop confirmation
-        if time.time() < self._last_poop_check_time + self._poop_confirm_seconds:
-            return
+        if self._clock() < self._last_poop_check_time + self._poop_confirm_seconds:
+            return False
 
         # update last poop check time
-        self._last_poop_check_time = time.time()
+        self._last_poop_check_time = self._clock()
 
         # Check if poop is confirmed
-        if self.check_poop_confirmation():
-            # Poop is confirmed, perform actions for poop confirmation
-            self.poop_confirmed(im0)
+        confirmed = self.check_poop_confirmation()
+
+        if self.hard_negatives is not None:
+            self.hard_negatives.resolve(confirmed)
+
+        if not confirmed:
+            return False
+
+        # Poop is confirmed, perform actions for poop confirmation
+        return self.poop_confirmed(im0, det)
 
     def measure_fps(self) -> float:
         """
@@ -136,9 +177,9 @@ class PoopDetector:
         self._fps_cnt += 1  # Increment frame count by 1
 
         if self._fps_cnt == 1:  # If it's the first frame
-            self._fps_measure_start = time.time()  # Start measuring time
+            self._fps_measure_start = self._clock()  # Start measuring time
 
-        elapsed = time.time() - self._fps_measure_start  # Calculate elapsed time since measurement started
+        elapsed = self._clock() - self._fps_measure_start  # Calculate elapsed time since measurement started
 
         if elapsed > self._fps_refresh_sec:  # If more than 10 seconds have passed
             self.fps = self._fps_cnt / elapsed # Calculate FPS by dividing frame count by elapsed time
@@ -213,109 +254,25 @@ class PoopDetector:
 
         self._poop_detect_queue = deque([0] * self._queue_length.current , maxlen=self._queue_length.current)
 
-    def poop_confirmed(self, im0):
+    def poop_confirmed(self, im0, det=None):
         """
-        Performs actions when poop is confirmed, such as playing an alert sound and sending a notification.
+        Performs actions when poop is confirmed, the alert manager plays the alert sound and sends
+        a notification unless the alert is snoozed or a duplicate of another stream's alert.
 
         Args:
-            im: The image related to the poop detection.
-        """
-        self.log.info("Poop confirmed")
-
-        # calculate elapsed time (in seconds) since last poop confirmation
-        last_poop_confirmed_elapsed_seconds = time.time() - self._last_poop_confirmed_time
-
-        # update poop last confirmed time
-        self._last_poop_confirmed_time = time.time()
-
-        # sound alert & send notification if exceeded alert snooze period since last poop confirmed time
-        if last_poop_confirmed_elapsed_seconds < self._alert_snooze_period_seconds:
-            return
-
-        im1 = im0.copy()
-
-        # play alert sound on another thread
-        if not self.no_alert:
-            threading.Thread(target=self.play_alert).start()
-
-        # send notification on another thread
-        if not self.no_notify:
-            if self.notify_img:
-                threading.Thread(target=self.push_text_img, args=(im1,)).start()
-            else:
-                threading.Thread(target=self.push_text).start()
-
-    def play_alert(self):
-        """
-        Plays the alert sound specified by `self.sound`.
-
-        This method logs the alert being played and then plays the audio file.
-
-        Parameters:
-        - None
+            im0: The image related to the poop detection.
+            det: The detections of the frame, for deduplicating alerts across streams.
 
         Returns:
-        - None
-        """
-        self.log.info(f"Playing alert '{self.sound}'")
-        play_audio_file(self.sound)
-
-    def push_text(self):
-        """
-        Pushes a text notification indicating that a dog has pooped.
-        """
-        self.log.info("Pushing text")
-        now_str = datetime.now().strftime("%I:%M:%S %p")
-        self.notifier.text(f'{now_str} - Dog pooped!')
-
-    def push_file(self, filepath, msg=None, title=None):
-        """
-        Pushes a file to the notifier with an optional message and title.
-
-        Args:
-            filepath (str): The path to the file to be pushed.
-            msg (str, optional): The message to be included with the file. Defaults to None.
-            title (str, optional): The title of the file. Defaults to None.
-        """
-        self.log.info("Pushing text & image")
-        self.notifier.file(filepath, msg, title)
-
-    def push_text_img(self, im0):
+            True if an alert was raised, False if snoozed.
         """
-        Pushes the image with a text indicating that a dog has pooped.
-
-        Args:
-            im0 (numpy.ndarray): The input image.
-
-        Returns:
-            None
-        """
-        filepath = self.save_image(im0)
-        now_str = datetime.now().strftime("%I:%M:%S %p")
-        self.push_file(filepath, f'{now_str} - Dog pooped!')
-
-    def save_image(self, im0):
-        """
-        Saves the input image to a file in the temporary folder.
-
-        Args:
-            im0 (numpy.ndarray): The input image to be saved.
-
-        Returns:
-            str: The file path of the saved image.
-        """
-        # use current time as output filename with the .jpg extension
-        filename = f'poop-{datetime.now().strftime("%Y%m%d-%H%M%S")}.jpg'
-
-        # Specify the path to the temporary folder
-        folder_path = 'temp/'
-
-        # Create the folder if it doesn't exist
-        os.makedirs(folder_path, exist_ok=True)
-
-        file_path = os.path.join(folder_path, filename)
+        self.log.info("Poop confirmed")
 
-        # save image
-        cv2.imwrite(file_path, im0)
+        boxes = None
+        if det is not None and im0 is not None and len(det):
+            h, w = im0.shape[:2]
+            boxes = [(x1 / w, y1 / h, x2 / w, y2 / h) for x1, y1, x2, y2 in det[:, :4].tolist()]
 
-        return file_path
+        return self.alerts.alert(stream=self.stream,
+                                 boxes=boxes,
+                                 image=im0 if self.notify_img else None)
@@ -0,0 +1,267 @@
+import os
+import time
+import argparse
+import numpy as np
+import torch
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+import evaluate
+from train import delete_label_cache, elapsed_time
+from utils.dataset import IMG_EXTENSIONS, list_images, load_data, split_images
+from utils.hardneg import dhash, hamming
+
+from yolov5 import train
+from yolov5.models.common import DetectMultiBackend
+from yolov5.utils.augmentations import letterbox
+from yolov5.utils.general import ROOT, check_img_size, cv2, non_max_suppression, scale_boxes, xyxy2xywhn
+from yolov5.utils.torch_utils import select_device
+
+VID_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.ts')
+
+def extract_frames(footage, output, frame_stride=30, dedupe_dist=4):
+    """
+    Extracts frames from footage videos (and copies unlabeled images) into a folder, skipping
+    near-identical frames since static camera footage is mostly the same scene.
+
+    Args:
+        footage (list): The footage video files, or folders of videos & images.
+        output (str): The folder to write frames to.
+        frame_stride (int): Keep every n-th video frame.
+        dedupe_dist (int): Frames within this hamming distance of the previous kept frame are
+        skipped.
+
+    Returns:
+        list: The extracted frame file paths.
+    """
+    os.makedirs(output, exist_ok=True)
+
+    files = []
+    for f in footage:
+        files += [os.path.join(f, x) for x in sorted(os.listdir(f))] if os.path.isdir(f) else [f]
+
+    frames = []
+    for f in files:
+        name, ext = os.path.splitext(os.path.basename(f))
+        if ext.lower() in IMG_EXTENSIONS:
+            frame_path = os.path.join(output, f'pseudo-{name}.jpg')
+            Image.open(f).convert('RGB').save(frame_path, quality=95)
+            frames.append(frame_path)
+            continue
+
+        if ext.lower() not in VID_EXTENSIONS:
+            continue
+
+        cap, n, last_hash = cv2.VideoCapture(f), 0, None
+        while cap.grab():  # grab without decoding skipped frames
+            n += 1
+            if n % frame_stride:
+                continue
+            success, im = cap.retrieve()
+            if not success:
+                break
+            h = dhash(Image.fromarray(im[..., ::-1]))
+            if last_hash is not None and hamming(h, last_hash) <= dedupe_dist:
+                continue
+            last_hash = h
+            frame_path = os.path.join(output, f'pseudo-{name}-{n}.jpg')
+            cv2.imwrite(frame_path, im)
+            frames.append(frame_path)
+        cap.release()
+        print(f'{f}: {n} frames, {len(frames)} kept so far')
+
+    return frames
+
+@torch.no_grad()
+def pseudo_label(teacher, frames, labels_dir, imgsz=640, conf_thres=0.5, iou_thres=0.45, batch_size=16, device='cpu',
+                 workers=8):
+    """
+    Writes YOLO labels for frames from the teacher model's detections.
+
+    Args:
+        teacher (str): The teacher model path.
+        frames (list): The frame file paths.
+        labels_dir (str): The folder to write labels to.
+        imgsz (int): The teacher inference size (pixels).
+        conf_thres (float): The confidence threshold of pseudo labels.
+        iou_thres (float): The NMS IoU threshold.
+        batch_size (int): The teacher inference batch size.
+        device (str): The device, i.e. cpu or 0.
+        workers (int): The number of image loading threads.
+
+    Returns:
+        int: The number of pseudo labeled objects.
+    """
+    os.makedirs(labels_dir, exist_ok=True)
+    device = select_device(device)
+    model = DetectMultiBackend(teacher, device=device)
+    stride = model.stride
+    imgsz = check_img_size([imgsz, imgsz], s=stride)
+
+    def load(path):
+        im0 = cv2.imread(path)
+        im = letterbox(im0, imgsz, stride=stride, auto=False)[0]
+        return np.ascontiguousarray(im.transpose((2, 0, 1))[::-1]), im0.shape
+
+    objects = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        loaded = executor.map(load, frames)
+        for paths in evaluate.batched(frames, batch_size):
+            batch = [next(loaded) for _ in paths]
+            im = torch.from_numpy(np.stack([x[0] for x in batch])).to(device).float() / 255
+            pred = non_max_suppression(model(im), conf_thres, iou_thres)
+
+            for path, det, (_, shape) in zip(paths, pred, batch):
+                det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], shape)
+                xywhn = xyxy2xywhn(det[:, :4], w=shape[1], h=shape[0]).cpu().numpy()
+                name = os.path.splitext(os.path.basename(path))[0]
+                with open(os.path.join(labels_dir, f'{name}.txt'), 'w') as f:
+                    f.write(''.join(f'{int(c)} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n'
+                                    for c, (x, y, w, h) in zip(det[:, 5].tolist(), xywhn)))
+                objects += len(det)
+
+    return objects
+
+def student_cfg(student, width_multiple, output):
+    """
+    Writes a width-reduced copy of a yolov5 model configuration.
+
+    Args:
+        student (str): The student weights, i.e. yolov5n.pt, its yaml is used as the base.
+        width_multiple (float): The layer channel multiple.
+        output (str): The yaml file to write.
+
+    Returns:
+        str: The yaml file path.
+    """
+    base = ROOT / 'models' / (os.path.splitext(os.path.basename(student))[0] + '.yaml')
+    with open(base) as f:
+        cfg = yaml.safe_load(f)
+    cfg['width_multiple'] = width_multiple
+    with open(output, 'w') as f:
+        yaml.safe_dump(cfg, f, sort_keys=False)
+    return output
+
+def run(teacher='best.pt',
+        student='yolov5n.pt',
+        width_multiple=None,
+        footage=('dataset/tests',),
+        data='dataset.yaml',
+        frame_stride=30,
+        dedupe_dist=4,
+        pseudo_conf=0.5,
+        imgsz=640,
+        epochs=100,
+        batch_size=16,
+        device='cpu',
+        workers=8,
+        project='runs/distill',
+    ):
+    """
+    Distills the teacher model into a smaller student model. The teacher pseudo labels unlabeled
+    footage frames, and the student is trained on the labeled train split plus the pseudo labeled
+    frames, then both are evaluated on the val split.
+
+    Args:
+        teacher (str): The teacher model path.
+        student (str): The student initial weights, i.e. yolov5n.pt.
+        width_multiple (float, optional): Train a width-reduced student with this layer channel
+        multiple. Defaults to None.
+        footage (tuple): The unlabeled footage videos, or folders of videos & images.
+        data (str): The dataset yaml file path.
+        frame_stride (int): Keep every n-th footage video frame.
+        dedupe_dist (int): Skip footage frames within this hamming distance of the previous frame.
+        pseudo_conf (float): The confidence threshold of teacher pseudo labels.
+        imgsz (int): The train & inference image size (pixels).
+        epochs (int): The number of student training epochs.
+        batch_size (int): The training batch size.
+        device (str): The device, i.e. cpu or 0.
+        workers (int): The number of dataloader workers.
+        project (str): The folder to save the distillation dataset & training run to.
+
+    Returns:
+        dict: The teacher & student evaluation reports.
+    """
+    start_time = time.time()
+    project = os.path.abspath(project)
+    data_dir = os.path.join(project, 'data')
+
+    # pseudo label unlabeled footage with teacher
+    frames = extract_frames(footage, os.path.join(data_dir, 'images'), frame_stride, dedupe_dist)
+    objects = pseudo_label(teacher, frames, os.path.join(data_dir, 'labels'), imgsz, pseudo_conf,
+                           batch_size=batch_size, device=device, workers=workers)
+    print(f'Teacher pseudo labeled {objects} objects in {len(frames)} frames')
+
+    # distillation dataset, labeled train split + pseudo labeled frames, validated on val split
+    cfg = load_data(data)
+    for split, images in (('train', split_images(data, 'train') + list_images(os.path.join(data_dir, 'images'))),
+                          ('val', split_images(data, 'val'))):
+        with open(os.path.join(data_dir, f'{split}.txt'), 'w') as f:
+            f.write(''.join(f'{os.path.abspath(image)}\n' for image in images))
+    distill_data = os.path.join(project, 'data.yaml')
+    with open(distill_data, 'w') as f:
+        yaml.safe_dump(dict(path=data_dir, train='train.txt', val='val.txt', nc=len(cfg['names']),
+                            names=dict(enumerate(cfg['names']))), f, sort_keys=False)
+
+    # train student
+    delete_label_cache()
+    opt = train.run(weights=student,
+                    cfg=student_cfg(student, width_multiple, os.path.join(project, 'student.yaml')) if width_multiple else '',
+                    data=distill_data,
+                    epochs=epochs,
+                    batch_size=batch_size,
+                    imgsz=imgsz,
+                    device=device,
+                    workers=workers,
+                    project=project,
+                    name='student',
+                    exist_ok=True)
+    student_best = os.path.join(opt.save_dir, 'weights', 'best.pt')
+
+    # compare teacher & student
+    reports = {}
+    for role, weights in (('teacher', teacher), ('student', student_best)):
+        reports[role] = evaluate.run(weights=weights, data=data, split='val', imgsz=imgsz, device=device,
+                                     verbose=False)
+
+    print(f"{'model':>10}{'mAP50':>8}{'mAP50-95':>10}{'latency':>10}")
+    for role, report in reports.items():
+        print(f"{role:>10}{report['map50']:>8.3f}{report['map']:>10.3f}{report['latency_ms']['p50']:>8.1f}ms")
+    speedup = reports['teacher']['latency_ms']['p50'] / reports['student']['latency_ms']['p50']
+    print(f'Student is {speedup:.1f}x faster, saved to {student_best}')
+    elapsed_time(time.time() - start_time)
+
+    return reports
+
+def parse_opt():
+    """
+    Parse command line arguments for knowledge distillation tool.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Knowledge distillation tool')
+    parser.add_argument('--teacher', type=str, default='best.pt', help='teacher model path')
+    parser.add_argument('--student', type=str, default='yolov5n.pt', help='student initial weights')
+    parser.add_argument('--width-multiple', type=float, default=None, help='train width-reduced student, i.e. 0.125')
+    parser.add_argument('--footage', nargs='+', type=str, default=['dataset/tests'], help='unlabeled footage videos or folders')
+    parser.add_argument('--data', type=str, default='dataset.yaml', help='dataset.yaml path')
+    parser.add_argument('--frame-stride', type=int, default=30, help='keep every n-th footage frame')
+    parser.add_argument('--dedupe-dist', type=int, default=4, help='skip footage frames within this hash distance')
+    parser.add_argument('--pseudo-conf', type=float, default=0.5, help='confidence threshold of teacher pseudo labels')
+    parser.add_argument('--imgsz', '--img', '--img-size', type=int, default=640, help='train, val image size (pixels)')
+    parser.add_argument('--epochs', type=int, default=100, help='total training epochs')
+    parser.add_argument('--batch-size', type=int, default=16, help='training batch size')
+    parser.add_argument('--device', default='cpu', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
+    parser.add_argument('--workers', type=int, default=8, help='max dataloader workers')
+    parser.add_argument('--project', default='runs/distill', help='save to project')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
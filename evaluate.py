@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+import torch
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.dataset import label_path, read_labels, split_images
+
+from yolov5.models.common import DetectMultiBackend
+from yolov5.utils.augmentations import letterbox
+from yolov5.utils.general import Profile, check_img_size, cv2, non_max_suppression, scale_boxes
+from yolov5.utils.metrics import ap_per_class
+from yolov5.utils.torch_utils import select_device
+from yolov5.val import process_batch
+
+def load_image(path, imgsz, stride):
+    """
+    Loads an image and its labels, letterboxed for batched inference.
+
+    Args:
+        path (str): The image file path.
+        imgsz (list): The inference size (height, width).
+        stride (int): The model stride.
+
+    Returns:
+        tuple: The CHW RGB letterboxed image, the original image shape and the labels (M x 5 of
+        cls, x1, y1, x2, y2) in original image pixels.
+    """
+    im0 = cv2.imread(path)  # BGR
+    h, w = im0.shape[:2]
+    im = letterbox(im0, imgsz, stride=stride, auto=False)[0]
+    im = np.ascontiguousarray(im.transpose((2, 0, 1))[::-1])  # HWC to CHW, BGR to RGB
+
+    labels = np.array(read_labels(label_path(path)), dtype=np.float32).reshape(-1, 5)
+    xyxy = np.empty_like(labels)
+    xyxy[:, 0] = labels[:, 0]
+    xyxy[:, 1] = (labels[:, 1] - labels[:, 3] / 2) * w
+    xyxy[:, 2] = (labels[:, 2] - labels[:, 4] / 2) * h
+    xyxy[:, 3] = (labels[:, 1] + labels[:, 3] / 2) * w
+    xyxy[:, 4] = (labels[:, 2] + labels[:, 4] / 2) * h
+
+    return im, im0.shape, xyxy
+
+def batched(items, n):
+    """
+    Splits a list into consecutive batches of size `n`.
+    """
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+@torch.no_grad()
+def run(weights='best.pt',
+        data='dataset.yaml',
+        split='val',
+        imgsz=640,
+        batch_size=16,
+        conf_thres=0.001,
+        iou_thres=0.6,
+        max_det=300,
+        device='cpu',
+        workers=8,
+        half=False,
+        dnn=False,
+        latency_runs=20,
+        output=None,
+        verbose=True,
+    ):
+    """
+    Evaluates a model (any format supported by DetectMultiBackend, i.e. .pt, .torchscript, .onnx,
+    openvino) on a dataset split, reporting per-class precision, recall, mAP and latency.
+
+    Args:
+        weights (str): The model path.
+        data (str): The dataset yaml file path.
+        split (str): The dataset split to evaluate on.
+        imgsz (int): The inference size (pixels).
+        batch_size (int): The inference batch size, forced to 1 for non-PyTorch models.
+        conf_thres (float): The confidence threshold.
+        iou_thres (float): The NMS IoU threshold.
+        max_det (int): The maximum detections per image.
+        device (str): The device, i.e. cpu or 0.
+        workers (int): The number of image loading threads.
+        half (bool): Use FP16 half-precision inference.
+        dnn (bool): Use OpenCV DNN for ONNX inference.
+        latency_runs (int): The number of batch size 1 runs to measure end-to-end latency.
+        output (str, optional): The JSON file to write the report to. Defaults to None.
+        verbose (bool): Print the report.
+
+    Returns:
+        dict: The evaluation report.
+    """
+    # Load model
+    device = select_device(device)
+    model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
+    stride, names, pt, jit = model.stride, model.names, model.pt, model.jit
+    imgsz = check_img_size([imgsz, imgsz] if isinstance(imgsz, int) else imgsz, s=stride)
+    if not (pt or jit):
+        batch_size = 1  # export.py models default to batch-size 1
+    iouv = torch.linspace(0.5, 0.95, 10, device=device)  # iou vector for mAP@0.5:0.95
+
+    images = split_images(data, split)
+    assert images, f"No images found in '{split}' split of {data}"
+
+    # warmup
+    model(torch.zeros(1, 3, *imgsz, dtype=torch.half if model.fp16 else torch.float, device=device))
+
+    stats, dt = [], (Profile(), Profile(), Profile())
+    start_time = time.time()
+
+    # decode & letterbox images in parallel, while the model runs on the previous batch
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # decode at most 2 batches ahead, decoded images of a large split wouldn't fit in memory
+        pending = deque()
+        batches = batched(images, batch_size)
+        for paths in itertools.islice(batches, 2):
+            pending.append([executor.submit(load_image, p, imgsz, stride) for p in paths])
+        while pending:
+            batch = [future.result() for future in pending.popleft()]
+            for paths in itertools.islice(batches, 1):
+                pending.append([executor.submit(load_image, p, imgsz, stride) for p in paths])
+
+            with dt[0]:
+                im = torch.from_numpy(np.stack([x[0] for x in batch])).to(device)
+                im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
+                im /= 255  # 0 - 255 to 0.0 - 1.0
+
+            with dt[1]:
+                pred = model(im)
+
+            with dt[2]:
+                pred = non_max_suppression(pred, conf_thres, iou_thres, max_det=max_det)
+
+            for det, (_, shape, labels) in zip(pred, batch):
+                labels = torch.from_numpy(labels).to(device)
+                det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], shape)
+                if len(det) and len(labels):
+                    correct = process_batch(det, labels, iouv)
+                else:
+                    correct = torch.zeros(len(det), len(iouv), dtype=torch.bool, device=device)
+                stats.append((correct.cpu(), det[:, 4].cpu(), det[:, 5].cpu(), labels[:, 0].cpu()))
+
+    elapsed = time.time() - start_time
+
+    # compute metrics
+    stats = [torch.cat(x, 0).numpy() for x in zip(*stats)]
+    nt = np.bincount(stats[3].astype(int), minlength=len(names))  # number of targets per class
+    classes = {}
+    mp = mr = map50 = map = 0.0
+    if len(stats[0]) and stats[0].any():
+        tp, fp, p, r, f1, ap, ap_class = ap_per_class(*stats, names=names)
+        ap50, ap = ap[:, 0], ap.mean(1)  # AP@0.5, AP@0.5:0.95
+        mp, mr, map50, map = p.mean(), r.mean(), ap50.mean(), ap.mean()
+        for i, c in enumerate(ap_class):
+            classes[names[c]] = dict(instances=int(nt[c]), precision=float(p[i]), recall=float(r[i]),
+                                     map50=float(ap50[i]), map=float(ap[i]))
+
+    # measure end-to-end batch size 1 latency
+    latencies = []
+    for path in images[:latency_runs]:
+        t = time.perf_counter()
+        im = torch.from_numpy(load_image(path, imgsz, stride)[0]).to(device)[None]
+        im = im.half() if model.fp16 else im.float()
+        non_max_suppression(model(im / 255), conf_thres, iou_thres, max_det=max_det)
+        latencies.append((time.perf_counter() - t) * 1E3)
+
+    report = dict(
+        weights=str(weights),
+        split=split,
+        imgsz=list(imgsz),
+        images=len(images),
+        instances=int(nt.sum()),
+        precision=float(mp),
+        recall=float(mr),
+        map50=float(map50),
+        map=float(map),
+        classes=classes,
+        speed_ms=dict(zip(('preprocess', 'inference', 'nms'), (x.t / len(images) * 1E3 for x in dt))),
+        latency_ms=dict(p50=float(np.percentile(latencies, 50)), p95=float(np.percentile(latencies, 95))),
+        elapsed_sec=elapsed,
+    )
+
+    if verbose:
+        print_report(report)
+
+    if output:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    return report
+
+def print_report(report):
+    """
+    Prints an evaluation report as a table.
+
+    Args:
+        report (dict): The evaluation report returned by `run`.
+    """
+    print(f"{'class':>10}{'images':>8}{'labels':>8}{'P':>8}{'R':>8}{'mAP50':>8}{'mAP50-95':>10}")
+    print(f"{'all':>10}{report['images']:>8}{report['instances']:>8}{report['precision']:>8.3f}" +
+          f"{report['recall']:>8.3f}{report['map50']:>8.3f}{report['map']:>10.3f}")
+    for name, c in report['classes'].items():
+        print(f"{name:>10}{'':>8}{c['instances']:>8}{c['precision']:>8.3f}{c['recall']:>8.3f}" +
+              f"{c['map50']:>8.3f}{c['map']:>10.3f}")
+    speed, latency = report['speed_ms'], report['latency_ms']
+    print(f"Speed: {speed['preprocess']:.1f}ms pre-process, {speed['inference']:.1f}ms inference, " +
+          f"{speed['nms']:.1f}ms NMS per image at shape {tuple(report['imgsz'])}")
+    print(f"Latency (batch size 1): {latency['p50']:.1f}ms p50, {latency['p95']:.1f}ms p95")
+    print(f"Evaluated {report['images']} images in {report['elapsed_sec']:.1f}s")
+
+def parse_opt():
+    """
+    Parse command line arguments for model evaluation tool.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Model evaluation tool')
+    parser.add_argument('--weights', type=str, default='best.pt', help='model path (.pt, .torchscript, .onnx, openvino)')
+    parser.add_argument('--data', type=str, default='dataset.yaml', help='dataset.yaml path')
+    parser.add_argument('--split', type=str, default='val', help='dataset split to evaluate on')
+    parser.add_argument('--imgsz', '--img', '--img-size', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--batch-size', type=int, default=16, help='inference batch size')
+    parser.add_argument('--conf-thres', type=float, default=0.001, help='confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.6, help='NMS IoU threshold')
+    parser.add_argument('--max-det', type=int, default=300, help='maximum detections per image')
+    parser.add_argument('--device', default='cpu', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
+    parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1), help='image loading threads')
+    parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
+    parser.add_argument('--dnn', action='store_true', help='use OpenCV DNN for ONNX inference')
+    parser.add_argument('--latency-runs', type=int, default=20, help='batch size 1 runs to measure latency')
+    parser.add_argument('--output', type=str, default=None, help='write report to JSON file')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
@@ -0,0 +1,105 @@
+import csv
+import time
+import argparse
+import numpy as np
+from datetime import datetime
+
+from utils.clock import parse_time
+from utils.eventstore import EventStore
+
+def format_time(t):
+    return datetime.fromtimestamp(t).strftime('%Y-%m-%d %H:%M:%S')
+
+def group_episodes(records, gap_sec):
+    """
+    Groups detections into episodes, a new episode starts after `gap_sec` without detections.
+
+    Args:
+        records (numpy.ndarray): The records of one stream & class, oldest first.
+        gap_sec (float): The gap (in seconds) that separates episodes.
+
+    Returns:
+        list: The (start, end, detections, max confidence) of each episode.
+    """
+    if not len(records):
+        return []
+    breaks = np.flatnonzero(np.diff(records['t']) > gap_sec) + 1
+    return [(r['t'][0], r['t'][-1], len(r), float(r['conf'].max())) for r in np.split(records, breaks)]
+
+def run(store='runs/events',
+        start=None,
+        end=None,
+        stream=None,
+        cls=None,
+        min_conf=0.0,
+        gap_sec=60,
+        output=None,
+    ):
+    """
+    Queries detections in an event store and prints them grouped into episodes per stream & class.
+
+    Args:
+        store (str): The event store folder.
+        start (str, optional): The start time, epoch seconds or `YYYY-mm-dd HH:MM:SS`.
+        end (str, optional): The end time, epoch seconds or `YYYY-mm-dd HH:MM:SS`.
+        stream (str, optional): Only detections of this stream id or name.
+        cls (str, optional): Only detections of this class id or name, i.e. poop.
+        min_conf (float): Only detections with at least this confidence.
+        gap_sec (float): The gap (in seconds) that separates episodes.
+        output (str, optional): The CSV file to write matching detections to. Defaults to None.
+
+    Returns:
+        numpy.ndarray: The matching records.
+    """
+    t = time.perf_counter()
+    events = EventStore(store)
+    records = events.query(parse_time(start), parse_time(end), stream, cls, min_conf)
+    elapsed_ms = (time.perf_counter() - t) * 1E3
+
+    print(f"{'stream':<24}{'class':>8}{'start':>21}{'end':>21}{'detections':>12}{'max conf':>10}")
+    for s in np.unique(records['stream']):
+        for c in np.unique(records['cls']):
+            selected = records[(records['stream'] == s) & (records['cls'] == c)]
+            stream_name = events.streams[s] if s < len(events.streams) else str(s)
+            for ep_start, ep_end, n, conf in group_episodes(selected, gap_sec):
+                print(f"{stream_name[-24:]:<24}{events.names[c]:>8}{format_time(ep_start):>21}" +
+                      f"{format_time(ep_end):>21}{n:>12}{conf:>10.2f}")
+    print(f'{len(records)} detections found in {elapsed_ms:.1f}ms')
+
+    if output:
+        with open(output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['time', 'stream', 'class', 'conf', 'x1', 'y1', 'x2', 'y2'])
+            for r in records:
+                writer.writerow([format_time(r['t']), events.streams[r['stream']] if r['stream'] < len(events.streams)
+                                 else r['stream'], events.names[r['cls']], round(float(r['conf']), 3),
+                                 *(round(float(r[k]), 1) for k in ('x1', 'y1', 'x2', 'y2'))])
+        print(f'Detections saved to {output}')
+
+    return records
+
+def parse_opt():
+    """
+    Parse command line arguments for detection event query tool.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Detection event query tool')
+    parser.add_argument('--store', type=str, default='runs/events', help='event store folder')
+    parser.add_argument('--start', type=str, default=None, help="start time, i.e. '2024-03-01 08:00:00'")
+    parser.add_argument('--end', type=str, default=None, help="end time, i.e. '2024-03-01 18:00:00'")
+    parser.add_argument('--stream', type=str, default=None, help='stream id or name (camera)')
+    parser.add_argument('--cls', type=str, default=None, help='class id or name, i.e. poop')
+    parser.add_argument('--min-conf', type=float, default=0.0, help='minimum confidence')
+    parser.add_argument('--gap-sec', type=float, default=60, help='gap (in seconds) separating episodes')
+    parser.add_argument('--output', type=str, default=None, help='write matching detections to CSV file')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
@@ -1,22 +1,73 @@
+from utils.startup import IMPORT_START, StartupProfile  # first, times the imports below
+
 import os
 import argparse
 import logging
 import platform
 import torch
 import json
+import time
 
 from pathlib import Path
 
 from utils.pushbullet import INotification, PushbulletNotification
+from utils.hardneg import HardNegativeCollector
+from utils.detlog import DetectionLogWriter
+from utils.eventstore import EventStoreWriter
+from utils.modelcache import cached_weights
+from utils.logger import set_logger
+from utils.alert import AlertManager
+from utils.alertimage import AlertImage
+from utils.streams import ResilientStreams
+from utils.resultcache import ResultCache
+from utils.cascade import ResolutionCascade
+from utils.cpu import apply_cpu_profile
+from utils.profiling import OnDemandProfiler
 from detector import PoopDetector
 
 from yolov5.models.common import DetectMultiBackend
-from yolov5.utils.dataloaders import IMG_FORMATS, VID_FORMATS, LoadImages, LoadScreenshots, LoadStreams
+from yolov5.utils.dataloaders import IMG_FORMATS, VID_FORMATS, LoadImages, LoadScreenshots
 from yolov5.utils.general import (LOGGER, Profile, check_file, check_img_size, check_imshow, check_requirements, colorstr, cv2,
                            increment_path, non_max_suppression, print_args, scale_boxes, strip_optimizer, xyxy2xywh)
 from yolov5.utils.plots import Annotator, colors, save_one_box
 from yolov5.utils.torch_utils import select_device, smart_inference_mode
 
+startup = StartupProfile(IMPORT_START)
+startup.mark('imports')
+
+_models = {}  # loaded models, reused when main restarts run
+
+def load_model(weights='yolov5s.pt', device='', dnn=False, data='dataset.yaml', half=False, imgsz=(640, 640),
+               batch_size=1, cache=None):
+    """
+    Loads the detection model, or reuses it when already loaded with the same arguments.
+
+    Args:
+        weights: The model path or triton URL.
+        device: The cuda device, i.e. 0 or 0,1,2,3 or cpu.
+        dnn: Use OpenCV DNN for ONNX inference.
+        data: The dataset.yaml path.
+        half: Use FP16 half-precision inference.
+        imgsz: The inference size (height, width).
+        batch_size: The inference batch size, the cached artifact is traced for it.
+        cache: The folder to cache a fused TorchScript artifact of .pt weights in, None loads the weights as is.
+
+    Returns:
+        tuple: The model and the inference size checked against the model stride.
+    """
+    key = repr((weights, device, dnn, data, half, list(imgsz), batch_size, cache))
+    if key in _models:
+        return _models[key]
+
+    device = select_device(device)
+    if cache:
+        w = weights[0] if isinstance(weights, list) and len(weights) == 1 else weights
+        weights, _ = cached_weights(w, imgsz, batch_size, device, half, cache)
+    model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
+    imgsz = check_img_size(imgsz, s=model.stride)  # check image size
+    _models[key] = model, imgsz
+    return model, imgsz
+
 def run(
         detector: PoopDetector,  # poop detector
         weights='yolov5s.pt',  # model path or triton URL
@@ -47,6 +98,18 @@ def run(
         half=False,  # use FP16 half-precision inference
         dnn=False,  # use OpenCV DNN for ONNX inference
         vid_stride=1,  # video frame-rate stride
+        hard_negatives=None,  # hard negative collector
+        result_cache=None,  # reuse detections of near-identical frames
+        cascade=None,  # low resolution pass first, full resolution only for escalated frames
+        profiler=None,  # on-demand profiler, traces the model's inference calls on request
+        record_detections=None,  # record per-frame detections to this folder
+        event_store=None,  # append detections to this event store folder
+        model_cache=None,  # cache a fused TorchScript artifact of .pt weights in this folder
+        stall_sec=10,  # reconnect a stream without a new frame for this many seconds
+        max_backoff_sec=60,  # maximum delay (in seconds) between stream reconnect attempts
+        hw_decode=False,  # decode streams on any available hardware decoder
+        profile=None,  # startup profile, reported after the first inference
+        on_batch=None,  # called with the processing time (in seconds) and the number of images of every batch
 ):
     source = str(source)
     save_img = not nosave and not source.endswith('.txt')  # save inference images
@@ -70,145 +133,236 @@ def run(
     if not nosave:
         (save_dir / 'labels' if save_txt else save_dir).mkdir(parents=True, exist_ok=True)  # make dir
 
+    if profile is not None:
+        profile.mark('setup')
+
     # Load model
-    device = select_device(device)
-    model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
+    batch_size = len(Path(source).read_text().rsplit()) if webcam and os.path.isfile(source) else 1  # streams
+    model, imgsz = load_model(weights, device, dnn, data, half, imgsz, batch_size, model_cache)
     stride, names, pt = model.stride, model.names, model.pt
-    imgsz = check_img_size(imgsz, s=stride)  # check image size
+    assert cascade is None or pt, 'the resolution cascade needs a PyTorch model, exported models have a fixed input size'
+    if hard_negatives is not None:
+        hard_negatives.set_names(names)
+    if profiler is not None:
+        profiler.attach(model)
+    recorder = DetectionLogWriter(record_detections, names) if record_detections else None
+    if profile is not None:
+        profile.mark('model')
 
     # Dataloader
     bs = 1  # batch_size
     if webcam:
         # view_img = check_imshow(warn=True)
-        dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride)
+        # exported models have a fixed batch size, they get every stream even when its frame repeats
+        dataset = ResilientStreams(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride,
+                                   stall_sec=stall_sec, max_backoff_sec=max_backoff_sec, skip_duplicates=pt,
+                                   hw_decode=hw_decode)
         bs = len(dataset)
     elif screenshot:
         dataset = LoadScreenshots(source, img_size=imgsz, stride=stride, auto=pt)
     else:
         dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride)
     vid_path, vid_writer = [None] * bs, [None] * bs
+    events = EventStoreWriter(event_store, names, dataset.sources if webcam else [source]) if event_store else None
+    if profile is not None:
+        profile.mark('dataloader')
 
     # Run inference
     model.warmup(imgsz=(1 if pt or model.triton else bs, 3, *imgsz))  # warmup
+    if profile is not None:
+        profile.mark('warmup')
     seen, windows, dt = 0, [], (Profile(), Profile(), Profile())
-    for path, im, im0s, vid_cap, s in dataset:
-        with dt[0]:
-            im = torch.from_numpy(im).to(model.device)
-            im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
-            im /= 255  # 0 - 255 to 0.0 - 1.0
-            if len(im.shape) == 3:
-                im = im[None]  # expand for batch dim
-
-        # Inference
-        with dt[1]:
-            visualize = increment_path(save_dir / Path(path).stem, mkdir=True) if visualize else False
-            pred = model(im, augment=augment, visualize=visualize)
-
-        # NMS
-        with dt[2]:
-            pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
-
-        # Second-stage classifier (optional)
-        # pred = utils.general.apply_classifier(pred, classifier_model, im, im0s)
-
-        # Process predictions
-        for i, det in enumerate(pred):  # per image
-            seen += 1
-            if webcam:  # batch_size >= 1
-                p, im0, frame = path[i], im0s[i].copy(), dataset.count
-                s += f'{i}: '
-            else:
-                p, im0, frame = path, im0s.copy(), getattr(dataset, 'frame', 0)
-
-            p = Path(p)  # to Path
-            save_path = str(save_dir / p.name)  # im.jpg
-            txt_path = str(save_dir / 'labels' / p.stem) + ('' if dataset.mode == 'image' else f'_{frame}')  # im.txt
-            s += '%gx%g ' % im.shape[2:]  # print string
-            gn = torch.tensor(im0.shape)[[1, 0, 1, 0]]  # normalization gain whwh
-            imc = im0.copy() if save_crop else im0  # for save_crop
-            annotator = Annotator(im0, line_width=line_thickness, example=str(names))
-            if len(det):
-                # Rescale boxes from img_size to im0 size
-                det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
-
-                # Print results
-                for c in det[:, 5].unique():
-                    n = (det[:, 5] == c).sum()  # detections per class
-                    s += f"{n} {names[int(c)]}{'s' * (n > 1)}, "  # add to string
-
-                # Write results
-                for *xyxy, conf, cls in reversed(det):
-                    if save_txt:  # Write to file
-                        xywh = (xyxy2xywh(torch.tensor(xyxy).view(1, 4)) / gn).view(-1).tolist()  # normalized xywh
-                        line = (cls, *xywh, conf) if save_conf else (cls, *xywh)  # label format
-                        with open(f'{txt_path}.txt', 'a') as f:
-                            f.write(('%g ' * len(line)).rstrip() % line + '\n')
-
-                    if save_img or save_crop or view_img:  # Add bbox to image
-                        c = int(cls)  # integer class
-                        label = None if hide_labels else (names[c] if hide_conf else f'{names[c]} {conf:.2f}')
-                        annotator.box_label(xyxy, label, color=colors(c, True))
-                    if save_crop:
-                        save_one_box(xyxy, imc, file=save_dir / 'crops' / names[c] / f'{p.stem}.jpg', BGR=True)
-
-            # Stream results
-            im0 = annotator.result()
-
-            # process detection
-            detector.process_detection(model, pred, im0)
-
-            if view_img:
-                if platform.system() == 'Linux' and p not in windows:
-                    windows.append(p)
-                    cv2.namedWindow(str(p), cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO)  # allow window resize (Linux)
-                    cv2.resizeWindow(str(p), im0.shape[1], im0.shape[0])
-                cv2.imshow(str(p), im0)
-                cv2.waitKey(1)  # 1 millisecond
-
-            # Save results (image with detections)
-            if save_img:
-                if dataset.mode == 'image':
-                    cv2.imwrite(save_path, im0)
-                else:  # 'video' or 'stream'
-                    if vid_path[i] != save_path:  # new video
-                        vid_path[i] = save_path
-                        if isinstance(vid_writer[i], cv2.VideoWriter):
-                            vid_writer[i].release()  # release previous video writer
-                        if vid_cap:  # video
-                            fps = vid_cap.get(cv2.CAP_PROP_FPS)
-                            w = int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                            h = int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                        else:  # stream
-                            fps, w, h = 30, im0.shape[1], im0.shape[0]
-                        save_path = str(Path(save_path).with_suffix('.mp4'))  # force *.mp4 suffix on results videos
-                        vid_writer[i] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
-                    vid_writer[i].write(im0)
-
-        # Print time (inference-only)
-        LOGGER.info(f"{s}{'' if len(det) else '(no detections), '}{dt[1].dt * 1E3:.1f}ms")
+    stats_logged = time.time()
+    try:
+        for path, im, im0s, vid_cap, s in dataset:
+            t_batch = time.perf_counter()  # after the dataset yields, waiting for frames doesn't count
+
+            # Reuse detections of near-identical frames
+            cached = [None] * (len(im) if im.ndim == 4 else 1)
+            if result_cache is not None:
+                keys = dataset.indices if webcam else [0]
+                signatures = [result_cache.signature(x) for x in (im if im.ndim == 4 else im[None])]
+                cached = [result_cache.get(k, x) for k, x in zip(keys, signatures)]
+            todo = [i for i, x in enumerate(cached) if x is None]
+            if todo and not pt:
+                todo = list(range(len(cached)))  # exported models have a fixed batch size, infer the whole batch
+
+            with dt[0]:
+                im = torch.from_numpy(im).to(model.device)
+                im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
+                im /= 255  # 0 - 255 to 0.0 - 1.0
+                if len(im.shape) == 3:
+                    im = im[None]  # expand for batch dim
+
+            pred = []
+            if todo:
+                t = time.perf_counter()
+                x = im[todo] if len(todo) < len(im) else im
+                visualize = increment_path(save_dir / Path(path).stem, mkdir=True) if visualize else False
+                escalated = list(range(len(x)))
+                if cascade is not None:
+                    # Low resolution pass, keeping candidates below conf_thres for the escalation decision
+                    with dt[1]:
+                        low, gain = cascade.downscale(x, stride)
+                        pred = model(low, augment=augment)
+                    with dt[2]:
+                        pred = non_max_suppression(pred, min(conf_thres, cascade.candidate_conf), iou_thres, classes,
+                                                   agnostic_nms, max_det=max_det)
+                    escalated = [j for j, det in enumerate(pred) if cascade.escalate(det, names)]
+                    pred = [cascade.upscale(det[det[:, 4] >= conf_thres], gain) for det in pred]
+                    t_low = time.perf_counter() - t
+
+                if escalated:
+                    # Inference
+                    with dt[1]:
+                        high = model(x[escalated] if len(escalated) < len(x) else x, augment=augment, visualize=visualize)
+
+                    # NMS
+                    with dt[2]:
+                        high = non_max_suppression(high, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
+
+                    if cascade is None:
+                        pred = high
+                    else:  # escalated frames take the full resolution detections
+                        for j, det in zip(escalated, high):
+                            pred[j] = det
+
+                if cascade is not None:
+                    cascade.update(len(x), len(escalated), t_low, time.perf_counter() - t - t_low)
+                if result_cache is not None:
+                    cost = (time.perf_counter() - t) / len(todo)
+                    for i, det in zip(todo, pred):
+                        result_cache.put(keys[i], signatures[i], det.clone(), cost)  # boxes are rescaled in place below
+            fresh = dict(zip(todo, pred))
+            pred = [fresh[i] if i in fresh else cached[i].clone() for i in range(len(cached))]
+
+            # Second-stage classifier (optional)
+            # pred = utils.general.apply_classifier(pred, classifier_model, im, im0s)
+
+            # Process predictions
+            for i, det in enumerate(pred):  # per image
+                seen += 1
+                si = dataset.indices[i] if webcam else i  # stream index, a batch holds the streams with a new frame
+                if webcam:  # batch_size >= 1
+                    p, im0, frame = path[i], im0s[i].copy(), dataset.count
+                    s += f'{si}: '
+                else:
+                    p, im0, frame = path, im0s.copy(), getattr(dataset, 'frame', 0)
+                if i not in fresh:
+                    s += 'cached '
+
+                p = Path(p)  # to Path
+                save_path = str(save_dir / p.name)  # im.jpg
+                txt_path = str(save_dir / 'labels' / p.stem) + ('' if dataset.mode == 'image' else f'_{frame}')  # im.txt
+                s += '%gx%g ' % im.shape[2:]  # print string
+                gn = torch.tensor(im0.shape)[[1, 0, 1, 0]]  # normalization gain whwh
+                imc = im0.copy() if save_crop else im0  # for save_crop
+                raw = im0.copy() if hard_negatives is not None and len(det) else None  # for hard negatives
+                annotator = Annotator(im0, line_width=line_thickness, example=str(names))
+                if len(det):
+                    # Rescale boxes from img_size to im0 size
+                    det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
+
+                    # Print results
+                    for c in det[:, 5].unique():
+                        n = (det[:, 5] == c).sum()  # detections per class
+                        s += f"{n} {names[int(c)]}{'s' * (n > 1)}, "  # add to string
+
+                    # Write results
+                    for *xyxy, conf, cls in reversed(det):
+                        if save_txt:  # Write to file
+                            xywh = (xyxy2xywh(torch.tensor(xyxy).view(1, 4)) / gn).view(-1).tolist()  # normalized xywh
+                            line = (cls, *xywh, conf) if save_conf else (cls, *xywh)  # label format
+                            with open(f'{txt_path}.txt', 'a') as f:
+                                f.write(('%g ' * len(line)).rstrip() % line + '\n')
+
+                        if save_img or save_crop or view_img:  # Add bbox to image
+                            c = int(cls)  # integer class
+                            label = None if hide_labels else (names[c] if hide_conf else f'{names[c]} {conf:.2f}')
+                            annotator.box_label(xyxy, label, color=colors(c, True))
+                        if save_crop:
+                            save_one_box(xyxy, imc, file=save_dir / 'crops' / names[c] / f'{p.stem}.jpg', BGR=True)
+
+                # record detections for replay
+                if recorder is not None:
+                    recorder.write(si, det)
+
+                # append detections to event store
+                if events is not None:
+                    events.write(events.stream_ids[dataset.sources[si] if webcam else source], det)
+
+                # Stream results
+                im0 = annotator.result()
+
+                # capture detections in hard negative confidence band
+                if raw is not None:
+                    hard_negatives.capture(raw, det)
+
+                # process detection
+                detector.process_detection(model, pred, im0, raw)
+
+                if view_img:
+                    if platform.system() == 'Linux' and p not in windows:
+                        windows.append(p)
+                        cv2.namedWindow(str(p), cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO)  # allow window resize (Linux)
+                        cv2.resizeWindow(str(p), im0.shape[1], im0.shape[0])
+                    cv2.imshow(str(p), im0)
+                    cv2.waitKey(1)  # 1 millisecond
+
+                # Save results (image with detections)
+                if save_img:
+                    if dataset.mode == 'image':
+                        cv2.imwrite(save_path, im0)
+                    else:  # 'video' or 'stream'
+                        if vid_path[si] != save_path:  # new video
+                            vid_path[si] = save_path
+                            if isinstance(vid_writer[si], cv2.VideoWriter):
+                                vid_writer[si].release()  # release previous video writer
+                            if vid_cap:  # video
+                                fps = vid_cap.get(cv2.CAP_PROP_FPS)
+                                w = int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                                h = int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                            else:  # stream
+                                fps, w, h = 30, im0.shape[1], im0.shape[0]
+                            save_path = str(Path(save_path).with_suffix('.mp4'))  # force *.mp4 suffix on results videos
+                            vid_writer[si] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, h))
+                        vid_writer[si].write(im0)
+
+            # Print time (inference-only)
+            LOGGER.info(f"{s}{'' if len(det) else '(no detections), '}{dt[1].dt * 1E3:.1f}ms")
+            if on_batch is not None:
+                on_batch(time.perf_counter() - t_batch, len(pred))
+            if profile is not None:
+                profile.mark('first inference')
+                LOGGER.info(f'Startup {profile.report()}')
+                profile = None
+            if time.time() - stats_logged >= 60:
+                stats_logged = time.time()
+                if result_cache is not None:
+                    LOGGER.info(f'Result cache {result_cache.report()}')
+                if cascade is not None:
+                    LOGGER.info(f'Cascade {cascade.report()}')
+    finally:
+        if webcam:
+            dataset.close()  # stop the stream readers, also when run is restarted after an error
+        if recorder is not None:
+            recorder.close()  # the restarted run opens a new one on the same folder
+        if events is not None:
+            events.close()  # writes the buffered records, the restarted run appends to the same segment
 
     # Print results
     t = tuple(x.t / seen * 1E3 for x in dt)  # speeds per image
     LOGGER.info(f'Speed: %.1fms pre-process, %.1fms inference, %.1fms NMS per image at shape {(1, 3, *imgsz)}' % t)
+    if result_cache is not None:
+        LOGGER.info(f'Result cache {result_cache.report()}')
+    if cascade is not None:
+        LOGGER.info(f'Cascade {cascade.report()}')
     if save_txt or save_img:
         s = f"\n{len(list(save_dir.glob('labels/*.txt')))} labels saved to {save_dir / 'labels'}" if save_txt else ''
         LOGGER.info(f"Results saved to {colorstr('bold', save_dir)}{s}")
     if update:
         strip_optimizer(weights[0])  # update model (to fix SourceChangeWarning)
 
-def set_logger(debug=False):
-    log_name = os.path.basename(__file__).rsplit('.', 1)[0]
-    log_config = 'logging.ini'
-    logging.config.fileConfig(log_config)
-    log = logging.getLogger()
-    fileHandler = logging.handlers.TimedRotatingFileHandler(filename=f'{log_name}.log', when='midnight', backupCount=7)
-    logLevel = logging.DEBUG if debug else logging.INFO
-    log.handlers[0].level = logLevel
-    fileHandler.setLevel(logLevel)
-    fileHandler.setFormatter(log.handlers[0].formatter)
-    log.addHandler(fileHandler)
-    return log
-
 def parse_opt():
     parser = argparse.ArgumentParser(description='Live Poop Detector')
     parser.add_argument('--sound', type=str, default='sounds/police.wav', help='alert sound file')
@@ -219,6 +373,19 @@ def parse_opt():
     parser.add_argument('--confirm-sec', type=float, default=2, help='time to confirm if there is poop')
     parser.add_argument('--confirm-thres', type=float, default=0.75, help='poop confirmation threshold')
     parser.add_argument('--alert-snooze-sec', type=int, default=60, help='poop alert snooze period (in seconds)')
+    parser.add_argument('--alert-state', type=str, default='runs/alert-state.json', help='file persisting alert snooze & rate limit state across restarts')
+    parser.add_argument('--sound-per-hour', type=float, default=30, help='alert sound rate limit')
+    parser.add_argument('--push-per-hour', type=float, default=20, help='push notification rate limit')
+    parser.add_argument('--alert-img-size', type=int, default=1280, help='maximum width & height (pixels) of notification images')
+    parser.add_argument('--alert-img-format', type=str, default='jpg', choices=['jpg', 'webp'], help='notification image format')
+    parser.add_argument('--alert-img-quality', type=int, default=80, help='notification image quality (1 - 100)')
+    parser.add_argument('--alert-img-context', type=float, default=1.0, help='context kept around detections in notification images, as a fraction of their size')
+    parser.add_argument('--alert-img-full', action='store_true', help='do not crop notification images to the detections')
+    parser.add_argument('--hardneg-dir', type=str, default=None, help='capture hard negatives into this staging folder')
+    parser.add_argument('--hardneg-conf', nargs=2, type=float, default=[0.75, 0.85], help='hard negative confidence band low high')
+    parser.add_argument('--hardneg-imgsz', type=int, default=640, help='width (pixels) hard negatives are downscaled to')
+    parser.add_argument('--hardneg-crop-from', type=str, default='none', help='crop hard negatives into square dimension (i.e. none, left, middle, right)')
+    parser.add_argument('--hardneg-quota-mb', type=float, default=500, help='disk quota (in MB) of hard negative staging folder')
 
     parser.add_argument('--weights', nargs='+', type=str, default='best.pt', help='model path or triton URL')
     parser.add_argument('--source', type=str, default='0', help='file/dir/URL/glob/screen/0(webcam)')
@@ -247,12 +414,57 @@ def parse_opt():
     parser.add_argument('--hide-conf', default=False, action='store_true', help='hide confidences')
     parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
     parser.add_argument('--dnn', action='store_true', help='use OpenCV DNN for ONNX inference')
+    parser.add_argument('--stall-sec', type=float, default=10, help='reconnect a stream without a new frame for this many seconds')
+    parser.add_argument('--max-backoff-sec', type=float, default=60, help='maximum delay (in seconds) between stream reconnect attempts')
     parser.add_argument('--vid-stride', type=int, default=1, help='video frame-rate stride')
+    parser.add_argument('--hw-decode', action='store_true', help='decode streams on any available hardware decoder')
+    parser.add_argument('--result-cache', action='store_true', help='reuse detections of near-identical frames')
+    parser.add_argument('--result-cache-tolerance', type=float, default=4.0, help='maximum difference (0 - 255) of any 8x8 block mean for frames to match')
+    parser.add_argument('--result-cache-ttl-sec', type=float, default=10, help='time (in seconds) cached detections are reused for')
+    parser.add_argument('--result-cache-size', type=int, default=16, help='maximum number of cached frames')
+    parser.add_argument('--cascade-imgsz', type=int, default=None, help='run every frame at this size first, --imgsz only for escalated frames')
+    parser.add_argument('--cascade-conf', type=float, default=0.1, help='confidence threshold of candidates in the low resolution pass')
+    parser.add_argument('--escalate-conf', type=float, default=0.5, help='escalate frames with a candidate below this confidence')
+    parser.add_argument('--escalate-classes', nargs='+', type=str, default=['dog'], help='classes that always escalate a frame')
+    parser.add_argument('--candidate-classes', nargs='+', type=str, default=['poop', 'cotton'], help='classes that escalate a frame below --escalate-conf')
+    parser.add_argument('--event-store', type=str, default=None, help='append detections to this event store folder, query with events.py')
+    parser.add_argument('--model-cache', type=str, default=None, help='cache a fused TorchScript artifact of .pt weights in this folder for faster startup')
+    parser.add_argument('--profile-dir', type=str, default='runs/profile', help='folder on-demand profiles are written to')
+    parser.add_argument('--profile-socket', type=str, default=None, help='control socket for on-demand profiling, i.e. runs/profile/control.sock')
+    parser.add_argument('--profile-sec', type=float, default=30, help='duration (in seconds) of an on-demand sampling or cProfile session')
+    parser.add_argument('--profile-interval-ms', type=float, default=5, help='sampling interval (in milliseconds)')
+    parser.add_argument('--profile-torch-calls', type=int, default=20, help='inference calls traced by the torch profiler')
+    parser.add_argument('--record-detections', type=str, default=None, help='record per-frame detections to this folder for replay.py')
     opt = parser.parse_args()
     opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
     return opt
 
 def main(opt):
+    # initialize hard negative collector
+    hard_negatives = None
+    if opt.hardneg_dir:
+        hard_negatives = HardNegativeCollector(output=opt.hardneg_dir,
+                                               conf_band=tuple(opt.hardneg_conf),
+                                               imgsz=opt.hardneg_imgsz,
+                                               crop_from=opt.hardneg_crop_from,
+                                               quota_mb=opt.hardneg_quota_mb,
+                                               logger=log)
+
+    # initialize alert manager, persisting snooze state across restarts
+    alerts = AlertManager(notifier=notifier,
+                          sound=opt.sound,
+                          no_alert=opt.no_alert,
+                          no_notify=opt.no_notify,
+                          snooze_sec=opt.alert_snooze_sec,
+                          sound_per_hour=opt.sound_per_hour,
+                          push_per_hour=opt.push_per_hour,
+                          state=opt.alert_state,
+                          alert_image=AlertImage(max_size=opt.alert_img_size,
+                                                 fmt=opt.alert_img_format,
+                                                 quality=opt.alert_img_quality,
+                                                 context=None if opt.alert_img_full else opt.alert_img_context),
+                          logger=log)
+
     # initialize poop detector
     detector = PoopDetector(sound=opt.sound,
                             no_alert=opt.no_alert,
@@ -262,7 +474,36 @@ def main(opt):
                             logger=log,
                             confirm_sec=opt.confirm_sec,
                             confirm_thres=opt.confirm_thres,
-                            alert_snooze_sec=opt.alert_snooze_sec)
+                            alert_snooze_sec=opt.alert_snooze_sec,
+                            hard_negatives=hard_negatives,
+                            alerts=alerts)
+
+    result_cache = None
+    if opt.result_cache:
+        result_cache = ResultCache(tolerance=opt.result_cache_tolerance,
+                                   ttl_sec=opt.result_cache_ttl_sec,
+                                   max_size=opt.result_cache_size)
+
+    # profiling on demand, nothing is hooked until a session is requested
+    profiler = OnDemandProfiler(folder=opt.profile_dir,
+                                duration_sec=opt.profile_sec,
+                                interval_ms=opt.profile_interval_ms,
+                                torch_calls=opt.profile_torch_calls,
+                                logger=log)
+    profiler.install(opt.profile_socket)
+
+    cascade = None
+    w = opt.weights[0] if isinstance(opt.weights, list) and len(opt.weights) == 1 else opt.weights
+    if opt.cascade_imgsz and (opt.model_cache or not str(w).endswith('.pt')):
+        # checked once here, run() is retried forever on errors
+        log.warning('The resolution cascade needs .pt weights without --model-cache, exported models have a '
+                    'fixed input size, running without the cascade')
+    elif opt.cascade_imgsz:
+        cascade = ResolutionCascade(low_imgsz=opt.cascade_imgsz,
+                                    candidate_conf=opt.cascade_conf,
+                                    escalate_conf=opt.escalate_conf,
+                                    escalate_classes=opt.escalate_classes,
+                                    candidate_classes=opt.candidate_classes)
 
     # remove unused arguments from opt
     del opt.cfg
@@ -273,13 +514,42 @@ def main(opt):
     del opt.confirm_sec
     del opt.confirm_thres
     del opt.alert_snooze_sec
-
+    del opt.alert_state
+    del opt.sound_per_hour
+    del opt.push_per_hour
+    del opt.alert_img_size
+    del opt.alert_img_format
+    del opt.alert_img_quality
+    del opt.alert_img_context
+    del opt.alert_img_full
+    del opt.hardneg_dir
+    del opt.hardneg_conf
+    del opt.hardneg_imgsz
+    del opt.hardneg_crop_from
+    del opt.hardneg_quota_mb
+    del opt.result_cache
+    del opt.result_cache_tolerance
+    del opt.result_cache_ttl_sec
+    del opt.result_cache_size
+    del opt.cascade_imgsz
+    del opt.cascade_conf
+    del opt.escalate_conf
+    del opt.escalate_classes
+    del opt.candidate_classes
+    del opt.profile_dir
+    del opt.profile_socket
+    del opt.profile_sec
+    del opt.profile_interval_ms
+    del opt.profile_torch_calls
+
+    profile = startup  # the first run reports the imports too
     while True:
         to_notify = True
 
         try:
             log.info("Starting detector")
-            run(detector=detector, **vars(opt))
+            run(detector=detector, hard_negatives=hard_negatives, result_cache=result_cache, cascade=cascade,
+                profiler=profiler, profile=profile, **vars(opt))
 
         except KeyboardInterrupt:
             msg = "Application terminated by user"
@@ -291,11 +561,17 @@ def main(opt):
             msg = str(e)
             log.error(e, exc_info=True)
 
+        profile = StartupProfile()  # restart, the model is reused
+
+    if hard_negatives is not None:
+        hard_negatives.close()
+    profiler.close()
+
     if to_notify:
         notifier.text(msg)
 
 if __name__ == '__main__':
-    log = set_logger(debug=False)
+    log = set_logger(os.path.basename(__file__).rsplit('.', 1)[0], debug=False)
 
     try:
         opt = parse_opt()
@@ -304,6 +580,9 @@ if __name__ == '__main__':
         with open(opt.cfg) as f:
             cfg = json.load(f)
 
+        # apply the CPU profile tuned by tune.py, before the model is loaded
+        apply_cpu_profile(cfg.get('cpu'), log)
+
         # initialize notifier
         notifier: INotification = PushbulletNotification(api_key=cfg['pushbullet']['apikey'], title="Poop Detector")
 
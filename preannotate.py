@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import argparse
+import itertools
+import multiprocessing
+import numpy as np
+import torch
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.dataset import label_path, list_images
+from utils.hardneg import to_numpy, yolo_labels
+
+from yolov5.models.common import DetectMultiBackend
+from yolov5.utils.augmentations import letterbox
+from yolov5.utils.general import Profile, check_img_size, cv2, non_max_suppression, scale_boxes
+from yolov5.utils.torch_utils import select_device
+
+def init_worker():
+    """
+    Keeps OpenCV sequential in each decoding process, the pool provides the parallelism.
+    """
+    cv2.setNumThreads(0)
+
+def load_image(path, imgsz, stride):
+    """
+    Loads an image letterboxed for batched inference, in a decoding process.
+
+    Args:
+        path (str): The image file path.
+        imgsz (list): The inference size (height, width).
+        stride (int): The model stride.
+
+    Returns:
+        tuple: The CHW RGB letterboxed image and the original image shape, None if the image can't be read.
+    """
+    im0 = cv2.imread(path)  # BGR
+    if im0 is None:
+        return None, None
+    im = letterbox(im0, imgsz, stride=stride, auto=False)[0]
+    return np.ascontiguousarray(im.transpose((2, 0, 1))[::-1]), im0.shape  # HWC to CHW, BGR to RGB
+
+def file_key(path):
+    """
+    Gets the manifest key of an image, its size and modification time tell a replaced image apart.
+    """
+    st = os.stat(path)
+    return dict(size=st.st_size, mtime=int(st.st_mtime))
+
+def load_manifest(path):
+    if path and os.path.isfile(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+def save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(path + '.tmp', path)  # an interrupted run never leaves a truncated manifest
+
+def class_map(names, classes_file):
+    """
+    Maps the model classes to the class indices of labelImg's classes.txt, by name.
+
+    Args:
+        names (dict): The model class names by index.
+        classes_file (str): The classes.txt path.
+
+    Returns:
+        dict: The label class index by model class index, None if there is no classes.txt.
+    """
+    if not os.path.isfile(classes_file):
+        return None
+    with open(classes_file) as f:
+        classes = [line.strip() for line in f if line.strip()]
+    return {i: classes.index(n) for i, n in names.items() if n in classes}
+
+def batched(items, n):
+    """
+    Splits a list into consecutive batches of size `n`.
+    """
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+@torch.no_grad()
+def run(weights='best.pt',
+        source='dataset/images',
+        labels=None,
+        data='dataset.yaml',
+        manifest='dataset/preannotate.json',
+        imgsz=640,
+        batch_size=16,
+        conf_thres=0.4,
+        iou_thres=0.45,
+        max_det=100,
+        device='',
+        workers=4,
+        half=False,
+        dnn=False,
+    ):
+    """
+    Pre-annotates unlabeled images with the current model, so that labelImg only needs the boxes
+    corrected rather than drawn. Images are decoded in a process pool while the model runs batched
+    inference on the previous batch. A YOLO label file is only written when the image has none,
+    and images recorded in the manifest are skipped, so reruns only process new images.
+
+    Args:
+        weights (str): The model path.
+        source (str): The folder of images.
+        labels (str, optional): The folder to write the labels to. Defaults to the `labels` folder
+            next to `source`.
+        data (str): The dataset yaml file path.
+        manifest (str): The JSON file of the processed images.
+        imgsz (int): The inference size (pixels).
+        batch_size (int): The inference batch size, forced to 1 for non-PyTorch models.
+        conf_thres (float): The confidence threshold, higher than for evaluation so that few boxes need deleting.
+        iou_thres (float): The NMS IoU threshold.
+        max_det (int): The maximum detections per image.
+        device (str): The device, i.e. cpu or 0.
+        workers (int): The number of decoding processes.
+        half (bool): Use FP16 half-precision inference.
+        dnn (bool): Use OpenCV DNN for ONNX inference.
+
+    Returns:
+        dict: The number of images pre-annotated, labeled without detections and skipped.
+    """
+    def labels_file(image):
+        name = os.path.splitext(os.path.basename(image))[0] + '.txt'
+        return os.path.join(labels, name) if labels else label_path(image)
+
+    done = load_manifest(manifest)
+    images = list_images(source)
+    todo = [p for p in images if not os.path.isfile(labels_file(p)) and done.get(os.path.basename(p)) != file_key(p)]
+    print(f'{len(todo)} of {len(images)} images to pre-annotate, '
+          f'{len(images) - len(todo)} labeled or processed already')
+    if not todo:
+        return dict(annotated=0, empty=0, skipped=len(images))
+
+    # Load model
+    device = select_device(device)
+    model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
+    stride, names, pt, jit = model.stride, model.names, model.pt, model.jit
+    imgsz = check_img_size([imgsz, imgsz] if isinstance(imgsz, int) else imgsz, s=stride)
+    if not (pt or jit):
+        batch_size = 1  # export.py models default to batch-size 1
+    names = names if isinstance(names, dict) else dict(enumerate(names))
+    out = labels or os.path.dirname(labels_file(todo[0]))
+    os.makedirs(out, exist_ok=True)
+    classes = class_map(names, os.path.join(out, 'classes.txt'))
+    if classes is not None and len(classes) < len(names):
+        print(f"Classes {', '.join(n for i, n in names.items() if i not in classes)} missing from classes.txt, dropped")
+
+    # warmup
+    model(torch.zeros(1, 3, *imgsz, dtype=torch.half if model.fp16 else torch.float, device=device))
+
+    annotated = empty = boxes = 0
+    dt = (Profile(), Profile(), Profile())  # decode wait, inference, nms & writing
+    start_time = time.time()
+
+    # decode & letterbox images in worker processes, while the model runs on the previous batch
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=init_worker) as executor:
+        # decode at most 2 batches ahead, decoded images of a large folder wouldn't fit in memory
+        pending = deque()
+        batches = batched(todo, batch_size)
+        for paths in itertools.islice(batches, 2):
+            pending.append([(p, executor.submit(load_image, p, imgsz, stride)) for p in paths])
+        while pending:
+            with dt[0]:
+                batch = [(p, *future.result()) for p, future in pending.popleft()]
+            for paths in itertools.islice(batches, 1):
+                pending.append([(p, executor.submit(load_image, p, imgsz, stride)) for p in paths])
+            for p, _, _ in (b for b in batch if b[1] is None):
+                print(f"Failed to read '{p}', skipped")
+            batch = [b for b in batch if b[1] is not None]
+            if not batch:
+                continue
+
+            with dt[1]:
+                im = torch.from_numpy(np.stack([b[1] for b in batch])).to(device)
+                im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
+                im /= 255  # 0 - 255 to 0.0 - 1.0
+                pred = model(im)
+
+            with dt[2]:
+                pred = non_max_suppression(pred, conf_thres, iou_thres, max_det=max_det)
+                for det, (path, _, shape) in zip(pred, batch):
+                    det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], shape)
+                    det = to_numpy(det)
+                    if classes is not None:
+                        det = det[[int(c) in classes for c in det[:, 5]]]
+                        det[:, 5] = [classes[int(c)] for c in det[:, 5]]
+                    lines = yolo_labels(det, (0, 0, shape[1], shape[0]))
+                    # no detections leaves the image unlabeled, an empty file would mark it as a background image
+                    if len(lines):
+                        with open(labels_file(path), 'w') as f:
+                            f.write(''.join(f'{int(c)} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n' for c, x, y, w, h in lines))
+                        annotated += 1
+                        boxes += len(lines)
+                    else:
+                        empty += 1
+                    done[os.path.basename(path)] = file_key(path)
+                save_manifest(manifest, done)  # per batch, an interrupted run resumes where it stopped
+
+    elapsed = time.time() - start_time
+    n = annotated + empty
+    print(f'Pre-annotated {annotated} images with {boxes} boxes, {empty} without detections, '
+          f'{len(images) - len(todo)} skipped, labels in {out}')
+    print(f'{n / elapsed:.1f} images/s over {elapsed:.1f}s, per image: ' +
+          ', '.join(f'{k} {x.t / max(n, 1) * 1E3:.1f}ms'
+                    for k, x in zip(('decode wait', 'inference', 'nms & write'), dt)))
+    return dict(annotated=annotated, empty=empty, skipped=len(images) - len(todo))
+
+def parse_opt():
+    """
+    Parse command line arguments for pre-annotation.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Model-assisted pre-annotation of unlabeled images')
+    parser.add_argument('--weights', type=str, default='best.pt', help='model path')
+    parser.add_argument('--source', type=str, default='dataset/images', help='folder of images')
+    parser.add_argument('--labels', type=str, default=None, help='folder to write labels to, defaults to labels next to source')
+    parser.add_argument('--data', type=str, default='dataset.yaml', help='dataset.yaml path')
+    parser.add_argument('--manifest', type=str, default='dataset/preannotate.json', help='JSON file of processed images')
+    parser.add_argument('--imgsz', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--batch-size', type=int, default=16, help='inference batch size')
+    parser.add_argument('--conf-thres', type=float, default=0.4, help='confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.45, help='NMS IoU threshold')
+    parser.add_argument('--max-det', type=int, default=100, help='maximum detections per image')
+    parser.add_argument('--device', default='', help='cuda device, i.e. 0 or cpu')
+    parser.add_argument('--workers', type=int, default=4, help='number of decoding processes')
+    parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
+    parser.add_argument('--dnn', action='store_true', help='use OpenCV DNN for ONNX inference')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
@@ -0,0 +1,68 @@
+import os
+import socket
+import signal
+import argparse
+
+def send(socket_path, command, value=None, timeout=10):
+    """
+    Sends a command to the profiling control socket of a running live.py.
+
+    Args:
+        socket_path (str): The control socket path.
+        command (str): The command, sample, cprofile, torch, stop or status.
+        value: The duration (in seconds) of sample & cprofile, the number of calls of torch.
+        timeout (int): The timeout (in seconds).
+
+    Returns:
+        str: The reply.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(socket_path)
+        s.sendall(f"{command}{'' if value is None else f' {value}'}".encode())
+        return s.recv(1024).decode().strip()
+
+def run(command='status',
+        socket_path='runs/profile/control.sock',
+        pid=None,
+        value=None,
+    ):
+    """
+    Profiles a running live.py on demand, through its control socket or, with a pid, by signal.
+
+    Args:
+        command (str): sample, cprofile, torch, stop or status, by signal only sample & cprofile (toggling).
+        socket_path (str): The control socket path.
+        pid (int): Signal this process instead of using the control socket.
+        value: The duration (in seconds) of sample & cprofile, the number of calls of torch.
+    """
+    if pid:
+        signals = dict(sample=signal.SIGUSR1, cprofile=signal.SIGUSR2)
+        if command not in signals:
+            raise ValueError(f'{command} is not supported by signal, use the control socket')
+        os.kill(pid, signals[command])
+        print(f'Toggled {command} of process {pid}')
+    else:
+        print(send(socket_path, command, value))
+
+def parse_opt():
+    """
+    Parse command line arguments for on-demand profiling.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Profile a running live.py')
+    parser.add_argument('command', choices=['sample', 'cprofile', 'torch', 'stop', 'status'], help='profiling command')
+    parser.add_argument('value', nargs='?', default=None, help='duration (in seconds) of sample & cprofile, number of calls of torch')
+    parser.add_argument('--socket', dest='socket_path', type=str, default='runs/profile/control.sock', help='control socket path')
+    parser.add_argument('--pid', type=int, default=None, help='signal this process instead of using the control socket')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
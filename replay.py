@@ -0,0 +1,329 @@
+import os
+import csv
+import time
+import logging
+import argparse
+import itertools
+import numpy as np
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from detector import CLASS_OF_INTEREST, MIN_QUEUE_LENGTH, PoopDetector
+from utils.clock import ManualClock, parse_time
+from utils.detlog import read_detection_logs
+
+FPS_REFRESH_SEC = 10  # PoopDetector fps measurement window
+
+# recorded streams, set once per worker process
+_streams = None
+
+def load_streams(logs, conf_thres=0.0):
+    """
+    Loads recorded detections into per-stream frame timestamps and class counts.
+
+    Args:
+        logs (list): The detection log files or folders.
+        conf_thres (float): Ignore recorded detections below this confidence, to replay a higher
+        `--conf-thres` than was recorded.
+
+    Returns:
+        dict: Stream index to a tuple of timestamps (numpy.ndarray) and class counts (list of
+        Counter), sorted by time.
+    """
+    frames = defaultdict(list)
+    interned = {}
+    for names, t, stream, boxes in read_detection_logs(logs):
+        key = tuple(sorted(Counter(names[int(b[5])] for b in boxes if b[4] >= conf_thres).items()))
+        # identical class counts share one Counter, PoopDetector only reads them
+        counts = interned.setdefault(key, Counter(dict(key)))
+        frames[stream].append((t, counts))
+
+    streams = {}
+    for stream, items in frames.items():
+        items.sort(key=lambda x: x[0])
+        streams[stream] = (np.array([t for t, _ in items]), [counts for _, counts in items])
+    return streams
+
+def drop_isolated(times, active, confirm_sec):
+    """
+    Clears isolated active frames, i.e. with no other active frame within the longest possible
+    detection queue. A queue holds at least MIN_QUEUE_LENGTH frames, so a single active frame can't
+    reach a confirmation threshold above 1 / MIN_QUEUE_LENGTH and the frame is as good as idle.
+
+    Args:
+        times (numpy.ndarray): The frame timestamps.
+        active (numpy.ndarray): True for frames with a class of interest.
+        confirm_sec (float): The longest confirmation period (in seconds).
+
+    Returns:
+        numpy.ndarray: The active frames, without isolated ones.
+    """
+    # upper bound of PoopDetector's measured fps, the most frames in any fps measurement window
+    i = np.searchsorted(times, times + FPS_REFRESH_SEC)
+    max_fps = (i - np.arange(len(times))).max() / FPS_REFRESH_SEC
+    max_queue = max(MIN_QUEUE_LENGTH, int(np.ceil(max_fps * confirm_sec))) + 1
+
+    idx = np.flatnonzero(active)
+    gaps = np.diff(idx)
+    near_prev = np.concatenate(([False], gaps <= max_queue))
+    near_next = np.concatenate((gaps <= max_queue, [False]))
+    active = np.zeros_like(active)
+    active[idx[near_prev | near_next]] = True
+    return active
+
+def compress_idle(times, active, keep_sec):
+    """
+    Drops the middle of long stretches without any class of interest, shifting later timestamps
+    back by the dropped duration. Keeping `keep_sec` on both ends of a stretch lets PoopDetector's
+    queue drain, fps measurement settle and alert snooze expire as in the full recording. Only the
+    phase of the periodic confirmation check changes, so confirmation latencies may differ by up
+    to one `confirm_sec` from an exact replay.
+
+    Args:
+        times (numpy.ndarray): The frame timestamps.
+        active (numpy.ndarray): True for frames with a class of interest.
+        keep_sec (float): The idle duration kept after and before active frames.
+
+    Returns:
+        tuple: The indices of kept frames and their shifted timestamps.
+    """
+    active_times = times[active]
+    if not len(active_times):
+        keep = times - times[0] <= 2 * keep_sec
+        return np.flatnonzero(keep), times[keep]
+
+    # distance to nearest active frame, before & after
+    i = np.searchsorted(active_times, times, side='right')
+    since = times - active_times[np.maximum(i - 1, 0)]
+    since[i == 0] = np.inf
+    j = np.searchsorted(active_times, times, side='left')
+    until = active_times[np.minimum(j, len(active_times) - 1)] - times
+    until[j == len(active_times)] = np.inf
+    keep = (since <= keep_sec) | (until <= keep_sec)
+    keep[0] = True
+
+    idx = np.flatnonzero(keep)
+    dt = np.diff(times[idx], prepend=times[idx[0]])
+    # replace each dropped gap with a single frame interval
+    frame_dt = np.median(np.diff(times)) if len(times) > 1 else 0.0
+    gaps = np.where(np.diff(idx, prepend=idx[0]) > 1, dt - frame_dt, 0.0)
+    return idx, times[idx] - np.cumsum(gaps)
+
+def replay_stream(times, counts, confirm_sec, confirm_thres, alert_snooze_sec):
+    """
+    Feeds a recorded stream through PoopDetector with an injected clock.
+
+    Args:
+        times (numpy.ndarray): The (shifted) frame timestamps.
+        counts (list): The class counts of each frame.
+        confirm_sec (float): The time (in seconds) to confirm if there is poop.
+        confirm_thres (float): The poop confirmation threshold.
+        alert_snooze_sec (float): The alert snooze period (in seconds).
+
+    Returns:
+        list: The frame indices that raised an alert.
+    """
+    log = logging.getLogger('replay')
+    log.disabled = True
+    clock = ManualClock(times[0])
+    detector = PoopDetector(sound=None,
+                            no_alert=True,
+                            notify_img=False,
+                            no_notify=True,
+                            notifier=None,
+                            logger=log,
+                            confirm_sec=confirm_sec,
+                            confirm_thres=confirm_thres,
+                            alert_snooze_sec=alert_snooze_sec,
+                            clock=clock)
+
+    alerts = []
+    for i, (t, frame_counts) in enumerate(zip(times.tolist(), counts)):
+        clock.t = t
+        if detector.process_class_counts(frame_counts):
+            alerts.append(i)
+    return alerts
+
+def score_alerts(alerts, events, grace_sec):
+    """
+    Scores alert times against ground truth poop events.
+
+    Args:
+        alerts (list): The alert timestamps.
+        events (list): The (start, end) timestamps of real poop events.
+        grace_sec (float): Alerts up to this long after an event ends still count for it.
+
+    Returns:
+        tuple: Number of false alerts, number of missed events, and confirmation latencies (in
+        seconds) of detected events.
+    """
+    latencies, matched = [], set()
+    for start, end in events:
+        hits = [t for t in alerts if start <= t <= end + grace_sec]
+        if hits:
+            latencies.append(hits[0] - start)
+            matched.update(hits)
+    return len(alerts) - len(matched), len(events) - len(latencies), latencies
+
+def init_worker(streams):
+    global _streams
+    _streams = streams
+
+def replay_setting(setting, events, grace_sec):
+    """
+    Replays every recorded stream with one parameter setting, runs in a worker process.
+
+    Args:
+        setting (tuple): The (confirm_sec, confirm_thres, alert_snooze_sec) setting.
+        events (dict): Stream index to ground truth (start, end) poop events.
+        grace_sec (float): Alerts up to this long after an event ends still count for it.
+
+    Returns:
+        dict: The replay result of the setting.
+    """
+    confirm_sec, confirm_thres, alert_snooze_sec = setting
+    result = dict(confirm_sec=confirm_sec, confirm_thres=confirm_thres, alert_snooze_sec=alert_snooze_sec,
+                  alerts=0, false_alerts=0, missed=0)
+    latencies = []
+    for stream, (times, shifted, counts) in _streams.items():
+        alerts = [times[i] for i in replay_stream(shifted, counts, *setting)]
+        result['alerts'] += len(alerts)
+        if events is not None:
+            false_alerts, missed, stream_latencies = score_alerts(alerts, events.get(stream, []), grace_sec)
+            result['false_alerts'] += false_alerts
+            result['missed'] += missed
+            latencies += stream_latencies
+    result['mean_latency_sec'] = float(np.mean(latencies)) if latencies else float('nan')
+    result['max_latency_sec'] = float(np.max(latencies)) if latencies else float('nan')
+    return result
+
+def load_events(path):
+    """
+    Loads ground truth poop events from a CSV file with `stream,start,end` columns.
+
+    Args:
+        path (str): The CSV file path.
+
+    Returns:
+        dict: Stream index to a list of (start, end) timestamps.
+    """
+    events = defaultdict(list)
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            events[int(row['stream'])].append((parse_time(row['start']), parse_time(row['end'])))
+    return dict(events)
+
+def run(logs=('runs/detections',),
+        events=None,
+        confirm_sec=(1, 2, 3, 5),
+        confirm_thres=(0.5, 0.6, 0.75, 0.9),
+        alert_snooze_sec=(60, 300),
+        conf_thres=0.0,
+        grace_sec=30,
+        exact=False,
+        processes=None,
+        output=None,
+    ):
+    """
+    Replays recorded detections through PoopDetector for every combination of confirmation and
+    snooze parameters, reporting alerts, false alerts and confirmation latency per setting.
+
+    Args:
+        logs (tuple): The detection log files or folders recorded by `live.py --record-detections`.
+        events (str, optional): The ground truth CSV file of real poop events (stream,start,end).
+        Without it only alert counts are reported. Defaults to None.
+        confirm_sec (tuple): The confirmation periods (in seconds) to sweep.
+        confirm_thres (tuple): The confirmation thresholds to sweep.
+        alert_snooze_sec (tuple): The alert snooze periods (in seconds) to sweep.
+        conf_thres (float): Ignore recorded detections below this confidence.
+        grace_sec (float): Alerts up to this long after an event ends still count for it.
+        exact (bool): Replay every recorded frame instead of compressing idle stretches.
+        processes (int, optional): The number of worker processes. Defaults to the CPU count.
+        output (str, optional): The CSV file to write results to. Defaults to None.
+
+    Returns:
+        list: The replay results, best first.
+    """
+    start_time = time.time()
+
+    streams = load_streams(logs, conf_thres)
+    assert streams, f'No recorded detections found in {logs}'
+    ground_truth = load_events(events) if events else None
+
+    # drop the middle of long idle stretches, which can't change the outcome
+    keep_sec = max(max(alert_snooze_sec), 2 * max(confirm_sec), FPS_REFRESH_SEC) + 5
+    compressed, frames, kept = {}, 0, 0
+    for stream, (times, counts) in streams.items():
+        active = np.array([any(c in frame_counts for c in CLASS_OF_INTEREST) for frame_counts in counts])
+        if exact:
+            idx, shifted = np.arange(len(times)), times
+        else:
+            if min(confirm_thres) > 1 / MIN_QUEUE_LENGTH:
+                active = drop_isolated(times, active, max(confirm_sec))
+            idx, shifted = compress_idle(times, active, keep_sec)
+        compressed[stream] = (times[idx], shifted, [counts[i] for i in idx])
+        frames += len(times)
+        kept += len(idx)
+    print(f'Replaying {frames} frames ({kept} after idle compression) of {len(streams)} streams')
+
+    settings = list(itertools.product(confirm_sec, confirm_thres, alert_snooze_sec))
+    with ProcessPoolExecutor(max_workers=processes, initializer=init_worker, initargs=(compressed,)) as executor:
+        results = list(executor.map(replay_setting, settings, itertools.repeat(ground_truth),
+                                    itertools.repeat(grace_sec), chunksize=max(1, len(settings) // 64)))
+
+    results.sort(key=lambda r: (r['missed'], r['false_alerts'],
+                                r['mean_latency_sec'] if r['mean_latency_sec'] == r['mean_latency_sec'] else np.inf))
+    print_results(results, ground_truth is not None)
+    print(f'Replayed {len(settings)} settings in {time.time() - start_time:.1f}s')
+
+    if output:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f'Results saved to {output}')
+
+    return results
+
+def print_results(results, scored, limit=20):
+    """
+    Prints the best replay results as a table.
+    """
+    header = f"{'confirm_sec':>12}{'confirm_thres':>14}{'snooze_sec':>11}{'alerts':>8}"
+    if scored:
+        header += f"{'false':>8}{'missed':>8}{'latency':>10}{'max':>8}"
+    print(header)
+    for r in results[:limit]:
+        line = f"{r['confirm_sec']:>12g}{r['confirm_thres']:>14g}{r['alert_snooze_sec']:>11g}{r['alerts']:>8}"
+        if scored:
+            line += f"{r['false_alerts']:>8}{r['missed']:>8}{r['mean_latency_sec']:>9.1f}s{r['max_latency_sec']:>7.1f}s"
+        print(line)
+
+def parse_opt():
+    """
+    Parse command line arguments for detection replay tool.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Replay recorded detections through PoopDetector')
+    parser.add_argument('--logs', nargs='+', type=str, default=['runs/detections'], help='detection log files or folders')
+    parser.add_argument('--events', type=str, default=None, help='ground truth poop events CSV (stream,start,end)')
+    parser.add_argument('--confirm-sec', nargs='+', type=float, default=[1, 2, 3, 5], help='confirmation periods to sweep')
+    parser.add_argument('--confirm-thres', nargs='+', type=float, default=[0.5, 0.6, 0.75, 0.9], help='confirmation thresholds to sweep')
+    parser.add_argument('--alert-snooze-sec', nargs='+', type=float, default=[60, 300], help='alert snooze periods to sweep')
+    parser.add_argument('--conf-thres', type=float, default=0.0, help='ignore recorded detections below this confidence')
+    parser.add_argument('--grace-sec', type=float, default=30, help='alerts this long after an event still count for it')
+    parser.add_argument('--exact', action='store_true', help='replay every frame, without idle compression')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, default CPU count')
+    parser.add_argument('--output', type=str, default=None, help='write results to CSV file')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+import numpy as np
+import torch
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+from live import load_model
+
+from yolov5.utils.augmentations import letterbox
+from yolov5.utils.general import LOGGER, cv2, non_max_suppression, scale_boxes
+from yolov5.utils.torch_utils import smart_inference_mode
+
+class BatchingDetector:
+    """
+    BatchingDetector class responsible for sharing one model between concurrent requests. Requests
+    arriving within `batch_window_ms` of each other are stacked into a single inference batch.
+    """
+
+    def __init__(self, model, imgsz, conf_thres=0.25, iou_thres=0.45, max_det=1000, max_batch=8, batch_window_ms=10):
+        """
+        Initializes a BatchingDetector object.
+
+        Args:
+            model: The loaded DetectMultiBackend model.
+            imgsz: The inference size (height, width).
+            conf_thres: The confidence threshold.
+            iou_thres: The NMS IoU threshold.
+            max_det: The maximum detections per image.
+            max_batch: The maximum number of images per inference batch, forced to 1 for non-PyTorch models.
+            batch_window_ms: The time (in milliseconds) to wait for more requests after the first one.
+        """
+        self.model = model
+        self.imgsz = imgsz
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+        self.max_det = max_det
+        self.max_batch = max_batch if model.pt else 1  # exported models have a fixed batch size
+        self.batch_window = batch_window_ms / 1000
+        self.names = model.names
+        self.requests = 0
+        self.batches = 0
+        self.inference_sec = 0.0
+        self._queue = queue.Queue()
+
+        model.warmup(imgsz=(self.max_batch, 3, *imgsz))
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def submit(self, im0):
+        """
+        Queues an image for detection, letterboxing it on the calling thread.
+
+        Args:
+            im0 (numpy.ndarray): The BGR image.
+
+        Returns:
+            concurrent.futures.Future: The future detections, see `detect`.
+        """
+        im = letterbox(im0, self.imgsz, stride=self.model.stride, auto=False)[0]
+        im = im.transpose((2, 0, 1))[::-1]  # HWC to CHW, BGR to RGB
+        future = Future()
+        self._queue.put((im, im0.shape, future))
+        return future
+
+    def detect(self, im0):
+        """
+        Detects objects in an image, blocking until its batch has been processed.
+
+        Args:
+            im0 (numpy.ndarray): The BGR image.
+
+        Returns:
+            list: The detections, a dict of cls, name, conf and box (x1, y1, x2, y2 in original image pixels) each.
+        """
+        return self.submit(im0).result()
+
+    def stats(self):
+        """
+        Gets the request and batch counters.
+        """
+        return dict(requests=self.requests,
+                    batches=self.batches,
+                    avg_batch_size=round(self.requests / self.batches, 2) if self.batches else 0,
+                    avg_inference_ms=round(self.inference_sec / self.batches * 1E3, 1) if self.batches else 0)
+
+    def close(self):
+        """
+        Stops the batching thread after the queued requests are processed.
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # collect more requests until the batch is full or the window closes
+            batch = [item]
+            deadline = time.perf_counter() + self.batch_window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # stop after this batch
+                    break
+                batch.append(item)
+
+            try:
+                results = self._infer(batch)
+            except Exception as e:
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+            for (*_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    @smart_inference_mode()
+    def _infer(self, batch):
+        t = time.perf_counter()
+        im = torch.from_numpy(np.stack([im for im, _, _ in batch])).to(self.model.device)
+        im = im.half() if self.model.fp16 else im.float()  # uint8 to fp16/32
+        im /= 255  # 0 - 255 to 0.0 - 1.0
+
+        pred = self.model(im)
+        pred = non_max_suppression(pred, self.conf_thres, self.iou_thres, max_det=self.max_det)
+
+        results = []
+        for det, (_, shape, _) in zip(pred, batch):
+            det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], shape).round()
+            results.append([dict(cls=int(cls), name=self.names[int(cls)], conf=round(float(conf), 4),
+                                 box=[float(x) for x in xyxy]) for *xyxy, conf, cls in det.tolist()])
+
+        self.requests += len(batch)
+        self.batches += 1
+        self.inference_sec += time.perf_counter() - t
+        return results
+
+class DetectionRequestHandler(BaseHTTPRequestHandler):
+    """
+    DetectionRequestHandler class serving `POST /detect` (encoded image as body) and `GET /health`.
+    """
+    protocol_version = 'HTTP/1.1'  # keep connections alive between requests
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, self.server.detector.stats())
+        else:
+            self._send_json(404, dict(error=f'not found: {self.path}'))
+
+    def do_POST(self):
+        if self.path != '/detect':
+            self._send_json(404, dict(error=f'not found: {self.path}'))
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        im0 = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if im0 is None:
+            self._send_json(400, dict(error='cannot decode image'))
+            return
+
+        t = time.perf_counter()
+        try:
+            detections = self.server.detector.detect(im0)
+        except Exception as e:
+            LOGGER.error(e, exc_info=True)
+            self._send_json(500, dict(error=str(e)))
+            return
+        self._send_json(200, dict(detections=detections, ms=round((time.perf_counter() - t) * 1E3, 1)))
+
+    def _send_json(self, status, obj):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        LOGGER.debug(f'{self.address_string()} - {format % args}')
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """
+    ThreadingUnixHTTPServer class serving HTTP over a Unix domain socket.
+    """
+    daemon_threads = True
+
+def run(weights='best.pt',
+        data='dataset.yaml',
+        imgsz=640,
+        conf_thres=0.25,
+        iou_thres=0.45,
+        max_det=1000,
+        device='',
+        half=False,
+        dnn=False,
+        max_batch=8,
+        batch_window_ms=10,
+        host='127.0.0.1',
+        port=8765,
+        unix_socket=None,
+    ):
+    """
+    Loads the model once and serves detections over HTTP, or HTTP over a Unix domain socket.
+
+    Args:
+        weights (str): The model path or triton URL.
+        data (str): The dataset yaml file path.
+        imgsz (int): The inference size (pixels).
+        conf_thres (float): The confidence threshold.
+        iou_thres (float): The NMS IoU threshold.
+        max_det (int): The maximum detections per image.
+        device (str): The cuda device, i.e. 0 or 0,1,2,3 or cpu.
+        half (bool): Use FP16 half-precision inference.
+        dnn (bool): Use OpenCV DNN for ONNX inference.
+        max_batch (int): The maximum number of images per inference batch.
+        batch_window_ms (float): The time (in milliseconds) to wait for more requests after the first one.
+        host (str): The address to listen on.
+        port (int): The port to listen on.
+        unix_socket (str, optional): Listen on this Unix domain socket instead of host & port.
+    """
+    model, imgsz = load_model(weights, device, dnn, data, half, [imgsz, imgsz])
+    detector = BatchingDetector(model, imgsz, conf_thres, iou_thres, max_det, max_batch, batch_window_ms)
+
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)  # stale socket of a previous run
+        server = ThreadingUnixHTTPServer(unix_socket, DetectionRequestHandler)
+        address = f'unix://{unix_socket}'
+    else:
+        server = ThreadingHTTPServer((host, port), DetectionRequestHandler)
+        address = f'http://{host}:{port}'
+    server.detector = detector
+
+    LOGGER.info(f'Serving {weights} at {address} (max batch {detector.max_batch}, window {batch_window_ms}ms)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        detector.close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        LOGGER.info(f'Stopped, {detector.stats()}')
+
+def parse_opt():
+    """
+    Parse command line arguments for local inference server.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Local inference server')
+    parser.add_argument('--weights', type=str, default='best.pt', help='model path or triton URL')
+    parser.add_argument('--data', type=str, default='dataset.yaml', help='dataset.yaml path')
+    parser.add_argument('--imgsz', '--img', '--img-size', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--conf-thres', type=float, default=0.25, help='confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.45, help='NMS IoU threshold')
+    parser.add_argument('--max-det', type=int, default=1000, help='maximum detections per image')
+    parser.add_argument('--device', default='', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
+    parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
+    parser.add_argument('--dnn', action='store_true', help='use OpenCV DNN for ONNX inference')
+    parser.add_argument('--max-batch', type=int, default=8, help='maximum images per inference batch, 1 disables batching')
+    parser.add_argument('--batch-window-ms', type=float, default=10, help='time (in milliseconds) to wait for more requests')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on')
+    parser.add_argument('--unix-socket', type=str, default=None, help='listen on this Unix domain socket instead')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
@@ -0,0 +1,566 @@
+import os
+import json
+import time
+import queue
+import logging
+import logging.config
+import argparse
+import numpy as np
+import multiprocessing as mp
+from pathlib import Path
+
+from utils.framering import FrameRing
+from utils.logger import set_logger
+from utils.alert import AlertManager
+from utils.alertimage import AlertImage
+
+def open_capture(source):
+    import cv2
+    return cv2.VideoCapture(int(source) if source.isnumeric() else source)
+
+def probe_shape(source):
+    """
+    Reads the first frame of a source to get the frame shape its ring is created with.
+    """
+    cap = open_capture(source)
+    ok, frame = cap.read()
+    cap.release()
+    if not ok:
+        raise ConnectionError(f'Failed to read {source}')
+    return frame.shape
+
+def load_sources(source, repeat=1):
+    """
+    Lists the stream sources, from a `.streams` file (one source per line) or the given sources.
+
+    Args:
+        source (list): The sources, i.e. rtsp URLs, webcam ids or video files.
+        repeat (int): Repeat every source this many times, i.e. to simulate many cameras with a local video file.
+
+    Returns:
+        list: The sources.
+    """
+    sources = []
+    for s in source:
+        sources += Path(s).read_text().rsplit() if s.endswith('.streams') else [s]
+    return [s for s in sources for _ in range(repeat)]
+
+def capture_worker(source, ring_name, shape, slots, loop, stop):
+    """
+    Decodes a stream into its frame ring, runs in its own process. Local video files are paced at
+    their frame rate to simulate a camera.
+
+    Args:
+        source (str): The stream source.
+        ring_name (str): The shared memory name of the frame ring.
+        shape (tuple): The frame shape of the ring, frames of another size are resized.
+        slots (int): The number of frames the ring holds.
+        loop (bool): Rewind local video files when they end instead of exiting.
+        stop (multiprocessing.Event): Set to stop capturing.
+    """
+    import cv2
+
+    ring = FrameRing.attach(ring_name, shape, slots)
+    cap = open_capture(source)
+    is_file = os.path.isfile(source)
+    interval = 1 / (cap.get(cv2.CAP_PROP_FPS) or 30) if is_file else 0
+    next_t = time.perf_counter()
+    rewound = False
+    try:
+        while not stop.is_set():
+            ok, frame = cap.read()
+            if not ok:
+                if is_file and loop and not rewound:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    rewound = True  # a file without any readable frame must not spin
+                    continue
+                raise ConnectionError(f'{source} stream ended')
+            rewound = False
+
+            if frame.shape != tuple(shape):
+                frame = cv2.resize(frame, (shape[1], shape[0]))
+            ring.write(frame)
+
+            if interval:
+                next_t = max(next_t + interval, time.perf_counter() - 1)  # don't catch up more than 1 second
+                time.sleep(max(0.0, next_t - time.perf_counter()))
+    finally:
+        cap.release()
+        ring.close()
+
+def detect_worker(shard, streams, opt, results, stop):
+    """
+    Detects poop in the latest frame of every stream of a shard, runs in its own process with its own
+    model and one PoopDetector per stream. Alerts and metrics are sent to the supervisor.
+
+    Args:
+        shard (int): The shard id.
+        streams (list): The streams of the shard, a dict of id, source, ring, shape and slots each.
+        opt (dict): The model & PoopDetector options, see `run`.
+        results (multiprocessing.Queue): The queue of ('ready' | 'alert' | 'metrics', shard, payload) messages.
+        stop (multiprocessing.Event): Set to stop detecting.
+    """
+    import torch
+    from detector import PoopDetector
+    from live import load_model
+    from yolov5.utils.augmentations import letterbox
+    from yolov5.utils.general import non_max_suppression, scale_boxes
+    from yolov5.utils.plots import Annotator, colors
+
+    logging.config.fileConfig('logging.ini')
+    log = logging.getLogger(f'shard{shard}')
+    log.setLevel(logging.INFO)
+    torch.set_grad_enabled(False)
+
+    imgsz = [opt['imgsz'], opt['imgsz']]
+    model, imgsz = load_model(opt['weights'], opt['device'], opt['dnn'], opt['data'], opt['half'], imgsz, 1, opt['model_cache'])
+    max_batch = len(streams) if model.pt else 1  # exported models have a fixed batch size
+    model.warmup(imgsz=(max_batch, 3, *imgsz))
+
+    rings = [FrameRing.attach(s['ring'], s['shape'], s['slots']) for s in streams]
+    alert_image = AlertImage(**opt['alert_image'])
+    detectors = [PoopDetector(sound=None,
+                              no_alert=True,  # alerts are raised by the supervisor
+                              notify_img=False,
+                              no_notify=True,
+                              notifier=None,
+                              logger=logging.getLogger(f"cam{s['id']}"),
+                              confirm_sec=opt['confirm_sec'],
+                              confirm_thres=opt['confirm_thres'],
+                              alert_snooze_sec=0,  # the supervisor snoozes, across restarts too
+                              stream=s['id']) for s in streams]
+    last = [0] * len(streams)
+    frames = [0] * len(streams)
+    dropped = [0] * len(streams)
+    batches, inference_sec = 0, 0.0
+    results.put(('ready', shard, os.getpid()))
+    log.info(f"Detecting {', '.join(s['source'] for s in streams)}")
+
+    last_metrics = time.time()
+    try:
+        while not stop.is_set():
+            # take the latest frame of every stream with a new one
+            batch = []
+            for i, ring in enumerate(rings):
+                frame, n = ring.read(last[i])
+                if frame is not None:
+                    dropped[i] += n - last[i] - 1 if last[i] else 0
+                    last[i] = n
+                    batch.append((i, frame))
+
+            for chunk in [batch[j:j + max_batch] for j in range(0, len(batch), max_batch)]:
+                t = time.perf_counter()
+                im = np.stack([letterbox(im0, imgsz, stride=model.stride, auto=False)[0] for _, im0 in chunk])
+                im = torch.from_numpy(np.ascontiguousarray(im.transpose((0, 3, 1, 2))[:, ::-1])).to(model.device)
+                im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
+                im /= 255  # 0 - 255 to 0.0 - 1.0
+                pred = non_max_suppression(model(im), opt['conf_thres'], opt['iou_thres'], max_det=opt['max_det'])
+                inference_sec += time.perf_counter() - t
+                batches += 1
+
+                for (i, im0), det in zip(chunk, pred):
+                    frames[i] += 1
+                    det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
+                    if not detectors[i].process_detection(model, [det], im0):
+                        continue
+
+                    h, w = im0.shape[:2]
+                    boxes = [(x1 / w, y1 / h, x2 / w, y2 / h) for x1, y1, x2, y2 in det[:, :4].tolist()]
+                    image = None
+                    if opt['notify_img']:  # encoded here, frames are too large to pass to the supervisor
+                        annotator = Annotator(im0, line_width=2, example=str(model.names))
+                        for *xyxy, conf, cls in reversed(det):
+                            annotator.box_label(xyxy, f'{model.names[int(cls)]} {conf:.2f}', color=colors(int(cls), True))
+                        image = alert_image.encode(alert_image.crop(annotator.result(), boxes))
+                    results.put(('alert', shard, dict(stream=streams[i]['id'], t=time.time(), boxes=boxes, image=image)))
+
+            if not batch:
+                time.sleep(0.002)  # wait for new frames
+
+            if time.time() - last_metrics >= opt['metrics_sec']:
+                last_metrics = time.time()
+                results.put(('metrics', shard, dict(t=last_metrics, frames=list(frames), dropped=list(dropped),
+                                                    fps=[round(d.fps, 2) for d in detectors], batches=batches,
+                                                    inference_sec=inference_sec)))
+    finally:
+        results.put(('metrics', shard, dict(t=time.time(), frames=list(frames), dropped=list(dropped),
+                                            fps=[round(d.fps, 2) for d in detectors], batches=batches,
+                                            inference_sec=inference_sec)))
+        for ring in rings:
+            ring.close()
+
+class ShardSupervisor:
+    """
+    ShardSupervisor class responsible for running one capture process per stream and sharding the
+    streams across detection worker processes. Decoded frames move through shared memory frame
+    rings, confirmations and metrics are aggregated here, and failed processes are restarted
+    independently with exponential backoff.
+    """
+
+    def __init__(self, sources, opt, workers=2, slots=4, loop=True, alert_manager=None, heartbeat_sec=120, logger=None):
+        """
+        Initializes a ShardSupervisor object.
+
+        Args:
+            sources: The stream sources.
+            opt: The model & PoopDetector options passed to the detection workers, see `run`.
+            workers: The number of detection worker processes, streams are sharded round robin.
+            slots: The number of frames each frame ring holds.
+            loop: Rewind local video files when they end.
+            alert_manager: The AlertManager raising alerts for the confirmations of all streams.
+            heartbeat_sec: Restart a detection worker not reporting metrics for this long.
+            logger: The logger object for logging messages.
+        """
+        self.sources = sources
+        self.opt = opt
+        self.workers = min(workers, len(sources))
+        self.slots = slots
+        self.loop = loop
+        self.alert_manager = alert_manager or AlertManager(logger=logger)
+        self.heartbeat_sec = heartbeat_sec
+        self.log = logger or logging.getLogger()
+
+        self.alerts = []
+        self.restarts = 0
+        self.metrics = {}
+        self._ctx = mp.get_context('spawn')
+        self._stop = self._ctx.Event()
+        self._results = self._ctx.Queue()
+        self._rings = []
+        self._procs = {}  # ('capture' | 'detect', index) to its process state
+        self._carry = {}  # metrics of previous runs of restarted detection workers
+        self._ready = set()
+        self.ready_time = None
+
+    def start(self):
+        """
+        Creates the frame rings and starts the capture and detection processes.
+        """
+        streams = []
+        for i, source in enumerate(self.sources):
+            shape = probe_shape(source)
+            ring = FrameRing.create(shape, self.slots)
+            self._rings.append(ring)
+            streams.append(dict(id=i, source=source, ring=ring.name, shape=shape, slots=self.slots))
+            self._start(('capture', i), capture_worker, (source, ring.name, shape, self.slots, self.loop, self._stop))
+
+        for shard in range(self.workers):
+            self._start(('detect', shard), detect_worker,
+                        (shard, streams[shard::self.workers], self.opt, self._results, self._stop))
+
+    def poll(self, timeout=0.5):
+        """
+        Handles worker messages for up to `timeout` seconds, then restarts failed workers.
+        """
+        deadline = time.time() + timeout
+        while True:
+            try:
+                kind, shard, payload = self._results.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                break
+            self._procs[('detect', shard)]['heartbeat'] = time.time()
+            if kind == 'ready':
+                if shard in self.metrics:  # restarted, keep counting from the previous run
+                    self._carry[shard] = self._add(self._carry.get(shard), self.metrics.pop(shard))
+                self._ready.add(shard)
+                if len(self._ready) == self.workers and self.ready_time is None:
+                    self.ready_time = time.time()
+                    self.log.info(f'{self.workers} detection workers ready')
+            elif kind == 'alert':
+                self.alert(**payload)
+            elif kind == 'metrics':
+                self.metrics[shard] = payload
+        self._check_workers()
+
+    def alert(self, stream, t, boxes=None, image=None):
+        """
+        Hands a poop confirmed on a stream to the alert manager, which dedupes it against the other streams.
+        """
+        self.log.info(f'Poop confirmed on {self.sources[stream]}')
+        if self.alert_manager.alert(stream, boxes, image, label=f'camera {stream}'):
+            self.alerts.append((stream, t))
+
+    def summary(self):
+        """
+        Aggregates the latest metrics of all detection workers.
+
+        Returns:
+            dict: The processed frames, dropped frames, frames per second and per stream metrics.
+        """
+        streams = []
+        frames = dropped = batches = 0
+        inference_sec = 0.0
+        for shard in sorted(set(self.metrics) | set(self._carry)):
+            m = self._add(self._carry.get(shard), self.metrics.get(shard))
+            for j, stream in enumerate(range(shard, len(self.sources), self.workers)):
+                streams.append(dict(stream=stream, shard=shard, frames=m['frames'][j], dropped=m['dropped'][j], fps=m['fps'][j]))
+            frames += sum(m['frames'])
+            dropped += sum(m['dropped'])
+            batches += m['batches']
+            inference_sec += m['inference_sec']
+        elapsed = time.time() - self.ready_time if self.ready_time else 0
+        return dict(workers=self.workers,
+                    streams=len(self.sources),
+                    frames=frames,
+                    dropped=dropped,
+                    fps=round(frames / elapsed, 2) if elapsed else 0,
+                    avg_batch_size=round(frames / batches, 2) if batches else 0,
+                    avg_inference_ms=round(inference_sec / batches * 1E3, 1) if batches else 0,
+                    alerts=len(self.alerts),
+                    restarts=self.restarts,
+                    per_stream=sorted(streams, key=lambda s: s['stream']))
+
+    def stop(self):
+        """
+        Stops all processes and removes the frame rings.
+        """
+        self._stop.set()
+        deadline = time.time() + 10
+        while any(proc['process'].is_alive() for proc in self._procs.values()) and time.time() < deadline:
+            try:  # keep draining, a worker can't exit while its last messages are unread
+                kind, shard, payload = self._results.get(timeout=0.1)
+                if kind == 'metrics':
+                    self.metrics[shard] = payload
+            except queue.Empty:
+                pass
+        for proc in self._procs.values():
+            if proc['process'].is_alive():
+                proc['process'].terminate()
+            proc['process'].join()
+        for ring in self._rings:
+            ring.close()
+            ring.unlink()
+        self._rings = []
+
+    def _start(self, key, target, args):
+        p = self._ctx.Process(target=target, args=args, name=f'{key[0]}{key[1]}', daemon=True)
+        p.start()
+        proc = self._procs.setdefault(key, dict(target=target, args=args, failures=0))
+        proc.update(process=p, started=time.time(), heartbeat=time.time(), restart_at=None)
+
+    def _check_workers(self):
+        now = time.time()
+        for key, proc in self._procs.items():
+            p = proc['process']
+            if proc['restart_at'] is not None:
+                if now >= proc['restart_at']:
+                    self.log.info(f'Restarting {p.name}')
+                    self.restarts += 1
+                    self._start(key, proc['target'], proc['args'])
+                continue
+
+            if p.is_alive() and key[0] == 'detect' and now - proc['heartbeat'] > self.heartbeat_sec:
+                self.log.error(f"{p.name} not responding for {now - proc['heartbeat']:.0f}s, terminating")
+                p.terminate()
+                p.join()
+            if p.is_alive():
+                if now - proc['started'] > 600:
+                    proc['failures'] = 0  # healthy for a while, reset the backoff
+                continue
+
+            delay = min(60, 2 ** proc['failures'])  # exponential backoff
+            proc['failures'] += 1
+            proc['restart_at'] = now + delay
+            if key[0] == 'detect':
+                self._ready.discard(key[1])
+            self.log.error(f'{p.name} exited ({p.exitcode}), restarting in {delay}s')
+
+    @staticmethod
+    def _add(a, b):
+        if a is None or b is None:
+            return a or b
+        return dict(t=b['t'],
+                    frames=[x + y for x, y in zip(a['frames'], b['frames'])],
+                    dropped=[x + y for x, y in zip(a['dropped'], b['dropped'])],
+                    fps=b['fps'],
+                    batches=a['batches'] + b['batches'],
+                    inference_sec=a['inference_sec'] + b['inference_sec'])
+
+def run(weights='best.pt',
+        source=('0',),
+        repeat=1,
+        data='dataset.yaml',
+        imgsz=640,
+        conf_thres=0.75,
+        iou_thres=0.45,
+        max_det=1000,
+        device='',
+        half=False,
+        dnn=False,
+        model_cache=None,
+        workers=(2,),
+        slots=4,
+        no_loop=False,
+        duration=None,
+        metrics_sec=10,
+        sound='sounds/police.wav',
+        no_alert=False,
+        no_notify=False,
+        notify_img=False,
+        cfg='config.json',
+        confirm_sec=2,
+        confirm_thres=0.75,
+        alert_snooze_sec=60,
+        alert_state='runs/alert-state.json',
+        sound_per_hour=30,
+        push_per_hour=20,
+        dedupe_sec=30,
+        dedupe_iou=0.0,
+        alert_img_size=1280,
+        alert_img_format='jpg',
+        alert_img_quality=80,
+        alert_img_context=1.0,
+        alert_img_full=False,
+        logger=None,
+    ):
+    """
+    Runs sharded detection over many streams. With several worker counts and a duration, each
+    count is run in turn and the throughput is compared.
+
+    Args:
+        weights (str): The model path or triton URL.
+        source (list): The sources or `.streams` files.
+        repeat (int): Repeat every source this many times, i.e. to simulate many cameras with a local video file.
+        data (str): The dataset yaml file path.
+        imgsz (int): The inference size (pixels).
+        conf_thres (float): The confidence threshold.
+        iou_thres (float): The NMS IoU threshold.
+        max_det (int): The maximum detections per image.
+        device (str): The cuda device, i.e. 0 or 0,1,2,3 or cpu.
+        half (bool): Use FP16 half-precision inference.
+        dnn (bool): Use OpenCV DNN for ONNX inference.
+        model_cache (str, optional): Cache a fused TorchScript artifact of .pt weights in this folder.
+        workers (list): The number of detection worker processes, several to compare scaling.
+        slots (int): The number of frames each frame ring holds.
+        no_loop (bool): Exit capturing when a local video file ends instead of rewinding it.
+        duration (float, optional): Stop after this many seconds, runs until interrupted by default.
+        metrics_sec (float): Workers report metrics every this many seconds.
+        sound (str): The alert sound file.
+        no_alert (bool): Disable the alert sound.
+        no_notify (bool): Disable the push notification.
+        notify_img (bool): Attach the detection image in the push notification.
+        cfg (str): The configuration file with the pushbullet api key.
+        confirm_sec (float): The time (in seconds) to confirm if there is poop.
+        confirm_thres (float): The poop confirmation threshold.
+        alert_snooze_sec (float): The alert snooze period (in seconds) per stream.
+        alert_state (str): The file persisting alert snooze & rate limit state across restarts.
+        sound_per_hour (float): The alert sound rate limit.
+        push_per_hour (float): The push notification rate limit.
+        dedupe_sec (float): Confirmations within this many seconds of another camera's alert are duplicates.
+        dedupe_iou (float): The IoU above which detections of different cameras overlap, 0 dedupes on time only.
+        alert_img_size (int): The maximum width & height (pixels) of notification images.
+        alert_img_format (str): The notification image format, jpg or webp.
+        alert_img_quality (int): The notification image quality (1 - 100).
+        alert_img_context (float): The context kept around detections in notification images, as a fraction of their size.
+        alert_img_full (bool): Do not crop notification images to the detections.
+        logger: The logger object for logging messages.
+
+    Returns:
+        list: The summary of each worker count.
+    """
+    log = logger or logging.getLogger()
+    sources = load_sources(source, repeat)
+    opt = dict(weights=weights, data=data, imgsz=imgsz, conf_thres=conf_thres, iou_thres=iou_thres, max_det=max_det,
+               device=device, half=half, dnn=dnn, model_cache=model_cache, confirm_sec=confirm_sec,
+               confirm_thres=confirm_thres, notify_img=notify_img,
+               alert_image=dict(max_size=alert_img_size, fmt=alert_img_format, quality=alert_img_quality,
+                                context=None if alert_img_full else alert_img_context),
+               metrics_sec=metrics_sec)
+
+    notifier = None
+    if not no_notify:
+        from utils.pushbullet import PushbulletNotification
+        with open(cfg) as f:
+            notifier = PushbulletNotification(api_key=json.load(f)['pushbullet']['apikey'], title='Poop Detector')
+    alert_manager = AlertManager(notifier=notifier,
+                                 sound=sound,
+                                 no_alert=no_alert,
+                                 no_notify=no_notify,
+                                 snooze_sec=alert_snooze_sec,
+                                 dedupe_sec=dedupe_sec,
+                                 dedupe_iou=dedupe_iou,
+                                 sound_per_hour=sound_per_hour,
+                                 push_per_hour=push_per_hour,
+                                 state=alert_state,
+                                 alert_image=AlertImage(**opt['alert_image']),
+                                 logger=log)
+
+    summaries = []
+    for n in workers:
+        supervisor = ShardSupervisor(sources, opt, n, slots, not no_loop, alert_manager, logger=log)
+        log.info(f'Sharding {len(sources)} streams across {supervisor.workers} detection workers')
+        supervisor.start()
+        last_report = time.time()
+        try:
+            while duration is None or supervisor.ready_time is None or time.time() - supervisor.ready_time < duration:
+                supervisor.poll()
+                if time.time() - last_report >= metrics_sec and supervisor.ready_time:
+                    last_report = time.time()
+                    s = supervisor.summary()
+                    log.info(f"{s['fps']} fps over {s['streams']} streams, {s['dropped']} frames dropped, "
+                             f"batch {s['avg_batch_size']}, inference {s['avg_inference_ms']}ms, {s['restarts']} restarts")
+        except KeyboardInterrupt:
+            log.warning('Terminated by user')
+            break
+        finally:
+            supervisor.stop()
+            summaries.append(supervisor.summary())
+
+    print(f"{'workers':>8}{'streams':>9}{'fps':>9}{'fps/stream':>12}{'dropped':>9}{'batch':>7}{'infer ms':>10}{'restarts':>10}")
+    for s in summaries:
+        print(f"{s['workers']:>8}{s['streams']:>9}{s['fps']:>9.1f}{s['fps'] / s['streams']:>12.2f}{s['dropped']:>9}"
+              f"{s['avg_batch_size']:>7.2f}{s['avg_inference_ms']:>10.1f}{s['restarts']:>10}")
+    return summaries
+
+def parse_opt():
+    """
+    Parse command line arguments for sharded multi-camera detection.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Sharded multi-camera Poop Detector')
+    parser.add_argument('--weights', type=str, default='best.pt', help='model path or triton URL')
+    parser.add_argument('--source', nargs='+', type=str, default=['0'], help='sources (rtsp URL, webcam id, video file) or .streams files')
+    parser.add_argument('--repeat', type=int, default=1, help='repeat every source, i.e. to simulate many cameras with a video file')
+    parser.add_argument('--data', type=str, default='dataset.yaml', help='dataset.yaml path')
+    parser.add_argument('--imgsz', '--img', '--img-size', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--conf-thres', type=float, default=0.75, help='confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.45, help='NMS IoU threshold')
+    parser.add_argument('--max-det', type=int, default=1000, help='maximum detections per image')
+    parser.add_argument('--device', default='', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
+    parser.add_argument('--half', action='store_true', help='use FP16 half-precision inference')
+    parser.add_argument('--dnn', action='store_true', help='use OpenCV DNN for ONNX inference')
+    parser.add_argument('--model-cache', type=str, default=None, help='cache a fused TorchScript artifact of .pt weights in this folder')
+    parser.add_argument('--workers', nargs='+', type=int, default=[2], help='detection worker processes, i.e. 1 2 4 to compare scaling')
+    parser.add_argument('--slots', type=int, default=4, help='frames held by each shared memory frame ring')
+    parser.add_argument('--no-loop', action='store_true', help='do not rewind local video files when they end')
+    parser.add_argument('--duration', type=float, default=None, help='stop after this many seconds (per worker count)')
+    parser.add_argument('--metrics-sec', type=float, default=10, help='metrics report period (in seconds)')
+    parser.add_argument('--sound', type=str, default='sounds/police.wav', help='alert sound file')
+    parser.add_argument('--no-alert', action='store_true', help='disable alert sound')
+    parser.add_argument('--no-notify', action='store_true', help='disable push notification')
+    parser.add_argument('--notify-img', action='store_true', help='attach detection image in push notification')
+    parser.add_argument('--cfg', type=str, default='config.json', help='configuration file')
+    parser.add_argument('--confirm-sec', type=float, default=2, help='time to confirm if there is poop')
+    parser.add_argument('--confirm-thres', type=float, default=0.75, help='poop confirmation threshold')
+    parser.add_argument('--alert-snooze-sec', type=int, default=60, help='poop alert snooze period (in seconds)')
+    parser.add_argument('--alert-img-size', type=int, default=1280, help='maximum width & height (pixels) of notification images')
+    parser.add_argument('--alert-img-format', type=str, default='jpg', choices=['jpg', 'webp'], help='notification image format')
+    parser.add_argument('--alert-img-quality', type=int, default=80, help='notification image quality (1 - 100)')
+    parser.add_argument('--alert-img-context', type=float, default=1.0, help='context kept around detections in notification images, as a fraction of their size')
+    parser.add_argument('--alert-img-full', action='store_true', help='do not crop notification images to the detections')
+    parser.add_argument('--alert-state', type=str, default='runs/alert-state.json', help='file persisting alert snooze & rate limit state across restarts')
+    parser.add_argument('--sound-per-hour', type=float, default=30, help='alert sound rate limit')
+    parser.add_argument('--push-per-hour', type=float, default=20, help='push notification rate limit')
+    parser.add_argument('--dedupe-sec', type=float, default=30, help='confirmations within this many seconds of another camera alert are duplicates')
+    parser.add_argument('--dedupe-iou', type=float, default=0.0, help='IoU above which detections of different cameras overlap, 0 dedupes on time only')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt), logger=set_logger('shard'))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
@@ -0,0 +1,284 @@
+import os
+import csv
+import time
+import argparse
+import threading
+import _thread
+import numpy as np
+import cv2
+from typing import Optional
+from pathlib import Path
+
+from utils.pushbullet import INotification
+from utils.logger import set_logger
+from utils.alert import AlertManager
+from utils.alertimage import AlertImage
+from utils.files import folder_size
+from detector import PoopDetector
+
+class NullNotification(INotification):
+    """
+    NullNotification class is a stand-in notifier that sends nothing, counting the notifications instead.
+    Images still go through `file_bytes`, so spilling to `spill_folder` is exercised.
+    """
+
+    def __init__(self, spill_folder='temp', spill_quota_mb=50):
+        self._title = None
+        self.spill_folder = spill_folder
+        self.spill_quota_mb = spill_quota_mb
+        self.texts = 0
+        self.files = 0
+
+    @property
+    def title(self):
+        return self._title
+
+    @title.setter
+    def title(self, value: str):
+        self._title = value
+
+    def text(self, msg: str, title: Optional[str] = None):
+        self.texts += 1
+
+    def file(self, filepath: str, msg: str, title: Optional[str] = None):
+        self.files += 1
+
+class SoakDetector(PoopDetector):
+    """
+    SoakDetector class is a PoopDetector that counts the processed frames and the alerts raised.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.frames = 0
+        self.alerts_raised = 0
+
+    def process_detection(self, model, pred, im0, raw=None):
+        self.frames += 1
+        confirmed = super().process_detection(model, pred, im0, raw)
+        self.alerts_raised += bool(confirmed)
+        return confirmed
+
+def synthetic_video(path, size=(960, 540), fps=15, seconds=10, seed=0):
+    """
+    Writes a video of a blob moving over a noisy background, a second stream of another frame size.
+    """
+    rng = np.random.default_rng(seed)
+    w, h = size
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (h, w, 3), dtype=np.uint8), (0, 0), 25)
+    for i in range(fps * seconds):
+        frame = np.clip(background.astype(np.int16) + rng.normal(0, 3, background.shape), 0, 255).astype(np.uint8)
+        x, y = int(w * (0.1 + 0.8 * (i / (fps * seconds)))), int(h * 0.6)
+        cv2.ellipse(frame, (x, y), (30, 18), 0, 0, 360, (40, 60, 90), -1)
+        writer.write(frame)
+    writer.release()
+
+def process_stats():
+    """
+    Gets the resident memory (MB), open file descriptors (handles on Windows) and threads of this process.
+    """
+    import psutil  # installed with yolov5
+    p = psutil.Process()
+    fds = p.num_fds() if hasattr(p, 'num_fds') else p.num_handles()
+    return p.memory_info().rss / 1E6, fds, p.num_threads()
+
+def trends(samples, warmup=0.25):
+    """
+    Compares the samples of the first and the last half of a soak, after a warmup.
+
+    Args:
+        samples (list): The samples, a dict of the metrics each.
+        warmup (float): The fraction of the samples skipped, allocations settle during warmup.
+
+    Returns:
+        dict: Per metric, the median of the first & last half and the slope per hour.
+    """
+    samples = samples[int(len(samples) * warmup):]
+    half = len(samples) // 2
+    result = {}
+    for metric in ('rss_mb', 'fds', 'threads', 'latency_p50_ms', 'latency_p95_ms', 'spill_mb'):
+        values = np.array([s[metric] for s in samples], dtype=float)
+        hours = np.array([s['elapsed_sec'] for s in samples], dtype=float) / 3600
+        result[metric] = dict(first=float(np.median(values[:half])),
+                              last=float(np.median(values[half:])),
+                              slope_per_hour=float(np.polyfit(hours, values, 1)[0]) if len(values) > 1 else 0.0)
+    return result
+
+def run(weights='best.pt',
+        source='dataset/tests/test1.mp4',
+        data='dataset.yaml',
+        imgsz=640,
+        device='',
+        hours=2.0,
+        sample_sec=30,
+        warmup=0.25,
+        confirm_sec=1,
+        confirm_thres=0.5,
+        rss_tol_mb=50,
+        fd_tol=5,
+        thread_tol=5,
+        latency_tol=0.25,
+        spill_quota_mb=5,
+        folder='runs/soak',
+    ):
+    """
+    Soaks live detection: loops a test video and a synthetic video as two streams through live.run, faster than
+    real time, with a stand-in notifier and alerts snoozed for seconds only, sampling resident memory, open file
+    descriptors, threads, per-image latency and the notification spill folder. Fails when any of them keeps
+    growing beyond tolerance.
+
+    Args:
+        weights (str): The model path.
+        source (str): The test video.
+        data (str): The dataset.yaml path.
+        imgsz (int): The inference size (pixels).
+        device (str): The cuda device, i.e. 0 or cpu.
+        hours (float): The duration (in hours) of the soak.
+        sample_sec (float): The sampling interval (in seconds).
+        warmup (float): The fraction of the samples skipped by the trend check.
+        confirm_sec (float): The time (in seconds) to confirm if there is poop.
+        confirm_thres (float): The poop confirmation threshold.
+        rss_tol_mb (float): The tolerated resident memory growth (MB).
+        fd_tol (int): The tolerated growth of open file descriptors.
+        thread_tol (int): The tolerated growth of threads.
+        latency_tol (float): The tolerated growth of the median per-image latency, as a fraction.
+        spill_quota_mb (float): The notification spill folder quota (MB).
+        folder (str): The folder of the sources, spilled notifications and the samples CSV.
+
+    Returns:
+        bool: True if passed.
+    """
+    log = set_logger('soak')
+    import live  # imports torch & the model code
+
+    os.makedirs(folder, exist_ok=True)
+    synthetic = os.path.join(folder, 'synthetic.mp4')
+    if not os.path.isfile(synthetic):
+        synthetic_video(synthetic)
+    streams = os.path.join(folder, 'soak.streams')
+    Path(streams).write_text(f'{os.path.abspath(source)}\n{os.path.abspath(synthetic)}\n')
+
+    notifier = NullNotification(spill_folder=os.path.join(folder, 'temp'), spill_quota_mb=spill_quota_mb)
+    alerts = AlertManager(notifier=notifier,
+                          no_alert=True,
+                          snooze_sec=5,  # alert often, every alert copies & encodes a frame
+                          dedupe_sec=0,
+                          sound_per_hour=3600,
+                          push_per_hour=3600,
+                          alert_image=AlertImage(),
+                          logger=log)
+    detector = SoakDetector(sound=None,
+                            no_alert=True,
+                            notify_img=True,
+                            no_notify=False,
+                            notifier=notifier,
+                            logger=log,
+                            confirm_sec=confirm_sec,
+                            confirm_thres=confirm_thres,
+                            alerts=alerts)
+
+    samples, stop = [], threading.Event()
+    # per-image processing time of every batch, batches of the two streams hold 1 or 2 images
+    latencies = []
+    on_batch = lambda sec, n: latencies.append(sec / n)
+    path = os.path.join(folder, f'soak-{time.strftime("%Y%m%d-%H%M%S")}.csv')
+
+    def sample():
+        start = time.time()
+        with open(path, 'w', newline='') as f:
+            writer = None
+            while not stop.wait(sample_sec):
+                recent = latencies[:len(latencies)]
+                del latencies[:len(recent)]  # batches appended meanwhile stay for the next sample
+                rss_mb, fds, threads = process_stats()
+                s = dict(elapsed_sec=round(time.time() - start),
+                         frames=detector.frames,
+                         alerts=detector.alerts_raised,
+                         notifications=notifier.texts + notifier.files,
+                         rss_mb=round(rss_mb, 1),
+                         fds=fds,
+                         threads=threads,
+                         latency_p50_ms=round(float(np.percentile(recent, 50)) * 1E3, 1) if recent else 0.0,
+                         latency_p95_ms=round(float(np.percentile(recent, 95)) * 1E3, 1) if recent else 0.0,
+                         spill_mb=round(folder_size(notifier.spill_folder) / 1E6, 2))
+                samples.append(s)
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(s))
+                    writer.writeheader()
+                writer.writerow(s)
+                f.flush()
+                log.info(', '.join(f'{k} {v}' for k, v in s.items()))
+                if s['elapsed_sec'] >= hours * 3600:
+                    _thread.interrupt_main()  # stops live.run, it closes the streams on the way out
+                    return
+
+    threading.Thread(target=sample, daemon=True).start()
+    try:
+        live.run(detector=detector, weights=weights, source=streams, data=data, imgsz=imgsz, device=device, nosave=True,
+                 on_batch=on_batch)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+
+    if len(samples) < 4:
+        log.error(f'Too few samples ({len(samples)}) for a trend, soak longer or sample more often')
+        return False
+
+    t = trends(samples, warmup)
+    limits = dict(rss_mb=rss_tol_mb,
+                  fds=fd_tol,
+                  threads=thread_tol,
+                  latency_p50_ms=t['latency_p50_ms']['first'] * latency_tol,
+                  spill_mb=spill_quota_mb)
+    failed = []
+    for metric, m in t.items():
+        growth = m['last'] - m['first']
+        limit = limits.get(metric)
+        ok = limit is None or (growth <= limit if metric != 'spill_mb' else m['last'] <= limit)
+        if not ok:
+            failed.append(metric)
+        log.info(f"{metric}: {m['first']:g} -> {m['last']:g} ({m['slope_per_hour']:+.2f}/h)" +
+                 ('' if limit is None else f", limit {'+' if metric != 'spill_mb' else ''}{limit:g}") +
+                 ('' if ok else ' FAILED'))
+
+    last = samples[-1]
+    log.info(f"Soaked {last['elapsed_sec'] / 3600:.2f}h, {last['frames']} frames, {last['alerts']} alerts, "
+             f"samples {path}: {'FAILED ' + ', '.join(failed) if failed else 'passed'}")
+    return not failed
+
+def parse_opt():
+    """
+    Parse command line arguments for soak test.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Live detection soak test')
+    parser.add_argument('--weights', type=str, default='best.pt', help='model path')
+    parser.add_argument('--source', type=str, default='dataset/tests/test1.mp4', help='test video')
+    parser.add_argument('--data', type=str, default='dataset.yaml', help='dataset.yaml path')
+    parser.add_argument('--imgsz', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--device', default='', help='cuda device, i.e. 0 or cpu')
+    parser.add_argument('--hours', type=float, default=2.0, help='duration (in hours)')
+    parser.add_argument('--sample-sec', type=float, default=30, help='sampling interval (in seconds)')
+    parser.add_argument('--warmup', type=float, default=0.25, help='fraction of samples skipped by the trend check')
+    parser.add_argument('--confirm-sec', type=float, default=1, help='time (in seconds) to confirm if there is poop')
+    parser.add_argument('--confirm-thres', type=float, default=0.5, help='poop confirmation threshold')
+    parser.add_argument('--rss-tol-mb', type=float, default=50, help='tolerated resident memory growth (MB)')
+    parser.add_argument('--fd-tol', type=int, default=5, help='tolerated growth of open file descriptors')
+    parser.add_argument('--thread-tol', type=int, default=5, help='tolerated growth of threads')
+    parser.add_argument('--latency-tol', type=float, default=0.25, help='tolerated growth of the median per-image latency (fraction)')
+    parser.add_argument('--spill-quota-mb', type=float, default=5, help='notification spill folder quota (MB)')
+    parser.add_argument('--folder', type=str, default='runs/soak', help='folder of the sources, spilled notifications and samples')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    if not run(**vars(opt)):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
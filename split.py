@@ -0,0 +1,121 @@
+import os
+import hashlib
+import argparse
+from collections import Counter, defaultdict
+from utils.dataset import label_path, list_images, load_data, read_labels, source_group
+
+def run(images='dataset/images',
+        data='dataset.yaml',
+        val_ratio=0.2,
+        test_ratio=0.1,
+        seed=0,
+        output='dataset',
+    ):
+    """
+    Splits the dataset into deterministic train, val & test image lists. Training picks its best
+    weights on val, so models are compared on test, which training never sees.
+
+    Images are grouped by source (the day the footage was captured) so near-identical frames never
+    end up on both sides of the split, and groups are stratified by their rarest class so every
+    class is represented in val & test.
+
+    Args:
+        images (str): The folder of dataset images.
+        data (str): The dataset yaml file path, for class names.
+        val_ratio (float): The fraction of images to put in val.
+        test_ratio (float): The fraction of images to put in test.
+        seed (int): The seed of the deterministic group ordering.
+        output (str): The folder to write `train.txt`, `val.txt` & `test.txt` to.
+
+    Returns:
+        tuple: The train, val & test image file paths.
+    """
+    names = load_data(data)['names']
+
+    # group images by source
+    groups = defaultdict(list)
+    classes = {}
+    for image in list_images(images):
+        groups[source_group(image)].append(image)
+        classes[image] = {int(label[0]) for label in read_labels(label_path(image))}
+
+    # class frequency (in images), for finding rarest class of each group
+    class_freq = Counter(c for image_classes in classes.values() for c in image_classes)
+
+    # stratify groups by their rarest class, background-only groups have their own stratum
+    strata = defaultdict(list)
+    for key, group in groups.items():
+        group_classes = set().union(*(classes[image] for image in group))
+        stratum = min(group_classes, key=lambda c: (class_freq[c], c)) if group_classes else -1
+        strata[stratum].append(key)
+
+    train, val, test = [], [], []
+    for stratum in sorted(strata):
+        # deterministic, seeded group order
+        keys = sorted(strata[stratum], key=lambda k: hashlib.sha1(f'{seed}:{k}'.encode()).hexdigest())
+        total = sum(len(groups[k]) for k in keys)
+
+        counts = {'val': 0, 'test': 0}
+        targets = {'val': val_ratio * total, 'test': test_ratio * total}
+        splits = {'val': val, 'test': test}
+        for i, key in enumerate(keys):
+            n = len(groups[key])
+            # add group to val (then test) if it brings it closer to target, always leaving one group in train
+            split = next((k for k in ('val', 'test') if i < len(keys) - 1 and
+                          abs(counts[k] + n - targets[k]) < abs(counts[k] - targets[k])), None)
+            if split is None:
+                train += groups[key]
+            else:
+                splits[split] += groups[key]
+                counts[split] += n
+
+    train, val, test = sorted(train), sorted(val), sorted(test)
+
+    # write image lists, relative to output folder like yolov5 expects
+    os.makedirs(output, exist_ok=True)
+    for split, split_images in (('train', train), ('val', val), ('test', test)):
+        with open(os.path.join(output, f'{split}.txt'), 'w') as f:
+            f.write(''.join(f'./{os.path.relpath(image, output).replace(os.sep, "/")}\n' for image in split_images))
+
+    # print summary
+    print(f"{'split':>8}{'images':>8}{'groups':>8}" + ''.join(f'{name:>8}' for name in names))
+    for split, split_images in (('train', train), ('val', val), ('test', test)):
+        split_groups = {source_group(image) for image in split_images}
+        counts = Counter(c for image in split_images for c in classes[image])
+        print(f'{split:>8}{len(split_images):>8}{len(split_groups):>8}' +
+              ''.join(f'{counts[c]:>8}' for c in range(len(names))))
+
+    return train, val, test
+
+def parse_opt():
+    """
+    Parse command line arguments for dataset split tool.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Deterministic train/val/test dataset split tool')
+    parser.add_argument('--images', type=str, default='dataset/images', help='folder of dataset images')
+    parser.add_argument('--data', type=str, default='dataset.yaml', help='dataset.yaml path')
+    parser.add_argument('--val-ratio', type=float, default=0.2, help='fraction of images in val split. Default 0.2')
+    parser.add_argument('--test-ratio', type=float, default=0.1, help='fraction of images in test split. Default 0.1')
+    parser.add_argument('--seed', type=int, default=0, help='seed of deterministic split. Default 0')
+    parser.add_argument('--output', type=str, default='dataset', help='folder to write train.txt, val.txt & test.txt')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    """
+    Main function to run the program.
+
+    Args:
+        opt: An object containing the program options.
+
+    Returns:
+        None
+    """
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
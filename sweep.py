@@ -0,0 +1,222 @@
+import os
+import csv
+import time
+import argparse
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from train import delete_label_cache, elapsed_time
+
+def pareto_front(results, metric='map50'):
+    """
+    Finds the Pareto-optimal results, i.e. no other result is both faster and more accurate.
+
+    Args:
+        results (list): The sweep results, each a dict with `latency_ms` and `metric` keys.
+        metric (str): The accuracy metric to maximize.
+
+    Returns:
+        list: The Pareto-optimal results, sorted by latency.
+    """
+    front, best = [], -1.0
+    for result in sorted(results, key=lambda r: (r['latency_ms'], -r[metric])):
+        if result[metric] > best:
+            front.append(result)
+            best = result[metric]
+    return front
+
+def init_worker(threads):
+    """
+    Limits the CPU threads of a sweep worker process so that parallel workers don't oversubscribe
+    the cores.
+    """
+    import torch
+    torch.set_num_threads(threads)
+
+def build_label_caches(data):
+    """
+    Builds the label caches of the train & val splits, the way yolov5 training does, so that the
+    parallel training processes all read the same caches rather than racing to write them.
+
+    Args:
+        data (str): The dataset yaml file path.
+    """
+    from yolov5.utils.dataloaders import LoadImagesAndLabels
+    from yolov5.utils.general import check_dataset
+
+    delete_label_cache()
+    cfg = check_dataset(data)
+    for split in ('train', 'val'):
+        LoadImagesAndLabels(cfg[split], prefix=f'{split}: ')
+
+def train_config(config, data, epochs, batch_size, device, workers, project):
+    """
+    Trains one sweep configuration, runs in a worker process.
+
+    Args:
+        config (dict): The configuration, with `weights`, `imgsz` & `freeze` keys.
+        data (str): The dataset yaml file path.
+        epochs (int): The number of training epochs.
+        batch_size (int): The training batch size.
+        device (str): The device, i.e. cpu or 0.
+        workers (int): The number of dataloader workers.
+        project (str): The folder to save training runs to.
+
+    Returns:
+        tuple: The configuration, the best weights path and the training time (in seconds).
+    """
+    from yolov5 import train
+
+    start_time = time.time()
+    opt = train.run(weights=config['weights'],
+                    data=data,
+                    epochs=epochs,
+                    batch_size=batch_size,
+                    imgsz=config['imgsz'],
+                    freeze=[config['freeze']],
+                    device=device,
+                    workers=workers,
+                    project=project,
+                    name=config['name'],
+                    exist_ok=True,
+                    noplots=True)
+
+    return config, os.path.join(opt.save_dir, 'weights', 'best.pt'), time.time() - start_time
+
+def run(weights=('yolov5n.pt', 'yolov5s.pt'),
+        imgsz=(320, 416, 640),
+        freeze=(0, 10),
+        data='dataset.yaml',
+        split='test',
+        epochs=100,
+        batch_size=16,
+        device='cpu',
+        processes=2,
+        threads=None,
+        train_workers=2,
+        metric='map50',
+        project='runs/sweep',
+    ):
+    """
+    Trains every combination of model size, image size and frozen layers in parallel worker
+    processes, evaluates each on a held-out split, and reports the speed/accuracy Pareto front.
+
+    Args:
+        weights (tuple): The initial weights (model sizes) to sweep.
+        imgsz (tuple): The train & inference image sizes (pixels) to sweep.
+        freeze (tuple): The number of frozen layers to sweep, i.e. 10 freezes the backbone.
+        data (str): The dataset yaml file path.
+        split (str): The held-out dataset split to evaluate on, not val since training picks best.pt on it.
+        epochs (int): The number of training epochs.
+        batch_size (int): The training batch size.
+        device (str): The device, i.e. cpu or 0.
+        processes (int): The number of parallel training processes.
+        threads (int, optional): The CPU threads per training process. Defaults to the CPU count
+        divided by `processes`.
+        train_workers (int): The dataloader workers per training process.
+        metric (str): The accuracy metric of the Pareto front, i.e. map50 or map.
+        project (str): The folder to save training runs & results to.
+
+    Returns:
+        list: The Pareto-optimal results.
+    """
+    import evaluate
+    from utils.dataset import split_images
+
+    assert split_images(data, split), f"No images found in '{split}' split of {data}, run split.py"
+    threads = threads or max(1, (os.cpu_count() or 1) // processes)
+    configs = [dict(weights=w, imgsz=s, freeze=f, name=f'{os.path.splitext(os.path.basename(w))[0]}-{s}-f{f}')
+               for w, s, f in itertools.product(weights, imgsz, freeze)]
+    print(f'Sweeping {len(configs)} configurations on {processes} processes x {threads} threads')
+
+    # build label caches once, rather than every worker racing to write them
+    build_label_caches(data)
+
+    start_time = time.time()
+    trained = []
+
+    # train in parallel, spawn is required for torch in worker processes
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=ctx, initializer=init_worker,
+                             initargs=(threads,)) as executor:
+        futures = {executor.submit(train_config, config, data, epochs, batch_size, device, train_workers,
+                                   project): config for config in configs}
+        for future in as_completed(futures):
+            config = futures[future]
+            try:
+                trained.append(future.result())
+                print(f"Trained {config['name']}")
+            except Exception as e:
+                print(f"Failed to train {config['name']}: {e}")
+
+    # evaluate one at a time so that latency is measured on an otherwise idle CPU
+    results = []
+    for config, best, train_sec in sorted(trained, key=lambda x: x[0]['name']):
+        report = evaluate.run(weights=best, data=data, split=split, imgsz=config['imgsz'], device=device,
+                              verbose=False)
+        results.append(dict(name=config['name'], weights=config['weights'], imgsz=config['imgsz'],
+                            freeze=config['freeze'], precision=report['precision'], recall=report['recall'],
+                            map50=report['map50'], map=report['map'],
+                            latency_ms=report['latency_ms']['p50'], train_sec=train_sec, best=best))
+
+    front = pareto_front(results, metric)
+    print_results(results, front)
+    elapsed_time(time.time() - start_time)
+
+    # save results
+    os.makedirs(project, exist_ok=True)
+    results_path = os.path.join(project, 'results.csv')
+    if results:
+        with open(results_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=[*results[0].keys(), 'pareto'])
+            writer.writeheader()
+            for result in results:
+                writer.writerow({**result, 'pareto': result in front})
+        print(f'Results saved to {results_path}')
+
+    return front
+
+def print_results(results, front):
+    """
+    Prints the sweep results as a table, Pareto-optimal results are marked with `*`.
+
+    Args:
+        results (list): The sweep results.
+        front (list): The Pareto-optimal results.
+    """
+    print(f"{'':>2}{'name':<24}{'P':>8}{'R':>8}{'mAP50':>8}{'mAP50-95':>10}{'latency':>10}")
+    for r in sorted(results, key=lambda r: r['latency_ms']):
+        print(f"{'*' if r in front else '':>2}{r['name']:<24}{r['precision']:>8.3f}{r['recall']:>8.3f}" +
+              f"{r['map50']:>8.3f}{r['map']:>10.3f}{r['latency_ms']:>8.1f}ms")
+
+def parse_opt():
+    """
+    Parse command line arguments for hyperparameter & resolution sweep tool.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='Hyperparameter & resolution sweep tool')
+    parser.add_argument('--weights', nargs='+', type=str, default=['yolov5n.pt', 'yolov5s.pt'], help='initial weights (model sizes) to sweep')
+    parser.add_argument('--imgsz', '--img', '--img-size', nargs='+', type=int, default=[320, 416, 640], help='image sizes (pixels) to sweep')
+    parser.add_argument('--freeze', nargs='+', type=int, default=[0, 10], help='number of frozen layers to sweep, backbone=10')
+    parser.add_argument('--data', type=str, default='dataset.yaml', help='dataset.yaml path')
+    parser.add_argument('--split', type=str, default='test', help='held-out dataset split to evaluate on, training picks best.pt on val')
+    parser.add_argument('--epochs', type=int, default=100, help='total training epochs')
+    parser.add_argument('--batch-size', type=int, default=16, help='training batch size')
+    parser.add_argument('--device', default='cpu', help='cuda device, i.e. 0 or 0,1,2,3 or cpu')
+    parser.add_argument('--processes', type=int, default=2, help='parallel training processes')
+    parser.add_argument('--threads', type=int, default=None, help='CPU threads per training process')
+    parser.add_argument('--train-workers', type=int, default=2, help='dataloader workers per training process')
+    parser.add_argument('--metric', type=str, choices=['map50', 'map'], default='map50', help='accuracy metric of Pareto front')
+    parser.add_argument('--project', default='runs/sweep', help='save to project/name')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
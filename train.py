@@ -1,8 +1,14 @@
 import os
 import time
 import argparse
+import platform
+import yaml
+from pathlib import Path
 from PIL import Image
+from utils.telemetry import TrainTelemetry
 from yolov5 import train
+from yolov5.utils.callbacks import Callbacks
+from yolov5.utils.general import check_file, get_latest_run
 
 def elapsed_time(elapsed_sec):
   hours = int(elapsed_sec // 3600)
@@ -12,39 +18,64 @@ def elapsed_time(elapsed_sec):
   # Display the execution time
   print(f"Execution time: {hours}hr {minutes}min {seconds}sec")
 
-def find_latest_exp(path):
-  exp_folders = [folder for folder in os.listdir(path) if folder.startswith('exp')]
-
-  if exp_folders:
-      latest_exp = max(exp_folders, key=lambda x: 0 if x=='exp' else int(x[3:]))
-      print("Latest experiment number:", latest_exp)
+def delete_label_cache():
+  # delete label caches (labels.cache for image folders, train.cache & val.cache for split lists)
+  for label_cache_path in ('dataset/labels.cache', 'dataset/train.cache', 'dataset/val.cache'):
+    if os.path.isfile(label_cache_path):
+      os.remove(label_cache_path)
+
+def is_headless():
+  # no display to open a viewer on, i.e. ssh session on a linux server
+  return platform.system() == 'Linux' and not os.environ.get('DISPLAY') and not os.environ.get('WAYLAND_DISPLAY')
+
+def resumed_opt(opt):
+  # the options of the run --resume continues, resolved the way yolov5 train.main does, which replaces opt when resuming
+  last = Path(check_file(opt.resume) if isinstance(opt.resume, str) else get_latest_run())
+  opt_yaml = last.parent.parent / 'opt.yaml'
+  if opt_yaml.is_file():
+    with open(opt_yaml, errors='ignore') as f:
+      d = yaml.safe_load(f)
   else:
-      print("No 'exp' folders found.")
-      latest_exp = 'exp'
-
-  return latest_exp
+    import torch
+    d = torch.load(last, map_location='cpu')['opt']
+  return argparse.Namespace(**d)
 
 def run(opt):
+    headless = opt.headless or is_headless()
+    telemetry = not opt.no_telemetry
+    del opt.headless
+    del opt.no_telemetry
 
     # delete label cache
-    label_cache_path = 'dataset/labels.cache'
-    if os.path.isfile(label_cache_path):
-        os.remove(label_cache_path)
+    delete_label_cache()
 
     # measure execution time
     start_time = time.time()
 
+    # yolov5 training options, with telemetry hooks on training callbacks
+    train_opt = train.parse_opt(True)
+    for k, v in vars(opt).items():
+        setattr(train_opt, k, v)
+    # training options actually used, yolov5 swaps in the options of the resumed run
+    run_opt = resumed_opt(train_opt) if train_opt.resume and not train_opt.evolve else train_opt
+    callbacks = Callbacks()
+    if telemetry:
+        TrainTelemetry(run_opt).register(callbacks)
+
     # start training
-    train.run(**vars(opt))
+    train.main(train_opt, callbacks)
 
     elapsed_time(time.time() - start_time)
 
-    # get latest experiment
-    train_path = 'runs/train'
-    latest_exp = find_latest_exp(train_path)
+    if telemetry:
+        print(f"Telemetry saved to {os.path.join(run_opt.save_dir, 'telemetry.jsonl')}")
 
     # Visualize training result
-    image_path = f'{train_path}/{latest_exp}/results.png'
+    image_path = os.path.join(run_opt.save_dir, 'results.png')
+    if headless or not os.path.isfile(image_path):
+        print(f"Training results saved to {image_path}")
+        return
+
     image = Image.open(image_path)
 
     # Display the image
@@ -83,6 +114,8 @@ def parse_opt():
     parser.add_argument('--freeze', nargs='+', type=int, default=[0], help='Freeze layers: backbone=10, first3=0 1 2')
     parser.add_argument('--save-period', type=int, default=-1, help='Save checkpoint every x epochs (disabled if < 1)')
     parser.add_argument('--seed', type=int, default=0, help='Global training seed')
+    parser.add_argument('--headless', action='store_true', help='never open a viewer for training results')
+    parser.add_argument('--no-telemetry', action='store_true', help='do not write per-epoch telemetry.jsonl')
     parser.add_argument('--local_rank', type=int, default=-1, help='Automatic DDP Multi-GPU argument, do not modify')
     opt = parser.parse_args()
     return opt
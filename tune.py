@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import queue
+import argparse
+import threading
+import multiprocessing as mp
+from datetime import datetime
+
+from utils.dataset import list_images
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov')
+
+def list_videos(folder):
+    """
+    Lists the video files in a folder, sorted by name.
+    """
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(VIDEO_EXTENSIONS))
+
+def benchmark_worker(profile, opt, results):
+    """
+    Benchmarks the live pipeline with a CPU profile, in its own process since torch sets its inter-op
+    threads only once. A capture thread decodes the videos of the source folder at their frame rate,
+    like a camera, while the main thread letterboxes, infers & annotates the latest frame.
+
+    Args:
+        profile (dict): The CPU profile to apply.
+        opt (dict): The benchmark options.
+        results (multiprocessing.Queue): The queue the result dict is put on.
+    """
+    from utils.cpu import apply_cpu_profile
+    apply_cpu_profile(profile)
+
+    import cv2
+    import numpy as np
+    import torch
+    from live import load_model
+    from yolov5.utils.augmentations import letterbox
+    from yolov5.utils.general import non_max_suppression, scale_boxes
+    from yolov5.utils.plots import Annotator, colors
+
+    torch.set_grad_enabled(False)
+    model, imgsz = load_model(opt['weights'], opt['device'], False, opt['data'], False, [opt['imgsz'], opt['imgsz']])
+    model.warmup(imgsz=(1, 3, *imgsz))
+
+    videos = list_videos(opt['source'])
+    images = [im for im in (cv2.imread(f) for f in list_images(opt['source'])) if im is not None]
+    latest = dict(frame=images[0] if images else None, decoded=0)
+    stop = threading.Event()
+
+    def capture():
+        while not stop.is_set():
+            decoded = latest['decoded']
+            for video in videos:
+                cap = cv2.VideoCapture(video)
+                interval = 1 / (cap.get(cv2.CAP_PROP_FPS) or 30)
+                next_frame = time.perf_counter()
+                while not stop.is_set():
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    latest['frame'] = frame
+                    latest['decoded'] += 1
+                    next_frame += interval
+                    time.sleep(max(0.0, next_frame - time.perf_counter()))
+                cap.release()
+            if latest['decoded'] == decoded:
+                return  # none of the videos could be read
+
+    thread = threading.Thread(target=capture, daemon=True)
+    if videos:
+        thread.start()
+    while latest['frame'] is None:
+        if not thread.is_alive():
+            raise RuntimeError(f"No readable videos or images in {opt['source']}")
+        time.sleep(0.01)
+
+    latencies = []
+    start = decoded = None
+    for n in range(opt['warmup'] + opt['frames']):
+        if n == opt['warmup']:
+            start, decoded = time.perf_counter(), latest['decoded']
+        t = time.perf_counter()
+        im0 = latest['frame'] if videos else images[n % len(images)]
+        im = letterbox(im0, imgsz, stride=model.stride, auto=model.pt)[0]
+        im = torch.from_numpy(np.ascontiguousarray(im.transpose((2, 0, 1))[::-1])[None]).to(model.device).float() / 255
+        pred = non_max_suppression(model(im), opt['conf_thres'], opt['iou_thres'])
+        annotator = Annotator(im0.copy(), line_width=2, example=str(model.names))
+        for det in pred:
+            det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
+            for *xyxy, conf, cls in reversed(det):
+                annotator.box_label(xyxy, f'{model.names[int(cls)]} {conf:.2f}', color=colors(int(cls), True))
+        latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    stop.set()
+
+    latencies = latencies[opt['warmup']:]
+    results.put(dict(fps=round(opt['frames'] / elapsed, 2),
+                     p50_ms=round(float(np.percentile(latencies, 50)) * 1E3, 1),
+                     p95_ms=round(float(np.percentile(latencies, 95)) * 1E3, 1),
+                     capture_fps=round((latest['decoded'] - decoded) / elapsed, 1) if videos else None))
+
+def save_profile(cfg, profile):
+    """
+    Saves a CPU profile to the `cpu` key of the configuration file, keeping the other keys.
+    """
+    config = {}
+    if os.path.isfile(cfg):
+        with open(cfg) as f:
+            config = json.load(f)
+    config['cpu'] = profile
+    with open(f'{cfg}.tmp', 'w') as f:
+        json.dump(config, f, indent=4)
+    os.replace(f'{cfg}.tmp', cfg)
+
+def run(weights='best.pt',
+        source='dataset/tests',
+        data='dataset.yaml',
+        imgsz=640,
+        device='cpu',
+        conf_thres=0.25,
+        iou_thres=0.45,
+        frames=30,
+        warmup=5,
+        pin=False,
+        timeout=600,
+        cfg='config.json',
+        nosave=False,
+    ):
+    """
+    Benchmarks the CPU profiles worth trying on this machine, and saves the fastest to the configuration
+    file for live.py to apply at startup. A profile only counts when capture keeps up with the video.
+
+    Args:
+        weights (str): The model path.
+        source (str): The folder of test videos & images.
+        data (str): The dataset.yaml path.
+        imgsz (int): The inference size (pixels).
+        device (str): The device, i.e. cpu or 0.
+        conf_thres (float): The confidence threshold.
+        iou_thres (float): The NMS IoU threshold.
+        frames (int): The number of frames benchmarked per profile.
+        warmup (int): The number of frames run before measuring.
+        pin (bool): Also try pinning the process to the cores of the inference threads plus one for capture.
+        timeout (int): The maximum time (in seconds) of a profile.
+        cfg (str): The configuration file the fastest profile is saved to.
+        nosave (bool): Only print the results.
+
+    Returns:
+        list: The profiles with their results, fastest first.
+    """
+    from utils.cpu import candidate_profiles, cpu_count, describe_profile
+
+    # fail fast, otherwise every profile waits out the timeout for a first frame
+    assert os.path.isdir(source) and (list_videos(source) or list_images(source)), \
+        f'No videos ({", ".join(VIDEO_EXTENSIONS)}) or images found in {source}'
+    opt = dict(weights=weights, source=source, data=data, imgsz=imgsz, device=device, conf_thres=conf_thres,
+               iou_thres=iou_thres, frames=frames, warmup=warmup)
+    profiles = candidate_profiles(pin=pin)
+    print(f'Benchmarking {len(profiles)} CPU profiles on {cpu_count()} cores, {frames} frames each')
+
+    ctx = mp.get_context('spawn')
+    tuned = []
+    for i, profile in enumerate(profiles):
+        results = ctx.Queue()
+        p = ctx.Process(target=benchmark_worker, args=(profile, opt, results), daemon=True)
+        p.start()
+        try:
+            result = results.get(timeout=timeout)
+        except queue.Empty:
+            result = None
+        p.join(5)
+        if p.is_alive():
+            p.terminate()
+        if result is None:
+            print(f'{i + 1:>3}/{len(profiles)} {describe_profile(profile)}: failed')
+            continue
+        print(f"{i + 1:>3}/{len(profiles)} {describe_profile(profile)}: {result['fps']} fps, "
+              f"p50 {result['p50_ms']}ms p95 {result['p95_ms']}ms" +
+              (f", capture {result['capture_fps']} fps" if result['capture_fps'] is not None else ''))
+        tuned.append((profile, result))
+    if not tuned:
+        raise RuntimeError('All CPU profiles failed')
+
+    # capture falling behind drops frames, those profiles rank last
+    best_capture = max(r['capture_fps'] or 0 for _, r in tuned)
+    keeps_up = lambda r: r['capture_fps'] is None or r['capture_fps'] >= 0.95 * best_capture
+    tuned.sort(key=lambda x: (not keeps_up(x[1]), -x[1]['fps'], x[1]['p95_ms']))
+
+    profile, result = tuned[0]
+    default = next((r for p, r in tuned if p['torch_threads'] is None), None)
+    print(f"Fastest: {describe_profile(profile)}, {result['fps']} fps" +
+          (f" ({result['fps'] / default['fps']:.2f}x the defaults)" if default else ''))
+    if not nosave:
+        save_profile(cfg, dict(profile, fps=result['fps'], cores=cpu_count(), tuned=datetime.now().isoformat(timespec='seconds')))
+        print(f'Saved to {cfg}, applied by live.py at startup')
+    return [dict(profile, **r) for profile, r in tuned]
+
+def parse_opt():
+    """
+    Parse command line arguments for CPU tuning.
+
+    Returns:
+        opt (argparse.Namespace): Parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description='CPU thread & affinity tuner')
+    parser.add_argument('--weights', type=str, default='best.pt', help='model path')
+    parser.add_argument('--source', type=str, default='dataset/tests', help='folder of test videos & images')
+    parser.add_argument('--data', type=str, default='dataset.yaml', help='dataset.yaml path')
+    parser.add_argument('--imgsz', type=int, default=640, help='inference size (pixels)')
+    parser.add_argument('--device', default='cpu', help='cuda device, i.e. 0 or cpu')
+    parser.add_argument('--conf-thres', type=float, default=0.25, help='confidence threshold')
+    parser.add_argument('--iou-thres', type=float, default=0.45, help='NMS IoU threshold')
+    parser.add_argument('--frames', type=int, default=30, help='frames benchmarked per profile')
+    parser.add_argument('--warmup', type=int, default=5, help='frames run before measuring')
+    parser.add_argument('--pin', action='store_true', help='also try pinning to the cores of the inference threads plus one')
+    parser.add_argument('--timeout', type=int, default=600, help='maximum time (in seconds) of a profile')
+    parser.add_argument('--cfg', type=str, default='config.json', help='configuration file the fastest profile is saved to')
+    parser.add_argument('--nosave', action='store_true', help='only print the results')
+    opt = parser.parse_args()
+    return opt
+
+def main(opt):
+    run(**vars(opt))
+
+if __name__ == '__main__':
+    opt = parse_opt()
+    main(opt)
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from utils.alertimage import AlertImage
+
+class TokenBucket:
+    """
+    TokenBucket class limits the rate of an alert channel, allowing bursts of up to `capacity`.
+    """
+
+    def __init__(self, per_hour, capacity, clock=time.time):
+        self.rate = per_hour / 3600
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._clock = clock
+        self._last = clock()
+
+    def take(self):
+        """
+        Takes a token if one is available.
+
+        Returns:
+            True if a token was taken, False if rate limited.
+        """
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self._last) * self.rate)
+        self._last = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class AudioPlayer:
+    """
+    AudioPlayer class plays one sound at a time, a sound requested while another one plays is dropped.
+    """
+
+    def __init__(self, logger=None):
+        self.log = logger or logging.getLogger()
+        self._lock = threading.Lock()
+        self._playing = False
+
+    def play(self, sound):
+        """
+        Plays a sound file on a background thread.
+
+        Returns:
+            True if the sound is played, False if another one is still playing.
+        """
+        with self._lock:
+            if self._playing:
+                return False
+            self._playing = True
+        threading.Thread(target=self._play, args=(sound,), daemon=True).start()
+        return True
+
+    def _play(self, sound):
+        try:
+            from utils.sound import play_audio_file  # deferred, only needed when alerting
+
+            self.log.info(f"Playing alert '{sound}'")
+            play_audio_file(sound)
+        except Exception as e:
+            self.log.error(e, exc_info=True)
+        finally:
+            with self._lock:
+                self._playing = False
+
+def box_iou(a, b):
+    """
+    Gets the largest IoU between any box of `a` and any box of `b`, boxes are normalized x1, y1, x2, y2.
+    """
+    best = 0.0
+    for ax1, ay1, ax2, ay2 in a:
+        for bx1, by1, bx2, by2 in b:
+            w = min(ax2, bx2) - max(ax1, bx1)
+            h = min(ay2, by2) - max(ay1, by1)
+            if w <= 0 or h <= 0:
+                continue
+            inter = w * h
+            best = max(best, inter / ((ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - inter))
+    return best
+
+class AlertManager:
+    """
+    AlertManager class responsible for deciding which poop confirmations raise an alert, and for
+    playing the alert sound and sending notifications. Confirmations within the snooze period of a
+    stream's previous confirmation, or overlapping an alert of another stream in time (and space),
+    don't alert again. Each channel is rate limited by a token bucket, and the snooze and rate limit
+    state is persisted so restarts don't alert again.
+    """
+
+    def __init__(self,
+                 notifier=None,
+                 sound=None,
+                 no_alert=False,
+                 no_notify=False,
+                 snooze_sec=60,
+                 dedupe_sec=30,
+                 dedupe_iou=0.0,
+                 sound_per_hour=30,
+                 push_per_hour=20,
+                 burst=3,
+                 state=None,
+                 alert_image=None,
+                 logger=None,
+                 clock=time.time,
+        ):
+        """
+        Initializes an AlertManager object.
+
+        Args:
+            notifier: An object implementing the INotification interface for sending notifications.
+            sound: The sound file to be played when poop is confirmed.
+            no_alert: A boolean indicating whether to disable the alert sound.
+            no_notify: A boolean indicating whether to disable the notification.
+            snooze_sec: The alert snooze period (in seconds) since the previous confirmation of a stream.
+            dedupe_sec: Confirmations of other streams within this many seconds of an alert are duplicates.
+            dedupe_iou: The IoU (of normalized boxes) above which detections of different streams overlap,
+            0 dedupes on time only.
+            sound_per_hour: The alert sound rate limit.
+            push_per_hour: The notification rate limit.
+            burst: The number of alerts a channel allows in a burst.
+            state: The JSON file the snooze and rate limit state is persisted to, None keeps it in memory.
+            alert_image: The AlertImage cropping, downscaling & encoding notification images.
+            logger: The logger object for logging messages.
+            clock: The function returning the current time (in seconds).
+        """
+        self.notifier = notifier
+        self.sound = sound
+        self.no_alert = no_alert
+        self.no_notify = no_notify
+        self.snooze_sec = snooze_sec
+        self.dedupe_sec = dedupe_sec
+        self.dedupe_iou = dedupe_iou
+        self.state = state
+        self.alert_image = alert_image or AlertImage()
+        self.log = logger or logging.getLogger()
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        self._last_confirmed = {}  # stream to time of its last confirmation
+        self._recent = deque()  # (time, stream, boxes) of recent alerts
+        self._buckets = dict(sound=TokenBucket(sound_per_hour, burst, clock), push=TokenBucket(push_per_hour, burst, clock))
+        self._player = AudioPlayer(self.log)
+        self._load_state()
+
+    def alert(self, stream=0, boxes=None, image=None, label=None):
+        """
+        Handles a poop confirmation, raising an alert unless snoozed or a duplicate.
+
+        Args:
+            stream: The stream (camera) the poop was confirmed on.
+            boxes: The normalized (x1, y1, x2, y2) boxes of the detections, for cross-stream dedupe.
+            image: The image to attach to the notification, a BGR numpy.ndarray or bytes encoded by `alert_image`.
+            label: The stream name appended to the notification text.
+
+        Returns:
+            True if an alert was raised, False if snoozed or a duplicate.
+        """
+        with self._lock:
+            now = self._clock()
+
+            # snooze while the stream keeps confirming, the period restarts with every confirmation
+            last = self._last_confirmed.get(str(stream))
+            self._last_confirmed[str(stream)] = now
+            if last is not None and now - last < self.snooze_sec:
+                self._save_state()
+                return False
+
+            while self._recent and now - self._recent[0][0] > self.dedupe_sec:
+                self._recent.popleft()
+            for t, s, b in self._recent:
+                if s != stream and (not self.dedupe_iou or not boxes or not b or box_iou(boxes, b) > self.dedupe_iou):
+                    self.log.info(f'Poop on stream {stream} is a duplicate of stream {s}')
+                    self._save_state()
+                    return False
+            self._recent.append((now, stream, boxes))
+
+            sound = not self.no_alert and self.sound and self._take('sound')
+            push = not self.no_notify and self.notifier is not None and self._take('push')
+            self._save_state()
+
+        if sound:
+            self._player.play(self.sound)
+        if push:
+            if image is not None and not isinstance(image, bytes):
+                image = self.alert_image.crop(image, boxes)  # copy the region only, the caller reuses the frame
+            threading.Thread(target=self._push, args=(image, label), daemon=True).start()
+        return True
+
+    def _take(self, channel):
+        if self._buckets[channel].take():
+            return True
+        self.log.warning(f'Alert {channel} rate limited')
+        return False
+
+    def _push(self, image, label):
+        now = datetime.now()
+        msg = f'{now.strftime("%I:%M:%S %p")} - Dog pooped!' + (f' ({label})' if label else '')
+        try:
+            if image is None:
+                self.log.info("Pushing text")
+                self.notifier.text(msg)
+            else:
+                if not isinstance(image, bytes):
+                    image = self.alert_image.encode(image)
+                self.log.info(f"Pushing text & image ({len(image) / 1E3:.0f} KB)")
+                self.notifier.file_bytes(image, f'poop-{now.strftime("%Y%m%d-%H%M%S")}.{self.alert_image.fmt}', msg)
+        except Exception as e:
+            self.log.error(e, exc_info=True)
+
+    def _load_state(self):
+        if not self.state or not os.path.isfile(self.state):
+            return
+        try:
+            with open(self.state) as f:
+                state = json.load(f)
+            self._last_confirmed = state.get('last_confirmed', {})
+            for channel, (tokens, last) in state.get('buckets', {}).items():
+                if channel in self._buckets:
+                    self._buckets[channel].tokens, self._buckets[channel]._last = tokens, last
+        except (ValueError, TypeError) as e:
+            self.log.warning(f'Ignoring invalid alert state {self.state}: {e}')
+
+    def _save_state(self):
+        if not self.state:
+            return
+        state = dict(last_confirmed=self._last_confirmed,
+                     buckets={channel: [b.tokens, b._last] for channel, b in self._buckets.items()})
+        os.makedirs(os.path.dirname(self.state) or '.', exist_ok=True)
+        with open(f'{self.state}.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(f'{self.state}.tmp', self.state)
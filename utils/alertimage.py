@@ -0,0 +1,70 @@
+class AlertImage:
+    """
+    AlertImage class responsible for turning a detection frame into a small notification image:
+    cropped to the detections plus some context, downscaled and encoded in memory.
+    """
+
+    def __init__(self, max_size=1280, fmt='jpg', quality=80, context=1.0):
+        """
+        Initializes an AlertImage object.
+
+        Args:
+            max_size: The maximum width & height (in pixels) of the image.
+            fmt: The encoding format, jpg or webp.
+            quality: The encoding quality (1 - 100).
+            context: The context kept around the detections, as a fraction of their size on each side,
+            None keeps the whole frame.
+        """
+        assert fmt in ('jpg', 'webp'), f'unsupported alert image format {fmt}'
+        self.max_size = max_size
+        self.fmt = fmt
+        self.quality = quality
+        self.context = context
+
+    def crop(self, im0, boxes=None):
+        """
+        Copies the region of the detections plus context, cheap enough for the detection thread
+        since only the region is copied.
+
+        Args:
+            im0 (numpy.ndarray): The BGR image.
+            boxes (list): The normalized (x1, y1, x2, y2) boxes of the detections.
+
+        Returns:
+            numpy.ndarray: The cropped copy.
+        """
+        if self.context is None or not boxes:
+            return im0.copy()
+
+        h, w = im0.shape[:2]
+        x1, y1 = min(b[0] for b in boxes), min(b[1] for b in boxes)
+        x2, y2 = max(b[2] for b in boxes), max(b[3] for b in boxes)
+        # at least a quarter of the frame, a tiny crop of a single poop tells nothing about where it is
+        mx = max((x2 - x1) * self.context, (0.25 - (x2 - x1)) / 2, 0)
+        my = max((y2 - y1) * self.context, (0.25 - (y2 - y1)) / 2, 0)
+        x1, x2 = int(max(0, x1 - mx) * w), int(min(1, x2 + mx) * w)
+        y1, y2 = int(max(0, y1 - my) * h), int(min(1, y2 + my) * h)
+        return im0[y1:max(y2, y1 + 1), x1:max(x2, x1 + 1)].copy()
+
+    def encode(self, im):
+        """
+        Downscales and encodes an image.
+
+        Args:
+            im (numpy.ndarray): The BGR image.
+
+        Returns:
+            bytes: The encoded image.
+        """
+        import cv2  # deferred, importing the detector must not load OpenCV
+        h, w = im.shape[:2]
+        r = self.max_size / max(h, w)
+        if r < 1:
+            im = cv2.resize(im, (round(w * r), round(h * r)), interpolation=cv2.INTER_AREA)
+
+        params = [cv2.IMWRITE_WEBP_QUALITY, self.quality] if self.fmt == 'webp' else \
+            [cv2.IMWRITE_JPEG_QUALITY, self.quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+        ok, buf = cv2.imencode(f'.{self.fmt}', im, params)
+        if not ok:
+            raise ValueError(f'Failed to encode alert image as {self.fmt}')
+        return buf.tobytes()
@@ -0,0 +1,113 @@
+import torch.nn.functional as F
+
+from yolov5.utils.general import make_divisible
+
+class ResolutionCascade:
+    """
+    ResolutionCascade class runs every frame at a low resolution first, and escalates only the frames
+    with a dog, or a poop candidate the low resolution pass isn't confident about, to the full resolution.
+    The low resolution frame is downscaled from the letterboxed frame, so its boxes map back to the full
+    resolution by a plain scale.
+    """
+
+    def __init__(self, low_imgsz=320, candidate_conf=0.1, escalate_conf=0.5, escalate_classes=('dog',),
+                 candidate_classes=('poop', 'cotton')):
+        """
+        Initializes a ResolutionCascade object.
+
+        Args:
+            low_imgsz: The inference size (pixels) of the low resolution pass.
+            candidate_conf: The confidence threshold of candidates in the low resolution pass.
+            escalate_conf: Candidates below this confidence escalate the frame.
+            escalate_classes: The classes that always escalate the frame.
+            candidate_classes: The classes that escalate the frame below `escalate_conf`.
+        """
+        self.low_imgsz = low_imgsz
+        self.candidate_conf = candidate_conf
+        self.escalate_conf = escalate_conf
+        self.escalate_classes = set(escalate_classes)
+        self.candidate_classes = set(candidate_classes)
+        self.frames = 0
+        self.escalated = 0
+        self.low_sec = 0.0
+        self.high_sec = 0.0
+
+    def downscale(self, im, stride=32):
+        """
+        Downscales a batch of letterboxed frames for the low resolution pass.
+
+        Args:
+            im (torch.Tensor): The BCHW batch.
+            stride: The model stride.
+
+        Returns:
+            tuple: The downscaled batch and the (height, width) gain back to `im`.
+        """
+        h, w = im.shape[2:]
+        r = min(1.0, self.low_imgsz / max(h, w))
+        size = (make_divisible(h * r, stride), make_divisible(w * r, stride))
+        return F.interpolate(im, size=size, mode='area'), (h / size[0], w / size[1])
+
+    @staticmethod
+    def upscale(det, gain):
+        """
+        Scales the boxes of low resolution detections back to the full resolution, in place.
+        """
+        det[:, [0, 2]] *= gain[1]
+        det[:, [1, 3]] *= gain[0]
+        return det
+
+    def escalate(self, det, names):
+        """
+        Checks whether the low resolution detections of a frame need the full resolution pass.
+
+        Args:
+            det (torch.Tensor): The detections (x1, y1, x2, y2, conf, cls) of the frame.
+            names: The class names of the model.
+
+        Returns:
+            True if the frame has a dog or a poop candidate below `escalate_conf`.
+        """
+        for *_, conf, cls in det.tolist():
+            name = names[int(cls)]
+            if name in self.escalate_classes or (name in self.candidate_classes and conf < self.escalate_conf):
+                return True
+        return False
+
+    def update(self, frames, escalated, low_sec, high_sec):
+        """
+        Counts a batch.
+
+        Args:
+            frames: The number of frames of the batch.
+            escalated: The number of escalated frames.
+            low_sec: The time (in seconds) of the low resolution pass.
+            high_sec: The time (in seconds) of the full resolution pass.
+        """
+        self.frames += frames
+        self.escalated += escalated
+        self.low_sec += low_sec
+        self.high_sec += high_sec
+
+    def stats(self):
+        """
+        Gets the cascade statistics.
+
+        Returns:
+            dict: The frames, escalated frames, escalation rate, the average latency (ms) per frame, of
+            the low resolution pass per frame and of the full resolution pass per escalated frame.
+        """
+        return dict(frames=self.frames,
+                    escalated=self.escalated,
+                    escalation_rate=round(self.escalated / self.frames, 3) if self.frames else 0.0,
+                    latency_ms=round((self.low_sec + self.high_sec) / self.frames * 1E3, 1) if self.frames else 0.0,
+                    low_ms=round(self.low_sec / self.frames * 1E3, 1) if self.frames else 0.0,
+                    high_ms=round(self.high_sec / self.escalated * 1E3, 1) if self.escalated else 0.0)
+
+    def report(self):
+        """
+        Gets the cascade statistics as text.
+        """
+        s = self.stats()
+        return (f"{s['escalation_rate']:.1%} of {s['frames']} frames escalated, {s['latency_ms']}ms per frame "
+                f"(low resolution {s['low_ms']}ms, full resolution {s['high_ms']}ms per escalated frame)")
@@ -0,0 +1,27 @@
+from datetime import datetime
+
+class ManualClock:
+    """
+    ManualClock class is a time source that only moves when told to, for driving PoopDetector
+    from recorded timestamps or at faster than real time.
+    """
+
+    def __init__(self, t=0.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+    def advance(self, seconds):
+        self.t += seconds
+
+def parse_time(value):
+    """
+    Parses an epoch timestamp or a `YYYY-mm-dd HH:MM:SS` local time, None stays None.
+    """
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
@@ -0,0 +1,84 @@
+import os
+import logging
+import cv2
+import torch
+
+def cpu_count():
+    """
+    Gets the number of cores this process may run on.
+    """
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+
+def candidate_profiles(pin=False):
+    """
+    Gets the CPU profiles worth benchmarking on the cores this process may run on, starting with the defaults.
+
+    Args:
+        pin (bool): Also try pinning the process to the cores of the inference threads plus one for capture.
+
+    Returns:
+        list: The profiles, a dict of torch_threads, interop_threads, cv2_threads and affinity each,
+        None leaves a setting at its default.
+    """
+    cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    cpus = len(cores)
+    profiles = [dict(torch_threads=None, interop_threads=None, cv2_threads=None, affinity=None)]
+    for threads in sorted({1, 2, cpus // 2, cpus - 1, cpus} & set(range(1, cpus + 1))):
+        for interop in sorted({1, 2} & set(range(1, cpus + 1))):
+            # OpenCV sequential (0), or on the cores left over by inference
+            for cv2_threads in sorted({0, max(1, cpus - threads)}):
+                profiles.append(dict(torch_threads=threads, interop_threads=interop, cv2_threads=cv2_threads, affinity=None))
+                if pin and threads + 1 < cpus:
+                    profiles.append(dict(torch_threads=threads, interop_threads=interop, cv2_threads=cv2_threads,
+                                         affinity=cores[:threads + 1]))
+    return profiles
+
+def describe_profile(profile):
+    """
+    Gets a CPU profile as text.
+    """
+    s = ', '.join(f"{k.replace('_', ' ')} {'default' if profile.get(k) is None else profile[k]}"
+                  for k in ('torch_threads', 'interop_threads', 'cv2_threads'))
+    affinity = profile.get('affinity')
+    return s + (f", pinned to cores {','.join(map(str, affinity))}" if affinity else '')
+
+def apply_cpu_profile(profile, logger=None):
+    """
+    Applies a CPU profile (see tune.py) to this process. Apply it before loading the model, torch
+    only sets its inter-op threads before its first inter-op parallel work.
+
+    Args:
+        profile (dict): The torch_threads, interop_threads, cv2_threads and affinity to apply,
+        None (or a missing key) leaves a setting at its default. A profile tuned on another number
+        of cores, or pinned to cores this process may not run on, is skipped.
+        logger: The logger object for logging messages.
+    """
+    if not profile:
+        return
+    log = logger or logging.getLogger()
+    affinity = profile.get('affinity')
+    available = os.sched_getaffinity(0) if hasattr(os, 'sched_getaffinity') else set(range(os.cpu_count() or 1))
+    # tuned on other hardware, its thread counts (or cores) don't fit this machine
+    if profile.get('cores') not in (None, cpu_count()):
+        log.warning(f"Skipped the CPU profile tuned on {profile['cores']} cores, this process may run on "
+                    f'{cpu_count()}, run tune.py again')
+        return
+    if affinity and not set(affinity) <= available:
+        log.warning(f"Skipped the CPU profile pinned to cores {','.join(map(str, affinity))}, this process may run on "
+                    f"{','.join(map(str, sorted(available)))}, run tune.py again")
+        return
+    if affinity:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, affinity)
+        else:
+            log.warning('Pinning to cores is not supported on this platform')
+    if profile.get('torch_threads'):
+        torch.set_num_threads(profile['torch_threads'])
+    if profile.get('interop_threads'):
+        try:
+            torch.set_num_interop_threads(profile['interop_threads'])
+        except RuntimeError as e:
+            log.warning(f'Failed to set torch inter-op threads: {e}')
+    if profile.get('cv2_threads') is not None:
+        cv2.setNumThreads(profile['cv2_threads'])
+    log.info(f'Applied CPU profile: {describe_profile(profile)}')
@@ -0,0 +1,140 @@
+import os
+import re
+import yaml
+from datetime import datetime, timezone
+
+IMG_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+def list_images(folder):
+    """
+    Lists the image files in a folder, sorted by name.
+
+    Args:
+        folder (str): The folder to list.
+
+    Returns:
+        list: The image file paths.
+    """
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMG_EXTENSIONS))
+
+def label_path(image_path):
+    """
+    Gets the YOLO label file path of an image, i.e. `images/x.jpg` -> `labels/x.txt`.
+
+    Args:
+        image_path (str): The image file path.
+
+    Returns:
+        str: The label file path.
+    """
+    folder, file = os.path.split(image_path)
+    return os.path.join(os.path.dirname(folder), 'labels', os.path.splitext(file)[0] + '.txt')
+
+def read_labels(path):
+    """
+    Reads a YOLO label file.
+
+    Args:
+        path (str): The label file path.
+
+    Returns:
+        list: The labels as (cls, x, y, w, h) tuples in normalized coordinates, empty if the file
+        doesn't exist.
+    """
+    if not os.path.isfile(path):
+        return []
+    labels = []
+    with open(path) as f:
+        for line in f:
+            values = line.split()
+            if len(values) >= 5:
+                labels.append((int(values[0]), *map(float, values[1:5])))
+    return labels
+
+def source_group(image_path):
+    """
+    Gets the source group of an image from its filename, i.e. the day the frame was captured.
+
+    Frames captured on the same day come from the same footage, so they must stay on the same
+    side of a train/val split to avoid leakage.
+
+    Args:
+        image_path (str): The image file path, i.e. `dog-poop-1686792739590.jpg` or
+        `dog-poop-vlcsnap-2023-06-01-10h30m22s726.png`.
+
+    Returns:
+        str: The source group.
+    """
+    name = os.path.splitext(os.path.basename(image_path))[0]
+
+    # vlc snapshot, i.e. vlcsnap-2023-06-01-10h30m22s726
+    m = re.search(r'(\d{4}-\d{2}-\d{2})', name)
+    if m:
+        return m.group(1)
+
+    # epoch milliseconds, i.e. 1686792739590
+    m = re.search(r'(\d{13})', name)
+    if m:
+        return datetime.fromtimestamp(int(m.group(1)) / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+
+    return name
+
+def load_data(data):
+    """
+    Loads a dataset yaml file, i.e. `dataset.yaml`.
+
+    Args:
+        data (str): The dataset yaml file path.
+
+    Returns:
+        dict: The dataset configuration, with `names` as a list.
+    """
+    with open(data) as f:
+        cfg = yaml.safe_load(f)
+    names = cfg.get('names', [])
+    cfg['names'] = [names[k] for k in sorted(names)] if isinstance(names, dict) else list(names)
+    return cfg
+
+def dataset_dir(data, cfg=None):
+    """
+    Resolves the dataset folder of a dataset yaml file. Falls back to the `dataset` folder next to
+    the yaml file when `path` doesn't exist on this machine (i.e. it points to Google Drive).
+
+    Args:
+        data (str): The dataset yaml file path.
+        cfg (dict, optional): The loaded dataset configuration. Defaults to None.
+
+    Returns:
+        str: The dataset folder.
+    """
+    cfg = cfg or load_data(data)
+    path = cfg.get('path') or ''
+    if path and os.path.isdir(path):
+        return path
+    return os.path.join(os.path.dirname(os.path.abspath(data)), 'dataset')
+
+def split_images(data, split='val'):
+    """
+    Lists the images of a dataset split, i.e. `val: val.txt` or `val: images`.
+
+    Args:
+        data (str): The dataset yaml file path.
+        split (str, optional): The split name. Defaults to 'val'.
+
+    Returns:
+        list: The image file paths.
+    """
+    cfg = load_data(data)
+    root = dataset_dir(data, cfg)
+    entry = os.path.join(root, cfg[split])
+
+    if os.path.isdir(entry):
+        return list_images(entry)
+
+    images = []
+    with open(entry) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                images.append(os.path.normpath(os.path.join(root, line)))
+    return images
@@ -0,0 +1,104 @@
+import os
+import gzip
+import json
+import time
+from datetime import datetime
+
+class DetectionLogWriter:
+    """
+    DetectionLogWriter class responsible for recording timestamped per-frame detections as JSONL,
+    one file per day, so they can be replayed through PoopDetector without the model.
+
+    Each file starts with a header line `{"names": [...]}`, followed by one line per frame
+    `{"t": timestamp, "s": stream, "b": [[x1, y1, x2, y2, conf, cls], ...]}`. Frames without
+    detections are recorded too, since they drive PoopDetector's rolling window.
+    """
+
+    def __init__(self, folder, names, clock=time.time):
+        """
+        Initializes a DetectionLogWriter object.
+
+        Args:
+            folder: The folder to write `detections-YYYYMMDD.jsonl` files to.
+            names: The class names, as a list or a dict of class id to name.
+            clock: The function returning the current time (in seconds).
+        """
+        self.folder = folder
+        self.names = list(names.values()) if isinstance(names, dict) else list(names)
+        self._clock = clock
+        self._file = None
+        self._day = None
+        os.makedirs(folder, exist_ok=True)
+
+    def write(self, stream, det):
+        """
+        Records the detections of a frame.
+
+        Args:
+            stream (int): The stream index of the frame.
+            det: The detections (N x 6 of xyxy, conf, cls) in original image coordinates.
+        """
+        t = self._clock()
+        day = datetime.fromtimestamp(t).strftime('%Y%m%d')
+        if day != self._day:
+            self._open(day)
+
+        boxes = det.tolist() if hasattr(det, 'tolist') else list(det)
+        boxes = [[round(x, 1) for x in b[:4]] + [round(b[4], 3), int(b[5])] for b in boxes]
+        self._file.write(json.dumps(dict(t=round(t, 3), s=stream, b=boxes), separators=(',', ':')) + '\n')
+
+    def close(self):
+        """
+        Closes the current log file.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self, day):
+        self.close()
+        path = os.path.join(self.folder, f'detections-{day}.jsonl')
+        is_new = not os.path.isfile(path)
+        self._file = open(path, 'a', buffering=1)  # line buffered, survives crashes
+        if is_new:
+            self._file.write(json.dumps(dict(names=self.names)) + '\n')
+        self._day = day
+
+def log_files(paths):
+    """
+    Expands detection log files and folders into a sorted list of files.
+
+    Args:
+        paths (list): The detection log files (.jsonl or .jsonl.gz) or folders of them.
+
+    Returns:
+        list: The detection log file paths.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, f) for f in os.listdir(path) if f.endswith(('.jsonl', '.jsonl.gz'))]
+        else:
+            files.append(path)
+    return sorted(files)
+
+def read_detection_logs(paths):
+    """
+    Reads recorded detections.
+
+    Args:
+        paths (list): The detection log files (.jsonl or .jsonl.gz) or folders of them.
+
+    Yields:
+        tuple: The class names, timestamp, stream index and boxes of each frame.
+    """
+    for path in log_files(paths):
+        opener = gzip.open if path.endswith('.gz') else open
+        names = []
+        with opener(path, 'rt') as f:
+            for line in f:
+                record = json.loads(line)
+                if 'names' in record:
+                    names = record['names']
+                    continue
+                yield names, record['t'], record['s'], record['b']
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import threading
+import numpy as np
+
+# fixed-size (32 bytes) detection record
+RECORD = np.dtype([
+    ('t', '<f8'),  # timestamp (epoch seconds)
+    ('stream', '<u2'),  # stream id
+    ('cls', 'u1'),  # class id
+    ('pad', 'u1'),
+    ('conf', '<f4'),  # confidence
+    ('x1', '<f4'), ('y1', '<f4'), ('x2', '<f4'), ('y2', '<f4'),  # box in original image pixels
+])
+
+SEGMENT_PREFIX = 'seg-'
+SEGMENT_SUFFIX = '.evt'
+META_FILE = 'meta.json'
+
+def segment_start(filename):
+    """
+    Gets the start time of a segment from its filename, i.e. `seg-1710400479626.evt`.
+    """
+    return int(filename[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) / 1000
+
+class EventStoreWriter:
+    """
+    EventStoreWriter class responsible for appending detections to a compact columnar event store.
+    Records are buffered in memory and appended to the current segment file, a new segment is
+    started every `segment_sec` so old detections can be dropped a segment at a time.
+    """
+
+    def __init__(self, folder, names, streams=(), segment_sec=3600, flush_sec=5, retention_days=None, clock=time.time):
+        """
+        Initializes an EventStoreWriter object.
+
+        Args:
+            folder: The event store folder.
+            names: The class names, as a list or a dict of class id to name.
+            streams: The stream (camera) names, the stream id is the index.
+            segment_sec: Start a new segment file every this many seconds.
+            flush_sec: Write buffered records at least every this many seconds.
+            retention_days: Delete segments older than this many days, None keeps everything.
+            clock: The function returning the current time (in seconds).
+        """
+        self.folder = folder
+        self.segment_sec = segment_sec
+        self.flush_sec = flush_sec
+        self.retention_days = retention_days
+        self._clock = clock
+        self._buffer = []
+        self._last_flush = clock()
+        self._last_t = 0.0
+        self._segment = None
+        self._segment_start = 0.0
+        self._lock = threading.Lock()
+
+        os.makedirs(folder, exist_ok=True)
+        self._write_meta(names, streams)
+
+    def write(self, stream, det):
+        """
+        Appends the detections of a frame.
+
+        Args:
+            stream (int): The stream id of the frame.
+            det: The detections (N x 6 of xyxy, conf, cls) in original image coordinates.
+        """
+        if not len(det):
+            return
+        det = det.cpu().numpy() if hasattr(det, 'cpu') else np.asarray(det)
+
+        # timestamps must never go backwards, queries binary search them
+        t = max(self._clock(), self._last_t)
+        self._last_t = t
+
+        records = np.zeros(len(det), dtype=RECORD)
+        records['t'] = t
+        records['stream'] = stream
+        records['cls'] = det[:, 5]
+        records['conf'] = det[:, 4]
+        for i, k in enumerate(('x1', 'y1', 'x2', 'y2')):
+            records[k] = det[:, i]
+
+        with self._lock:
+            self._buffer.append(records)
+        if t - self._last_flush >= self.flush_sec:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes buffered records to the current segment, rotating segments when due.
+        """
+        with self._lock:
+            buffer, self._buffer = self._buffer, []
+        self._last_flush = self._clock()
+        if not buffer:
+            return
+
+        records = np.concatenate(buffer)
+        t = records['t'][0]
+        if self._segment is None or t - self._segment_start >= self.segment_sec:
+            self._rotate(t)
+        self._segment.write(records.tobytes())
+        self._segment.flush()
+
+    def close(self):
+        """
+        Writes buffered records and closes the current segment.
+        """
+        self.flush()
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def _rotate(self, t):
+        if self._segment is not None:
+            self._segment.close()
+        self._segment_start = t
+        path = os.path.join(self.folder, f'{SEGMENT_PREFIX}{int(t * 1000)}{SEGMENT_SUFFIX}')
+        self._segment = open(path, 'ab')
+
+        # drop expired segments
+        if self.retention_days is not None:
+            expiry = t - self.retention_days * 86400
+            for filename in sorted(os.listdir(self.folder)):
+                if filename.startswith(SEGMENT_PREFIX) and segment_start(filename) + self.segment_sec < expiry:
+                    os.remove(os.path.join(self.folder, filename))
+
+    def _write_meta(self, names, streams):
+        path = os.path.join(self.folder, META_FILE)
+        meta = dict(names=[], streams=[])
+        if os.path.isfile(path):
+            with open(path) as f:
+                meta = json.load(f)
+        meta['names'] = list(names.values()) if isinstance(names, dict) else list(names)
+        # keep ids of previously seen streams stable, append new ones
+        meta['streams'] = meta['streams'] + [s for s in streams if s not in meta['streams']]
+        with open(path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        self.stream_ids = {s: i for i, s in enumerate(meta['streams'])}
+
+class EventStore:
+    """
+    EventStore class responsible for querying the detections written by EventStoreWriter.
+    """
+
+    def __init__(self, folder):
+        """
+        Initializes an EventStore object.
+
+        Args:
+            folder: The event store folder.
+        """
+        self.folder = folder
+        with open(os.path.join(folder, META_FILE)) as f:
+            meta = json.load(f)
+        self.names = meta['names']
+        self.streams = meta['streams']
+
+    def segments(self):
+        """
+        Lists the segment files with their start times, oldest first.
+
+        Returns:
+            list: The (start time, file path) of each segment.
+        """
+        return sorted((segment_start(f), os.path.join(self.folder, f)) for f in os.listdir(self.folder)
+                      if f.startswith(SEGMENT_PREFIX) and f.endswith(SEGMENT_SUFFIX))
+
+    def query(self, start=None, end=None, stream=None, cls=None, min_conf=0.0):
+        """
+        Queries detections in a time range.
+
+        Args:
+            start (float, optional): The start timestamp (inclusive). Defaults to the beginning.
+            end (float, optional): The end timestamp (exclusive). Defaults to now.
+            stream (int or str, optional): Only detections of this stream id or name.
+            cls (int or str, optional): Only detections of this class id or name.
+            min_conf (float): Only detections with at least this confidence.
+
+        Returns:
+            numpy.ndarray: The matching records (of RECORD dtype), oldest first.
+        """
+        start = -np.inf if start is None else start
+        end = np.inf if end is None else end
+        if isinstance(stream, str):
+            stream = self.streams.index(stream) if stream in self.streams else int(stream)
+        if isinstance(cls, str):
+            cls = self.names.index(cls) if cls in self.names else int(cls)
+
+        segments = self.segments()
+        results = []
+        for i, (seg_start, path) in enumerate(segments):
+            # skip segments entirely outside of the time range, using the next segment's start as end
+            seg_end = segments[i + 1][0] if i + 1 < len(segments) else np.inf
+            if seg_start >= end or seg_end < start:
+                continue
+
+            n = os.path.getsize(path) // RECORD.itemsize  # ignore a partially written record
+            if not n:
+                continue
+            records = np.memmap(path, dtype=RECORD, mode='r', shape=(n,))
+
+            # records are time ordered, binary search the range
+            lo, hi = np.searchsorted(records['t'], [start, end], side='left')
+            records = records[lo:hi]
+
+            mask = np.ones(len(records), dtype=bool)
+            if stream is not None:
+                mask &= records['stream'] == stream
+            if cls is not None:
+                mask &= records['cls'] == cls
+            if min_conf:
+                mask &= records['conf'] >= min_conf
+            results.append(np.array(records[mask]))
+
+        return np.concatenate(results) if results else np.zeros(0, dtype=RECORD)
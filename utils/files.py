@@ -0,0 +1,61 @@
+import os
+from collections import defaultdict
+
+def prune_oldest(path, max_bytes, keep=0, exclude=()):
+    """
+    Deletes the oldest files under a folder until its total size is within `max_bytes`.
+
+    Files sharing the same stem (e.g. an image and its label) are treated as one group and
+    deleted together, so a pruned image never leaves an orphan label behind.
+
+    Args:
+        path (str): The folder to prune.
+        max_bytes (int): The maximum total size (in bytes) allowed.
+        keep (int, optional): Extra bytes to free up on top of `max_bytes`, e.g. the size of
+        a file about to be written. Defaults to 0.
+        exclude (tuple, optional): File names that are never deleted. Defaults to ().
+
+    Returns:
+        int: Number of files deleted.
+    """
+    groups = defaultdict(list)
+    for root, _, files in os.walk(path):
+        for file in files:
+            if file in exclude:
+                continue
+            file_path = os.path.join(root, file)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            groups[os.path.splitext(file)[0]].append((file_path, stat.st_size, stat.st_mtime))
+
+    total = sum(size for group in groups.values() for _, size, _ in group)
+    deleted = 0
+
+    # delete oldest groups first
+    for group in sorted(groups.values(), key=lambda g: max(mtime for _, _, mtime in g)):
+        if total + keep <= max_bytes:
+            break
+        for file_path, size, _ in group:
+            try:
+                os.remove(file_path)
+                total -= size
+                deleted += 1
+            except OSError:
+                pass
+
+    return deleted
+
+def folder_size(path):
+    """
+    Gets the total size (in bytes) of the files under a folder, 0 if it doesn't exist.
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                continue
+    return total
@@ -0,0 +1,107 @@
+import sys
+import numpy as np
+from multiprocessing import shared_memory
+
+HEADER_SIZE = 64  # bytes reserved before the frames, head counter + per slot sequence numbers
+
+class FrameRing:
+    """
+    FrameRing class is a single writer ring buffer of fixed shape frames in shared memory, for moving
+    decoded frames between processes without pickling them. Readers always take the latest frame,
+    older unread frames are dropped like yolov5's LoadStreams does.
+    """
+
+    def __init__(self, shm, shape, slots, owner):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.owner = owner
+        self.name = shm.name
+        self._header = np.ndarray((HEADER_SIZE // 8,), dtype=np.int64, buffer=shm.buf)
+        self._frames = np.ndarray((slots, *shape), dtype=np.uint8, buffer=shm.buf, offset=HEADER_SIZE)
+
+    @classmethod
+    def create(cls, shape, slots=4):
+        """
+        Creates a ring, the creating process owns it and must `unlink` it.
+
+        Args:
+            shape (tuple): The frame shape (height, width, channels).
+            slots (int): The number of frames the ring holds.
+
+        Returns:
+            FrameRing: The ring.
+        """
+        assert 2 <= slots < HEADER_SIZE // 8, f'slots must be between 2 and {HEADER_SIZE // 8 - 1}'
+        shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + slots * int(np.prod(shape)))
+        ring = cls(shm, shape, slots, owner=True)
+        ring._header[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, shape, slots=4):
+        """
+        Attaches to a ring created by another process.
+
+        Args:
+            name (str): The shared memory name of the ring.
+            shape (tuple): The frame shape (height, width, channels).
+            slots (int): The number of frames the ring holds.
+
+        Returns:
+            FrameRing: The ring.
+        """
+        # processes started by the owner share its resource tracker, registering again is a no-op and
+        # the owner stays responsible for unlinking
+        kwargs = dict(track=False) if sys.version_info >= (3, 13) else {}
+        return cls(shared_memory.SharedMemory(name=name, **kwargs), shape, slots, owner=False)
+
+    @property
+    def head(self):
+        """
+        The number of the latest written frame, 0 before the first frame.
+        """
+        return int(self._header[0])
+
+    def write(self, frame):
+        """
+        Writes a frame into the next slot.
+
+        Args:
+            frame (numpy.ndarray): The frame, of the ring's shape.
+        """
+        n = self.head + 1
+        k = n % self.slots
+        self._header[1 + k] = -1  # mark slot as being written
+        self._frames[k] = frame
+        self._header[1 + k] = n
+        self._header[0] = n
+
+    def read(self, last=0):
+        """
+        Reads the latest frame, if newer than `last`.
+
+        Args:
+            last (int): The number of the last frame read.
+
+        Returns:
+            tuple: The frame (a copy, None if there is no newer frame) and its number.
+        """
+        n = self.head
+        if n <= last:
+            return None, last
+        k = n % self.slots
+        if self._header[1 + k] != n:
+            return None, last  # overwritten already, the next read gets a newer frame
+        frame = self._frames[k].copy()
+        if self._header[1 + k] != n:
+            return None, last  # overwritten while copying
+        return frame, n
+
+    def close(self):
+        # drop views on the buffer before closing it
+        self._header = self._frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
@@ -0,0 +1,250 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from utils.dataset import IMG_EXTENSIONS
+from utils.files import prune_oldest
+from utils.image import crop_box, crop_image, resize_image
+
+def dhash(image, hash_size=8):
+    """
+    Calculates the difference hash of an image, a 64-bit perceptual signature that stays
+    (almost) the same for near-identical frames.
+
+    Args:
+        image (PIL.Image.Image): The image to hash.
+        hash_size (int, optional): Width & height of the hash grid. Defaults to 8.
+
+    Returns:
+        int: The image hash.
+    """
+    small = np.asarray(image.convert('L').resize((hash_size + 1, hash_size)), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).tobytes().hex(), 16)
+
+def hamming(a, b):
+    """
+    Counts the number of differing bits between two hashes.
+    """
+    return bin(a ^ b).count('1')
+
+class HardNegativeCollector:
+    """
+    HardNegativeCollector class responsible for capturing likely false positive frames into a
+    staging folder, together with pre-filled YOLO labels, ready to be reviewed in labelImg and
+    moved into the dataset.
+    """
+
+    def __init__(self,
+                 output='dataset/staging',
+                 conf_band=(0.75, 0.85),
+                 imgsz=640,
+                 crop_from='none',
+                 quota_mb=500,
+                 hash_dist=6,
+                 max_pending=3,
+                 prefix='dog-fp',
+                 logger=None,
+        ):
+        """
+        Initializes a HardNegativeCollector object.
+
+        Args:
+            output: The staging folder, laid out like `dataset/` with `images` & `labels`.
+            conf_band: The (low, high) confidence band of detections worth capturing.
+            imgsz: The width (in pixels) captured frames are downscaled to.
+            crop_from: Reference point to crop frames into square dimension (i.e. none, left,
+            middle, right), same as `crop-resize-image.py`.
+            quota_mb: The disk quota (in MB) of the staging folder, oldest captures are
+            deleted beyond it.
+            hash_dist: Captures within this hamming distance of an earlier one are duplicates.
+            max_pending: The maximum number of frames held while waiting for a confirmation.
+            prefix: The filename prefix of captured frames.
+            logger: The logger object for logging messages.
+        """
+        self.log = logger or logging.getLogger()
+        self.output = output
+        self.conf_band = conf_band
+        self.imgsz = imgsz
+        self.crop_from = crop_from
+        self.quota_bytes = int(quota_mb * 1024 * 1024)
+        self.hash_dist = hash_dist
+        self.prefix = prefix
+        self.names = None
+
+        self.saved = 0
+        self.duplicates = 0
+
+        self._images_dir = os.path.join(output, 'images')
+        self._labels_dir = os.path.join(output, 'labels')
+        os.makedirs(self._images_dir, exist_ok=True)
+        os.makedirs(self._labels_dir, exist_ok=True)
+
+        # frames held until the detector decides whether they were a real poop
+        self._pending = deque(maxlen=max_pending)
+        self._previous_pending = []
+
+        # hashes of everything captured so far, for deduplication
+        self._hashes = self._load_hashes()
+        self._lock = threading.Lock()
+
+        # encoding & writing is done off the detection thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='hardneg')
+
+    def set_names(self, names):
+        """
+        Sets the class names and writes `classes.txt` for labelImg.
+
+        Args:
+            names: The class names, as a list or a dict of class id to name.
+        """
+        self.names = list(names.values()) if isinstance(names, dict) else list(names)
+        with open(os.path.join(self._labels_dir, 'classes.txt'), 'w') as f:
+            f.write('\n'.join(self.names))
+
+    def in_band(self, det) -> bool:
+        """
+        Checks if any detection's confidence lands in the capture band.
+
+        Args:
+            det: The detections (N x 6 of xyxy, conf, cls) of a frame.
+
+        Returns:
+            True if the frame is worth capturing, False otherwise.
+        """
+        det = to_numpy(det)
+        if not len(det):
+            return False
+        low, high = self.conf_band
+        return bool(np.any((det[:, 4] >= low) & (det[:, 4] < high)))
+
+    def capture(self, im0, det):
+        """
+        Captures the frame if any detection's confidence lands in the capture band.
+
+        Args:
+            im0 (numpy.ndarray): The original (unannotated) BGR frame.
+            det: The detections (N x 6 of xyxy, conf, cls) in `im0` coordinates.
+        """
+        if self.in_band(det):
+            self._submit(im0, to_numpy(det))
+
+    def hold(self, im0, det):
+        """
+        Holds a frame until the detector decides whether its detections were confirmed.
+
+        Args:
+            im0 (numpy.ndarray): The original (unannotated) BGR frame.
+            det: The detections (N x 6 of xyxy, conf, cls) in `im0` coordinates.
+        """
+        self._pending.append((im0, to_numpy(det)))
+
+    def resolve(self, confirmed):
+        """
+        Resolves the held frames after a poop confirmation check.
+
+        A window that fails confirmation is often the start of a real poop that gets confirmed
+        on the next check, so held frames are only captured once the following check fails too.
+
+        Args:
+            confirmed: True if poop was confirmed, False if the detections were rejected.
+        """
+        if confirmed:
+            self._previous_pending = []
+        else:
+            for im0, det in self._previous_pending:
+                self._submit(im0, det)
+            self._previous_pending = list(self._pending)
+        self._pending.clear()
+
+    def close(self):
+        """
+        Waits for queued captures to be written.
+        """
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, im0, det):
+        self._executor.submit(self._save, im0, det)
+
+    def _save(self, im0, det):
+        try:
+            image = Image.fromarray(np.ascontiguousarray(im0[..., ::-1]))  # BGR to RGB
+
+            # deduplicate against earlier captures
+            h = dhash(image)
+            with self._lock:
+                if any(hamming(h, x) <= self.hash_dist for x in self._hashes):
+                    self.duplicates += 1
+                    return
+                self._hashes.append(h)
+
+            # crop & downscale the same way as crop-resize-image.py
+            box = crop_box(image.size, self.crop_from)
+            image = crop_image(image, self.crop_from)
+            if image.size[0] > self.imgsz:
+                image = resize_image(image, width=self.imgsz)
+            labels = yolo_labels(det, box)
+
+            # stay within disk quota
+            jpg_size = image.size[0] * image.size[1] // 4  # rough estimate of the jpg size
+            prune_oldest(self.output, self.quota_bytes, keep=jpg_size, exclude=('classes.txt',))
+
+            name = f'{self.prefix}-{int(time.time() * 1000)}'
+            image.save(os.path.join(self._images_dir, f'{name}.jpg'), quality=95)
+            with open(os.path.join(self._labels_dir, f'{name}.txt'), 'w') as f:
+                f.write(''.join(f'{int(c)} {x:.6f} {y:.6f} {w:.6f} {h:.6f}\n' for c, x, y, w, h in labels))
+
+            self.saved += 1
+            self.log.info(f"Hard negative saved as '{name}.jpg' ({self.saved} saved, " +
+                          f"{self.duplicates} duplicates skipped)")
+
+        except Exception as e:
+            self.log.error(e, exc_info=True)
+
+    def _load_hashes(self):
+        hashes = deque(maxlen=10000)
+        for file in sorted(os.listdir(self._images_dir)):
+            if file.lower().endswith(IMG_EXTENSIONS):
+                try:
+                    with Image.open(os.path.join(self._images_dir, file)) as image:
+                        hashes.append(dhash(image))
+                except Exception:
+                    pass
+        return hashes
+
+def to_numpy(det):
+    """
+    Converts detections (torch tensor or array-like) into a numpy array.
+    """
+    if hasattr(det, 'cpu'):
+        det = det.cpu().numpy()
+    return np.asarray(det, dtype=np.float32).reshape(-1, 6)
+
+def yolo_labels(det, box):
+    """
+    Converts detections into normalized YOLO labels relative to a crop box.
+
+    Args:
+        det (numpy.ndarray): The detections (N x 6 of xyxy, conf, cls).
+        box (tuple): The crop box (left, upper, right, lower).
+
+    Returns:
+        numpy.ndarray: The labels (M x 5 of cls, x, y, w, h), boxes falling outside of the
+        crop box are dropped.
+    """
+    left, top, right, bottom = box
+    w, h = right - left, bottom - top
+    xyxy = det[:, :4] - [left, top, left, top]
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, w)
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, h)
+    bw, bh = xyxy[:, 2] - xyxy[:, 0], xyxy[:, 3] - xyxy[:, 1]
+    keep = (bw > 1) & (bh > 1)
+    return np.stack([det[keep, 5],
+                     (xyxy[keep, 0] + bw[keep] / 2) / w,
+                     (xyxy[keep, 1] + bh[keep] / 2) / h,
+                     bw[keep] / w,
+                     bh[keep] / h], axis=1)
@@ -0,0 +1,98 @@
+def crop_box(size, crop_from):
+    """
+    Calculate the square crop box for an image of the given size.
+
+    Args:
+        size (tuple): The (width, height) of the image.
+
+        crop_from (str): The position from which to crop the image. Allowed values are 'none'
+        , 'left', 'middle', 'right'.
+
+    Returns:
+        tuple: The crop box (left, upper, right, lower).
+    """
+    # Get the width and height of the original image
+    width, height = size
+
+    if crop_from == 'none':
+        return 0, 0, width, height
+
+    # Calculate the new width and height for cropping
+    crop_size = min(width, height)
+    new_width, new_height = crop_size, crop_size
+
+    # Calculate the top-left coordinates for cropping
+    if crop_from == 'left':
+        left = 0
+    elif crop_from == 'middle':
+        left = (width - new_width) // 2
+    elif crop_from == 'right':
+        left = width - new_width
+    else:
+        raise ValueError(f"Invalid crop_from value '{crop_from}'. Allowed values are 'left'" +
+                         ", 'middle', 'right'.")
+
+    top = height - new_height
+    right = left + new_width
+    bottom = height
+
+    return left, top, right, bottom
+
+def crop_image(image, crop_from):
+    """
+    Crop the input image based on the specified cropping position.
+
+    Args:
+        image (PIL.Image.Image): The input image to be cropped.
+
+        crop_from (str): The position from which to crop the image. Allowed values are 'none'
+        , 'left', 'middle', 'right'.
+
+    Returns:
+        PIL.Image.Image: The cropped image.
+    """
+    if crop_from == 'none':
+        return image
+
+    # Crop the image based on the specified coordinates
+    return image.crop(crop_box(image.size, crop_from))
+
+def resize_image(image, width=None, height=None):
+    """
+    Resize the given image while maintaining the aspect ratio.
+
+    Args:
+        image (PIL.Image.Image): The image to be resized.
+
+        width (int, optional): The desired width of the resized image. If not specified, the
+        width will be calculated based on the specified height while maintaining the aspect
+        ratio. Default is None.
+
+        height (int, optional): The desired height of the resized image. If not specified, the
+        height will be calculated based on the specified width while maintaining the aspect
+        ratio. Default is None.
+
+    Returns:
+        PIL.Image.Image: The resized image.
+
+    Raises:
+        ValueError: If both width and height are specified, or if neither width nor height are
+        specified.
+    """
+    # Get the original width and height
+    w, h = image.size
+
+    # Calculate the new width and height while maintaining the aspect ratio
+    if width is not None and height is None:
+        # Resize based on width
+        new_width = width
+        new_height = int(h * (new_width / w))
+    elif width is None and height is not None:
+        # Resize based on height
+        new_height = height
+        new_width = int(w * (new_height / h))
+    else:
+        raise ValueError("Either width or height should be specified, not both or none.")
+
+    # Resize the image
+    return image.resize((new_width, new_height))
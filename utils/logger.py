@@ -0,0 +1,18 @@
+import logging
+import logging.config
+import logging.handlers
+
+def set_logger(log_name, debug=False):
+    """
+    Configures the root logger from logging.ini, adding a daily rotated `<log_name>.log` file.
+    """
+    log_config = 'logging.ini'
+    logging.config.fileConfig(log_config)
+    log = logging.getLogger()
+    fileHandler = logging.handlers.TimedRotatingFileHandler(filename=f'{log_name}.log', when='midnight', backupCount=7)
+    logLevel = logging.DEBUG if debug else logging.INFO
+    log.handlers[0].level = logLevel
+    fileHandler.setLevel(logLevel)
+    fileHandler.setFormatter(log.handlers[0].formatter)
+    log.addHandler(fileHandler)
+    return log
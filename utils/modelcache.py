@@ -0,0 +1,103 @@
+import os
+import glob
+import json
+import hashlib
+import warnings
+from pathlib import Path
+
+import torch
+
+def artifact_path(weights, imgsz, batch_size, device, half, folder):
+    """
+    Gets the cached TorchScript artifact path of a model, keyed by the weights file (path, size and
+    modification time), inference size, batch size, device, precision and torch version.
+
+    Args:
+        weights (str): The PyTorch .pt weights path.
+        imgsz (list): The inference size (height, width).
+        batch_size (int): The inference batch size.
+        device (torch.device): The device the model runs on.
+        half (bool): Use FP16 half-precision inference.
+        folder (str): The cache folder.
+
+    Returns:
+        str: The artifact path.
+    """
+    st = os.stat(weights)
+    version = json.dumps([st.st_size, st.st_mtime_ns])
+    key = json.dumps([list(imgsz), batch_size, str(device), bool(half), torch.__version__])
+    return os.path.join(folder, f'{artifact_prefix(weights)}{short_hash(version)}-{short_hash(key)}.torchscript')
+
+def artifact_prefix(weights):
+    """
+    Gets the artifact file name prefix of a weights file, unique to its absolute path, so that weights
+    of the same name in different run folders don't share it.
+    """
+    return f'{Path(weights).stem}-{short_hash(os.path.abspath(weights))}-'
+
+def short_hash(s):
+    return hashlib.sha1(s.encode()).hexdigest()[:8]
+
+def export_artifact(weights, imgsz, batch_size, device, half, path):
+    """
+    Exports a fused, traced and frozen TorchScript model, the way `yolov5 export --include torchscript` does,
+    so loading it skips unpickling the training checkpoint and fusing layers.
+    """
+    from yolov5.models.experimental import attempt_load
+    from yolov5.models.yolo import Detect
+    from yolov5.utils.general import check_img_size
+
+    model = attempt_load(weights, device=device, inplace=True, fuse=True)
+    stride = int(max(model.stride))
+    imgsz = [check_img_size(x, stride) for x in imgsz]
+    im = torch.zeros(batch_size, 3, *imgsz).to(device)
+
+    model.eval()
+    for m in model.modules():
+        if isinstance(m, Detect):
+            m.export = True
+    for _ in range(2):
+        model(im)  # dry runs
+    if half:
+        im, model = im.half(), model.half()
+
+    with warnings.catch_warnings():
+        warnings.filterwarnings(action='ignore', category=torch.jit.TracerWarning)
+        ts = torch.jit.freeze(torch.jit.trace(model, im, strict=False))
+
+    # write to a temporary file first, a power loss must not leave a truncated artifact behind
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    config = json.dumps({'shape': list(im.shape), 'stride': stride, 'names': model.names})
+    ts.save(f'{path}.tmp', _extra_files={'config.txt': config})
+    os.replace(f'{path}.tmp', path)
+
+def cached_weights(weights, imgsz, batch_size, device, half, folder):
+    """
+    Gets the weights to load, exporting the cached TorchScript artifact on first use.
+
+    Args:
+        weights (str): The model path, only PyTorch .pt weights are cached.
+        imgsz (list): The inference size (height, width).
+        batch_size (int): The inference batch size.
+        device (torch.device): The device the model runs on.
+        half (bool): Use FP16 half-precision inference.
+        folder (str): The cache folder.
+
+    Returns:
+        tuple: The weights path to load and whether it is a cached artifact.
+    """
+    if not str(weights).endswith('.pt') or not os.path.isfile(weights):
+        return weights, False
+
+    path = artifact_path(weights, imgsz, batch_size, device, half, folder)
+    if not os.path.isfile(path):
+        export_artifact(weights, imgsz, batch_size, device, half, path)
+
+        # drop the artifacts of older versions of the same weights file, artifacts of other inference
+        # sizes or batch sizes of this version may be in use by other processes sharing the cache
+        prefix = artifact_prefix(weights)
+        version = os.path.basename(path)[len(prefix):].split('-')[0]
+        for f in Path(folder).glob(f'{glob.escape(prefix)}*.torchscript'):
+            if not f.name[len(prefix):].startswith(f'{version}-'):
+                f.unlink(missing_ok=True)  # another process may have dropped it already
+    return path, True
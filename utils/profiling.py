@@ -0,0 +1,293 @@
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+
+class StackSampler:
+    """
+    StackSampler class samples the Python stacks of all threads on a background thread, and writes
+    them as collapsed stacks (one `thread;outer;...;inner count` line per stack, for flamegraph.pl
+    or speedscope) and as a per-function summary of self & total samples.
+    """
+
+    def __init__(self, interval_ms=5):
+        self.interval = interval_ms / 1E3
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, duration_sec, on_done=None):
+        self._thread = threading.Thread(target=self._run, args=(duration_sec, on_done), name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, duration_sec, on_done):
+        me = threading.get_ident()
+        names, until = {}, time.perf_counter() + duration_sec
+        while not self._stop.is_set() and time.perf_counter() < until:
+            frames = sys._current_frames()
+            if frames.keys() - names.keys():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':'))
+                    frame = frame.f_back
+                self.counts[(names.get(ident, str(ident)), *reversed(stack))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+        if on_done is not None:
+            on_done(self)
+
+    def write_collapsed(self, path):
+        with open(path, 'w') as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{';'.join(stack)} {n}\n")
+
+    def write_summary(self, path, top=40):
+        own, total = Counter(), Counter()
+        for stack, n in self.counts.items():
+            own[stack[-1]] += n
+            for fn in set(stack[1:]):
+                total[fn] += n
+        n = max(self.samples, 1)
+        with open(path, 'w') as f:
+            f.write(f'{self.samples} samples every {self.interval * 1E3:g}ms, % of samples a function was running '
+                    f'(self) or on the stack (total) of any thread\n\n')
+            f.write(f"{'self %':>7} {'total %':>8}  function\n")
+            for fn, k in own.most_common(top):
+                f.write(f'{k / n:>7.1%} {total[fn] / n:>8.1%}  {fn}\n')
+
+class OnDemandProfiler:
+    """
+    OnDemandProfiler class lets a running process be profiled for a bounded duration without a restart.
+    SIGUSR1 toggles a sampling session of all threads, SIGUSR2 a cProfile session of the main thread,
+    and a local control socket takes `sample [sec]`, `cprofile [sec]`, `torch [calls]`, `stop` and
+    `status` commands (see profiler.py). Nothing is hooked into the profiled code until a session
+    starts, the torch profiler wraps the model's forward for the traced calls only.
+    """
+
+    def __init__(self, folder='runs/profile', duration_sec=30, interval_ms=5, torch_calls=20, logger=None):
+        """
+        Initializes an OnDemandProfiler object.
+
+        Args:
+            folder: The folder the profiles are written to.
+            duration_sec: The default duration (in seconds) of a sampling or cProfile session.
+            interval_ms: The sampling interval (in milliseconds).
+            torch_calls: The default number of inference calls traced by the torch profiler.
+            logger: The logger object for logging messages.
+        """
+        self.folder = folder
+        self.duration_sec = duration_sec
+        self.interval_ms = interval_ms
+        self.torch_calls = torch_calls
+        self.log = logger or logging.getLogger()
+        self.model = None
+        self._sampler = None
+        self._cprofile = None
+        self._cprofile_sec = duration_sec
+        self._cprofile_timer = None
+        self._torch_pending = 0
+        self._lock = threading.RLock()  # reentrant, signal handlers run on the main thread
+        self._server = None
+        self._socket_path = None
+
+    def install(self, socket_path=None):
+        """
+        Installs the signal handlers (where supported) and starts the control socket.
+
+        Args:
+            socket_path: The Unix socket path of the control socket, None for signals only.
+        """
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda *_: self.toggle_sampling())
+            signal.signal(signal.SIGUSR2, lambda *_: self._toggle_cprofile())
+            self.log.info(f'Profiling on demand: kill -USR1 {os.getpid()} (sampling), kill -USR2 {os.getpid()} (cProfile)')
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            os.makedirs(os.path.dirname(socket_path) or '.', exist_ok=True)
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._server.bind(socket_path)
+            self._server.listen(1)
+            self._socket_path = socket_path
+            threading.Thread(target=self._serve, name='profile-control', daemon=True).start()
+            self.log.info(f'Profiling control socket {socket_path}')
+
+    def attach(self, model):
+        """
+        Sets the model traced by the torch profiler, i.e. a DetectMultiBackend.
+        """
+        self.model = model
+
+    def close(self):
+        self.stop()
+        if self._server is not None:
+            self._server.close()
+            os.remove(self._socket_path)
+            self._server = None
+
+    def status(self):
+        return dict(sampling=self._sampler is not None,
+                    cprofile=self._cprofile is not None,
+                    torch_calls=self._torch_pending)
+
+    def toggle_sampling(self, duration_sec=None):
+        """
+        Starts a sampling session, or stops the running one early.
+        """
+        with self._lock:
+            if self._sampler is not None:
+                self._sampler.stop()
+                return
+            self._sampler = StackSampler(self.interval_ms)
+            self._sampler.start(duration_sec or self.duration_sec, on_done=self._sampling_done)
+        self.log.info(f'Sampling for {duration_sec or self.duration_sec}s')
+
+    def start_cprofile(self, duration_sec=None):
+        """
+        Starts a cProfile session of the main thread, or stops the running one early.
+        """
+        self._cprofile_sec = duration_sec or self.duration_sec
+        self._signal_main()
+
+    def trace_torch(self, calls=None):
+        """
+        Traces the next inference calls of the attached model with the torch profiler.
+        """
+        if self.model is None:
+            raise RuntimeError('No model attached')
+        with self._lock:
+            if self._torch_pending:
+                raise RuntimeError('A torch trace is already running')
+            self._torch_pending = calls or self.torch_calls
+        model = self.model
+        forward = model.forward
+        state = dict(prof=None, calls=0)
+
+        def traced(*args, **kwargs):  # runs on the inference thread
+            if state['prof'] is None:
+                from torch.profiler import profile, ProfilerActivity
+                import torch
+                activities = [ProfilerActivity.CPU] + ([ProfilerActivity.CUDA] if torch.cuda.is_available() else [])
+                state['prof'] = profile(activities=activities, record_shapes=True)
+                state['prof'].start()
+            try:
+                return forward(*args, **kwargs)
+            finally:
+                state['calls'] += 1
+                if state['calls'] >= self._torch_pending:
+                    del model.forward  # unhook, the class forward is used again
+                    state['prof'].stop()
+                    try:
+                        self._torch_done(state['prof'], state['calls'])
+                    except Exception as e:
+                        self.log.error(e, exc_info=True)
+                    finally:
+                        self._torch_pending = 0
+
+        model.forward = traced
+        self.log.info(f'Tracing the next {self._torch_pending} inference calls')
+
+    def stop(self):
+        with self._lock:
+            if self._sampler is not None:
+                self._sampler.stop()
+        if self._cprofile is not None:
+            self._signal_main()
+
+    def _path(self, kind, suffix):
+        os.makedirs(self.folder, exist_ok=True)
+        return os.path.join(self.folder, f'{kind}-{datetime.now().strftime("%Y%m%d-%H%M%S")}{suffix}')
+
+    def _sampling_done(self, sampler):
+        collapsed, summary = self._path('sample', '.collapsed'), self._path('sample', '.txt')
+        sampler.write_collapsed(collapsed)
+        sampler.write_summary(summary)
+        with self._lock:
+            self._sampler = None
+        self.log.info(f'Sampled {sampler.samples} times, stacks {collapsed}, summary {summary}')
+
+    def _signal_main(self):
+        if threading.current_thread() is threading.main_thread():
+            self._toggle_cprofile()
+        elif hasattr(signal, 'SIGUSR2'):
+            os.kill(os.getpid(), signal.SIGUSR2)  # cProfile profiles the thread enabling it, the handler runs on main
+        else:
+            raise RuntimeError('cProfile sessions can only be started from the main thread on this platform')
+
+    def _toggle_cprofile(self):
+        if self._cprofile is None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+            self._cprofile_timer = threading.Timer(self._cprofile_sec, self._signal_main)
+            self._cprofile_timer.daemon = True
+            self._cprofile_timer.start()
+            self.log.info(f'cProfile for {self._cprofile_sec}s')
+            return
+
+        self._cprofile.disable()
+        self._cprofile_timer.cancel()
+        stats, summary = self._path('cprofile', '.prof'), self._path('cprofile', '.txt')
+        self._cprofile.dump_stats(stats)
+        with open(summary, 'w') as f:
+            pstats.Stats(self._cprofile, stream=f).sort_stats('cumulative').print_stats(40)
+        self._cprofile = None
+        self._cprofile_sec = self.duration_sec
+        self.log.info(f'cProfile stats {stats}, summary {summary}')
+
+    def _torch_done(self, prof, calls):
+        trace, summary = self._path('torch', '.json'), self._path('torch', '.txt')
+        prof.export_chrome_trace(trace)
+        with open(summary, 'w') as f:
+            f.write(prof.key_averages().table(sort_by='self_cpu_time_total', row_limit=40))
+        self.log.info(f'Traced {calls} inference calls, trace {trace}, summary {summary}')
+
+    def _serve(self):
+        while self._server is not None:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return  # closed
+            with conn:
+                try:
+                    args = conn.recv(1024).decode().split()
+                    reply = self._command(args[0], float(args[1]) if len(args) > 1 else None) if args else 'empty command'
+                except Exception as e:
+                    reply = f'error: {e}'
+                conn.sendall(f'{reply}\n'.encode())
+
+    def _command(self, command, value=None):
+        if command == 'sample':
+            if self._sampler is not None:
+                return 'sampling already'
+            self.toggle_sampling(value)
+            return f'sampling for {value or self.duration_sec}s, written to {self.folder}'
+        if command == 'cprofile':
+            if self._cprofile is not None:
+                return 'profiling already'
+            self.start_cprofile(value)
+            return f'profiling for {value or self.duration_sec}s, written to {self.folder}'
+        if command == 'torch':
+            self.trace_torch(int(value) if value else None)
+            return f'tracing the next {self._torch_pending} inference calls, written to {self.folder}'
+        if command == 'stop':
+            self.stop()
+            return 'stopped'
+        if command == 'status':
+            return str(self.status())
+        return f'unknown command {command}'
@@ -1,7 +1,8 @@
+import io
 import os
 import logging
 from typing import Optional
-from pushbullet import Pushbullet
+from utils.files import prune_oldest
 
 
 log = logging.getLogger()
@@ -44,6 +45,30 @@ class INotification(ABC):
         """
         raise NotImplementedError()
 
+    # folder & disk quota of files spilled by `file_bytes`
+    spill_folder = 'temp'
+    spill_quota_mb = 50
+
+    def file_bytes(self, data: bytes, filename: str, msg: str, title: Optional[str] = None):
+        """
+        Send a file from memory, by default spilled to `spill_folder` and sent with `file`.
+        The oldest spilled files are deleted once the folder exceeds `spill_quota_mb`.
+
+        :param data: File content
+        :param filename: File name
+        :param msg: message
+        :param title: message title
+        :return:
+        """
+        os.makedirs(self.spill_folder, exist_ok=True)
+        filepath = os.path.join(self.spill_folder, filename)
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        try:
+            return self.file(filepath, msg, title)
+        finally:
+            prune_oldest(self.spill_folder, self.spill_quota_mb * 1E6)
+
 
 class PushbulletNotification(INotification):
     def __init__(self, api_key: str, **kwargs):
@@ -51,7 +76,16 @@ class PushbulletNotification(INotification):
         log = kwargs.get('logger', logging.getLogger())
 
         self._title = kwargs.get('title', None)
-        self._n = Pushbullet(api_key)
+        self._api_key = api_key
+        self._n = None
+
+    @property
+    def client(self):
+        # connect on first notification, connecting fetches the user info and would delay startup
+        if self._n is None:
+            from pushbullet import Pushbullet
+            self._n = Pushbullet(self._api_key)
+        return self._n
 
     @property
     def title(self):
@@ -63,15 +97,23 @@ class PushbulletNotification(INotification):
 
     def text(self, msg: str = None, title: Optional[str] = None):
         try:
-            self._n.push_note(title=title if title else self._title, body=msg)
+            self.client.push_note(title=title if title else self._title, body=msg)
         except Exception as e:
             log.error(e, exc_info=True)
 
     def file(self, filepath: str, msg: str = None, title: Optional[str] = None):
         try:
             with open(filepath, "rb") as f:
-                file_data = self._n.upload_file(f, os.path.basename(filepath))
+                file_data = self.client.upload_file(f, os.path.basename(filepath))
+
+            self.client.push_file(**file_data, title=title if title else self._title, body=msg)
+        except Exception as e:
+            log.error(e, exc_info=True)
+
+    def file_bytes(self, data: bytes, filename: str, msg: str = None, title: Optional[str] = None):
+        try:
+            file_data = self.client.upload_file(io.BytesIO(data), filename)
 
-            self._n.push_file(**file_data, title=title if title else self._title, body=msg)
+            self.client.push_file(**file_data, title=title if title else self._title, body=msg)
         except Exception as e:
             log.error(e, exc_info=True)
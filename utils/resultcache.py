@@ -0,0 +1,108 @@
+import time
+import numpy as np
+from collections import OrderedDict
+
+class ResultCache:
+    """
+    ResultCache class reuses the detections of a previous frame for a near-identical frame of the same
+    stream, so a static scene isn't run through the model frame after frame. Frames are compared by a
+    signature of 8x8 block means of the letterboxed image, a frame matches when no block differs more
+    than the tolerance, so a small object entering the scene still changes its blocks while sensor
+    noise averages out. Entries expire after a TTL so a static scene is still re-inferred now and then,
+    and the least recently used entries are evicted beyond the maximum size.
+    """
+
+    def __init__(self, tolerance=4.0, ttl_sec=10, max_size=16, block=8, clock=time.time):
+        """
+        Initializes a ResultCache object.
+
+        Args:
+            tolerance: The maximum difference (0 - 255) of any block mean for frames to match.
+            ttl_sec: The time (in seconds) an entry is reused for since it was inferred.
+            max_size: The maximum number of entries, of all streams.
+            block: The block size (in pixels) of the signature.
+            clock: The function returning the current time (in seconds).
+        """
+        self.tolerance = tolerance
+        self.ttl_sec = ttl_sec
+        self.max_size = max_size
+        self.block = block
+        self.hits = 0
+        self.misses = 0
+        self.saved_sec = 0.0  # inference & NMS time of the reused results
+        self._clock = clock
+        self._entries = OrderedDict()  # number to (key, signature, result, time, cost), least recently used first
+        self._next_id = 0
+
+    def signature(self, im):
+        """
+        Gets the signature of a letterboxed image.
+
+        Args:
+            im (numpy.ndarray): The CHW uint8 image, as fed to the model.
+
+        Returns:
+            numpy.ndarray: The block means of each channel.
+        """
+        c, h, w = im.shape
+        b = self.block
+        return im[:, :h // b * b, :w // b * b].reshape(c, h // b, b, w // b, b).mean((2, 4), dtype=np.float32)
+
+    def get(self, key, signature):
+        """
+        Gets the result of a matching frame.
+
+        Args:
+            key: The stream of the frame.
+            signature (numpy.ndarray): The signature of the frame.
+
+        Returns:
+            The cached result, None if no frame matches.
+        """
+        now = self._clock()
+        for n in [n for n, entry in self._entries.items() if now - entry[3] > self.ttl_sec]:
+            del self._entries[n]
+        for n, (k, sig, result, t, cost) in reversed(self._entries.items()):
+            if k == key and sig.shape == signature.shape and np.abs(sig - signature).max() <= self.tolerance:
+                self._entries.move_to_end(n)
+                self.hits += 1
+                self.saved_sec += cost
+                return result
+        self.misses += 1
+        return None
+
+    def put(self, key, signature, result, cost=0.0):
+        """
+        Adds the result of an inferred frame.
+
+        Args:
+            key: The stream of the frame.
+            signature (numpy.ndarray): The signature of the frame.
+            result: The result, it is returned as is on later hits.
+            cost: The time (in seconds) it took to infer the result.
+        """
+        self._entries[self._next_id] = (key, signature, result, self._clock(), cost)
+        self._next_id += 1
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Gets the cache statistics.
+
+        Returns:
+            dict: The hits, misses, hit rate, saved inference time (in seconds) and number of entries.
+        """
+        lookups = self.hits + self.misses
+        return dict(hits=self.hits,
+                    misses=self.misses,
+                    hit_rate=round(self.hits / lookups, 3) if lookups else 0.0,
+                    saved_sec=round(self.saved_sec, 1),
+                    size=len(self._entries))
+
+    def report(self):
+        """
+        Gets the cache statistics as text.
+        """
+        s = self.stats()
+        return f"{s['hit_rate']:.1%} hit rate ({s['hits']} hits, {s['misses']} misses), {s['saved_sec']}s inference saved"
@@ -0,0 +1,41 @@
+import time
+
+# the first import of this module, live.py imports it before anything else
+IMPORT_START = time.perf_counter()
+
+class StartupProfile:
+    """
+    StartupProfile class responsible for timing the stages from start to first inference.
+    """
+
+    def __init__(self, start=None):
+        """
+        Initializes a StartupProfile object.
+
+        Args:
+            start: The `time.perf_counter()` the profile starts at, defaults to now.
+        """
+        self.start = time.perf_counter() if start is None else start
+        self.stages = []
+        self._last = self.start
+
+    def mark(self, stage):
+        """
+        Records the time elapsed since the previous stage.
+
+        Args:
+            stage (str): The name of the stage that just finished.
+        """
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def total(self):
+        return self._last - self.start
+
+    def report(self):
+        """
+        Formats the stage timings, i.e. `3.21s to first inference: imports 1.52s, model 0.80s, ...`.
+        """
+        stages = ', '.join(f'{stage} {sec:.2f}s' for stage, sec in self.stages)
+        return f'{self.total():.2f}s to first inference: {stages}'
@@ -0,0 +1,286 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+import cv2
+from pathlib import Path
+
+from yolov5.utils.augmentations import letterbox
+from yolov5.utils.general import clean_str
+
+def frame_signature(im):
+    """
+    Gets every 4th pixel of every 4th row of a frame, for cheaply telling repeated frames apart. A frozen
+    feed repeats the exact same frame, while sensor noise changes some pixels of every real frame.
+    """
+    return im[::4, ::4].copy()
+
+def open_capture(source, timeout_sec=10, hw_decode=False):
+    """
+    Opens a capture, network streams with open & read timeouts so a stalled camera can't block forever.
+    With `hw_decode`, FFmpeg decodes on any available hardware decoder, falling back to software.
+    """
+    if source.isnumeric():
+        return cv2.VideoCapture(int(source))
+    params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY] if hw_decode else []
+    if '://' in source:
+        ms = int(timeout_sec * 1000)
+        params += [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, ms]
+    return cv2.VideoCapture(source, cv2.CAP_FFMPEG, params) if params else cv2.VideoCapture(source)
+
+class StreamHealth:
+    """
+    StreamHealth class holds the health counters of a stream.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.state = 'connecting'  # connecting, live, stalled, frozen or reconnecting
+        self.frames = 0
+        self.duplicates = 0
+        self.skipped = 0  # grabbed but not retrieved, the previous frame wasn't consumed yet
+        self.decode_errors = 0
+        self.reconnects = 0
+        self.last_frame = None  # time of the last frame
+        self.last_change = None  # time of the last frame that differs from the one before
+        self.fps = 0.0
+
+    def as_dict(self, now):
+        return dict(source=self.source,
+                    state=self.state,
+                    frames=self.frames,
+                    duplicates=self.duplicates,
+                    skipped=self.skipped,
+                    decode_errors=self.decode_errors,
+                    reconnects=self.reconnects,
+                    frame_age_sec=round(now - self.last_frame, 1) if self.last_frame else None,
+                    fps=round(self.fps, 2))
+
+class ResilientStreams:
+    """
+    ResilientStreams class is a drop-in for yolov5's LoadStreams that keeps going when cameras fail.
+    Every stream is read on its own thread that reconnects with exponential backoff, a watchdog
+    reconnects streams that stall (no frames) or freeze (only repeated frames), and repeated frames
+    are not yielded again so frozen feeds don't waste inference. A frame is only retrieved (converted
+    to BGR) once the previous frame of its stream was consumed, frames grabbed in between are skipped.
+    """
+
+    def __init__(self, sources='file.streams', img_size=640, stride=32, auto=True, vid_stride=1, stall_sec=10,
+                 max_backoff_sec=60, skip_duplicates=True, hw_decode=False, health_log_sec=60, logger=None):
+        """
+        Initializes a ResilientStreams object.
+
+        Args:
+            sources: The source, or a `.streams` / `.txt` file with one source per line.
+            img_size: The inference size (height, width).
+            stride: The model stride.
+            auto: Letterbox to the minimum rectangle instead of `img_size`.
+            vid_stride: Use every `vid_stride`-th frame.
+            stall_sec: Reconnect a stream without a new frame for this many seconds.
+            max_backoff_sec: The maximum delay (in seconds) between reconnect attempts.
+            skip_duplicates: Yield only streams with a new frame, a batch then holds fewer streams than `len(self)`,
+            disable for models with a fixed batch size (streams without a frame yet are then yielded black).
+            hw_decode: Decode on any available hardware decoder.
+            health_log_sec: Log the health of all streams every this many seconds.
+            logger: The logger object for logging messages.
+        """
+        self.mode = 'stream'
+        self.img_size = img_size
+        self.stride = stride
+        self.auto = auto
+        self.vid_stride = vid_stride
+        self.stall_sec = stall_sec
+        self.max_backoff_sec = max_backoff_sec
+        self.skip_duplicates = skip_duplicates
+        self.hw_decode = hw_decode
+        self.health_log_sec = health_log_sec
+        self.log = logger or logging.getLogger()
+
+        is_list = os.path.isfile(sources) and sources.endswith(('.streams', '.txt'))
+        sources = Path(sources).read_text().rsplit() if is_list else [sources]
+        self.sources = [clean_str(x) for x in sources]  # clean source names for later
+        self.indices = list(range(len(sources)))  # the streams of the latest batch
+        self.health = [StreamHealth(s) for s in self.sources]
+
+        n = len(sources)
+        self._urls = sources
+        self._imgs = [None] * n
+        self._new = [False] * n
+        self._signatures = [None] * n
+        self._generations = [0] * n
+        self._retries = [0] * n  # consecutive watchdog reconnects
+        self._retry_at = [0.0] * n
+        self._cond = threading.Condition()
+        self._closed = False
+        for i in range(n):
+            self._start_reader(i)
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        self._watchdog.start()
+
+    def metrics(self):
+        """
+        Gets the health of every stream.
+
+        Returns:
+            list: A dict of source, state, frames, duplicates, skipped, decode errors, reconnects, frame age and fps per stream.
+        """
+        now = time.time()
+        with self._cond:
+            return [h.as_dict(now) for h in self.health]
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __iter__(self):
+        self.count = -1
+        return self
+
+    def __next__(self):
+        with self._cond:
+            # wait for a new frame of any stream
+            while not (self._closed or any(self._new)):
+                self._cond.wait(1)  # with a timeout, so KeyboardInterrupt gets through
+            if self._closed:
+                raise StopIteration
+            if self.skip_duplicates:
+                self.indices = [i for i, new in enumerate(self._new) if new]
+                im0 = [self._imgs[i] for i in self.indices]
+            else:
+                # a fixed batch holds every stream, streams that never connected get a black frame rather
+                # than holding up the others
+                self.indices = list(range(len(self._imgs)))
+                blank = np.zeros_like(next(x for x in self._imgs if x is not None))
+                im0 = [blank if x is None else x for x in self._imgs]
+            self._new = [False] * len(self._new)
+        self.count += 1
+
+        im = [letterbox(x, self.img_size, stride=self.stride, auto=self.auto)[0] for x in im0]
+        if len({x.shape for x in im}) > 1:  # shapes differ, letterbox to the full size instead
+            im = [letterbox(x, self.img_size, stride=self.stride, auto=False)[0] for x in im0]
+        im = np.stack(im)[..., ::-1].transpose((0, 3, 1, 2))  # BGR to RGB, BHWC to BCHW
+        im = np.ascontiguousarray(im)  # contiguous
+
+        return [self.sources[i] for i in self.indices], im, im0, None, ''
+
+    def __len__(self):
+        return len(self.sources)
+
+    def _start_reader(self, i, delay=0):
+        self._generations[i] += 1
+        threading.Thread(target=self._read, args=(i, self._generations[i], delay), daemon=True).start()
+
+    def _set_state(self, i, state):
+        h = self.health[i]
+        if h.state != state:
+            self.log.info(f'Stream {i} {h.source}: {h.state} -> {state}')
+            h.state = state
+
+    def _read(self, i, generation, delay=0):
+        h = self.health[i]
+        attempts = 0
+        time.sleep(delay)
+        while not self._closed and generation == self._generations[i]:
+            cap = open_capture(self._urls[i], self.stall_sec, self.hw_decode)
+            if not cap.isOpened():
+                cap.release()
+                delay = min(self.max_backoff_sec, 2 ** attempts)
+                attempts += 1
+                with self._cond:
+                    h.decode_errors += 1
+                    self._set_state(i, 'reconnecting')
+                self.log.warning(f'Stream {i} {h.source}: failed to open, retrying in {delay}s')
+                time.sleep(delay)
+                continue
+
+            n, changed, fps_start, fps_frames = 0, 0, time.time(), 0
+            while not self._closed and generation == self._generations[i]:
+                if not cap.grab():
+                    break
+                n += 1
+                if n % self.vid_stride:
+                    continue
+                now = time.time()
+                with self._cond:
+                    if generation != self._generations[i]:
+                        break  # replaced by the watchdog while reading
+                    attempts = 0
+                    h.frames += 1
+                    h.last_frame = now
+                    fps_frames += 1
+                    if now - fps_start >= 10:
+                        h.fps, fps_start, fps_frames = fps_frames / (now - fps_start), now, 0
+                    if self._new[i]:
+                        # the previous frame still waits for inference and this one would replace it unused,
+                        # skip the BGR conversion, about half the decode cost of a 4K frame. Unretrieved frames
+                        # can't be compared, so the stream doesn't count as frozen until its frame is consumed.
+                        h.skipped += 1
+                        h.last_change = now
+                        continue
+                success, im = cap.retrieve()
+                if not success:
+                    break
+
+                signature = frame_signature(im)
+                with self._cond:
+                    if generation != self._generations[i]:
+                        break
+                    previous = self._signatures[i]
+                    if previous is not None and np.array_equal(signature, previous):
+                        h.duplicates += 1
+                        if not self.skip_duplicates:
+                            self._imgs[i] = im  # still yielded with the other streams of a fixed batch
+                        continue
+                    self._signatures[i] = signature
+                    h.last_change = now
+                    changed += 1
+                    if changed > 1:
+                        self._retries[i] = 0  # the stream recovered, the first frame may be a leftover
+                    self._imgs[i] = im
+                    self._new[i] = True
+                    self._set_state(i, 'live')
+                    self._cond.notify_all()
+            cap.release()
+
+            if self._closed or generation != self._generations[i]:
+                return
+            delay = min(self.max_backoff_sec, 2 ** attempts)
+            attempts += 1
+            with self._cond:
+                h.decode_errors += 1
+                h.reconnects += 1
+                self._set_state(i, 'reconnecting')
+            self.log.warning(f'Stream {i} {h.source}: stream lost, reconnecting in {delay}s')
+            time.sleep(delay)
+
+    def _watch(self):
+        last_log = time.time()
+        while not self._closed:
+            time.sleep(1)
+            now = time.time()
+            with self._cond:
+                for i, h in enumerate(self.health):
+                    if h.state in ('connecting', 'reconnecting') or now < self._retry_at[i]:
+                        continue  # the reader is (re)connecting itself
+                    if now - h.last_frame > self.stall_sec:
+                        state = 'stalled'
+                    elif now - h.last_change > self.stall_sec:
+                        state = 'frozen'
+                    else:
+                        continue
+                    # a reader blocked on a stalled stream can't be interrupted, start over with a new reader
+                    delay = min(self.max_backoff_sec, 2 ** (self._retries[i] - 1)) if self._retries[i] else 0
+                    self._retries[i] += 1
+                    self._retry_at[i] = now + delay + self.stall_sec
+                    self._set_state(i, state)
+                    h.reconnects += 1
+                    self._start_reader(i, delay)
+
+            if now - last_log >= self.health_log_sec:
+                last_log = now
+                for i, m in enumerate(self.metrics()):
+                    self.log.info(f"Stream {i} {m['source']}: {m['state']}, {m['fps']} fps, {m['frames']} frames, "
+                                  f"{m['duplicates']} duplicates, {m['skipped']} skipped, {m['decode_errors']} errors, {m['reconnects']} reconnects, "
+                                  f"last frame {m['frame_age_sec']}s ago")
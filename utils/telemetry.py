@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import psutil
+from yolov5.utils.general import LOGGER
+
+def peak_rss_mb():
+    """
+    Gets the peak resident set size (in MB) of the current process.
+
+    Returns:
+        float: The peak RSS, falls back to the current RSS where the peak isn't available.
+    """
+    try:
+        import resource
+        import sys
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss / 1024 / 1024 if sys.platform == 'darwin' else maxrss / 1024  # bytes on macOS, KB on Linux
+    except ImportError:  # Windows
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / 1024 / 1024
+
+class TrainTelemetry:
+    """
+    TrainTelemetry class responsible for writing per-epoch training telemetry as JSONL, i.e.
+    dataloader wait vs. compute time, images/sec, memory, CPU utilization and ETA.
+    """
+
+    def __init__(self, opt, filename='telemetry.jsonl'):
+        """
+        Initializes a TrainTelemetry object.
+
+        Args:
+            opt: The yolov5 training options (of the resumed run when resuming, see train.py), `save_dir`
+            is read once training starts.
+            filename: The telemetry filename, written into the training run folder.
+        """
+        self.opt = opt
+        self.filename = filename
+        self.path = None
+
+        self._process = psutil.Process()
+        self._epoch_start = 0.0
+        self._batch_start = 0.0
+        self._batch_end = 0.0
+        self._data_wait = 0.0
+        self._compute = 0.0
+        self._images = 0
+        self._peak_workers_rss = 0.0
+        self._epoch_times = []
+        self._last_epoch = None
+
+    def register(self, callbacks):
+        """
+        Registers the telemetry hooks on yolov5 training callbacks.
+
+        Args:
+            callbacks: The yolov5 Callbacks object passed to training.
+        """
+        callbacks.register_action('on_train_start', 'telemetry', self.on_train_start)
+        callbacks.register_action('on_train_epoch_start', 'telemetry', self.on_train_epoch_start)
+        callbacks.register_action('on_train_batch_start', 'telemetry', self.on_train_batch_start)
+        callbacks.register_action('on_train_batch_end', 'telemetry', self.on_train_batch_end)
+        callbacks.register_action('on_fit_epoch_end', 'telemetry', self.on_fit_epoch_end)
+
+    def on_train_start(self):
+        self.path = os.path.join(self.opt.save_dir, self.filename)
+        self._process.cpu_percent()  # start measuring CPU utilization
+        psutil.cpu_percent()
+
+    def on_train_epoch_start(self):
+        self._epoch_start = self._batch_end = time.perf_counter()
+        self._data_wait = self._compute = 0.0
+        self._images = 0
+
+    def on_train_batch_start(self):
+        # time since previous batch ended is spent waiting for the dataloader
+        self._batch_start = time.perf_counter()
+        self._data_wait += self._batch_start - self._batch_end
+
+    def on_train_batch_end(self, model, ni, imgs, targets, paths, mloss):
+        self._batch_end = time.perf_counter()
+        self._compute += self._batch_end - self._batch_start
+        self._images += imgs.shape[0]
+
+    def on_fit_epoch_end(self, log_vals, epoch, best_fitness, fi):
+        # also called when best.pt is re-validated after the final epoch
+        if epoch == self._last_epoch:
+            return
+        self._last_epoch = epoch
+
+        epoch_sec = time.perf_counter() - self._epoch_start
+        train_sec = self._data_wait + self._compute
+        self._epoch_times.append(epoch_sec)
+
+        # dataloader workers are child processes
+        workers_rss = 0.0
+        for child in self._process.children(recursive=True):
+            try:
+                workers_rss += child.memory_info().rss / 1024 / 1024
+            except psutil.Error:
+                pass
+        self._peak_workers_rss = max(self._peak_workers_rss, workers_rss)
+
+        epochs = self.opt.epochs
+        record = dict(
+            time=time.time(),
+            epoch=epoch,
+            epochs=epochs,
+            epoch_sec=round(epoch_sec, 3),
+            data_wait_sec=round(self._data_wait, 3),
+            compute_sec=round(self._compute, 3),
+            val_sec=round(max(epoch_sec - train_sec, 0), 3),
+            data_wait_pct=round(self._data_wait / train_sec * 100, 1) if train_sec else 0.0,
+            images=self._images,
+            images_per_sec=round(self._images / train_sec, 2) if train_sec else 0.0,
+            peak_rss_mb=round(peak_rss_mb(), 1),
+            peak_workers_rss_mb=round(self._peak_workers_rss, 1),
+            process_cpu_pct=self._process.cpu_percent(),
+            system_cpu_pct=psutil.cpu_percent(),
+            eta_sec=round(sum(self._epoch_times) / len(self._epoch_times) * (epochs - epoch - 1), 1),
+            fitness=float(fi),
+            metrics=[float(x) for x in log_vals],
+        )
+
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+        LOGGER.info(f"Epoch {epoch + 1}/{epochs}: {record['images_per_sec']} img/s, " +
+                 f"{record['data_wait_pct']}% dataloader wait, {record['process_cpu_pct']}% CPU, " +
+                 f"{record['peak_rss_mb']}MB peak RSS, ETA {record['eta_sec'] / 60:.1f}min")